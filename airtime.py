@@ -0,0 +1,83 @@
+# airtime.py：解说排期引擎
+# 按上下半场分别求解“加权区间调度”：每条解说可以在 [原始时间, 原始时间 + min(MAX_DRIFT, 自身时长)) 内推迟，
+# 推迟越多扣分越多，在互不重叠的前提下让总权重最大；低优先级的台词会被直接舍弃而不是无限后推
+import numpy as np
+
+# priority -> 权重 (priority 是各模块的类别编号，不是单调的重要度)
+# 1: 回合总结, 6: 击杀, 2: 开局经济, 4: 战术, 3: 道具
+PRIORITY_WEIGHTS = {1: 10.0, 6: 8.0, 2: 6.0, 4: 3.0, 3: 2.0}
+DEFAULT_WEIGHT = 1.0
+MAX_DRIFT = 4.0        # 最多允许推迟的秒数
+DRIFT_STEP = 0.5       # 候选推迟量的步长
+DRIFT_PENALTY = 0.3    # 每推迟 1 秒扣的权重
+
+def priority_weights(priority):
+    """向量化查表：priority 数组 -> 权重数组"""
+    priority = np.asarray(priority, dtype=np.int64)
+    lut = np.full(max(PRIORITY_WEIGHTS) + 1, DEFAULT_WEIGHT)
+    for p, w in PRIORITY_WEIGHTS.items(): lut[p] = w
+    inside = (priority >= 0) & (priority < len(lut))
+    return np.where(inside, lut[np.clip(priority, 0, len(lut) - 1)], DEFAULT_WEIGHT)
+
+def estimate_speech_duration(text_len, span=None):
+    """与旧排期一致的时长估算：至少 2.5s，每字 0.22s，且不短于事件本身的跨度"""
+    dur = np.maximum(2.5, np.asarray(text_len, dtype=np.float64) * 0.22)
+    if span is not None: dur = np.maximum(dur, np.nan_to_num(np.asarray(span, dtype=np.float64)))
+    return dur
+
+def _weighted_interval_schedule(starts, ends, weights):
+    """经典 WIS：按结束时间排序，p(j) 用 searchsorted 一次算完，DP 线性扫描"""
+    n = len(starts)
+    if n == 0: return np.array([], dtype=np.int64)
+    order = np.argsort(ends, kind="stable")
+    s, e, w = starts[order], ends[order], weights[order]
+    p = np.searchsorted(e, s, side="right") - 1  # 最后一个与 j 不冲突的候选
+
+    dp = np.zeros(n + 1)
+    take = np.zeros(n, dtype=bool)
+    for j in range(n):
+        incl = w[j] + dp[p[j] + 1]
+        if incl > dp[j]:
+            dp[j + 1] = incl
+            take[j] = True
+        else:
+            dp[j + 1] = dp[j]
+
+    chosen = []
+    j = n - 1
+    while j >= 0:
+        if take[j]:
+            chosen.append(order[j])
+            j = p[j]
+        else:
+            j -= 1
+    return np.array(chosen[::-1], dtype=np.int64)
+
+def schedule_airtime(start, duration, weight, group=None, max_drift=MAX_DRIFT):
+    """
+    返回每条事件的播出开始时间，未入选的为 NaN。
+    group 相同的事件共用一条时间轴 (如上/下半场)
+    """
+    start = np.asarray(start, dtype=np.float64)
+    duration = np.asarray(duration, dtype=np.float64)
+    weight = np.asarray(weight, dtype=np.float64)
+    n = len(start)
+    group = np.zeros(n, dtype=np.int64) if group is None else np.asarray(group)
+    assigned = np.full(n, np.nan)
+    if n == 0: return assigned
+
+    # 每条事件展开成若干个“推迟量”候选
+    offsets = np.arange(0.0, max_drift + 1e-9, DRIFT_STEP)
+    ev = np.repeat(np.arange(n), len(offsets))
+    off = np.tile(offsets, n)
+    c_start = start[ev] + off
+    c_end = c_start + duration[ev]
+    c_weight = weight[ev] - DRIFT_PENALTY * off
+    # 推迟量必须小于自身时长：这样同一事件的候选两两重叠，WIS 不会把同一条台词选两次
+    valid = (c_weight > 0) & (off < duration[ev])
+
+    for g in np.unique(group):
+        idx = np.nonzero(valid & (group[ev] == g))[0]
+        picked = idx[_weighted_interval_schedule(c_start[idx], c_end[idx], c_weight[idx])]
+        assigned[ev[picked]] = c_start[picked]
+    return assigned
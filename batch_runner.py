@@ -0,0 +1,53 @@
+# batch_runner.py：批量处理一个目录/通配符下的所有 demo (BO3、整站赛事)
+# 所有 demo 共用一个进程池做解析/预处理，共用一个 LLM 网关 (连接、并发预算、响应缓存)，最后报告吞吐
+import os
+import glob
+import time
+import traceback
+import concurrent.futures
+from llm_gateway import get_client
+from master_scheduler import MasterScheduler
+
+DEMO_WORKERS = 2                                # 同时调度的 demo 数
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # 解析/预处理进程数
+
+def find_demos(pattern):
+    """目录 -> 目录下所有 .dem；否则按通配符展开"""
+    if os.path.isdir(pattern):
+        paths = glob.glob(os.path.join(pattern, "*.dem"))
+    else:
+        paths = glob.glob(pattern)
+    return sorted(p for p in paths if p.lower().endswith(".dem"))
+
+def _run_one(demo_path, api_key, test_mode, procs, rounds=None, redo=False):
+    t0 = time.perf_counter()
+    try:
+        ok = MasterScheduler(demo_path, api_key, test_mode=test_mode, rounds=rounds, redo=redo).run(procs)
+    except Exception as e:
+        print(f"❌ [Batch] {os.path.basename(demo_path)} 出错: {e}")
+        traceback.print_exc()
+        ok = False
+    return bool(ok), time.perf_counter() - t0
+
+def run_batch(demo_paths, api_key, test_mode=False, demo_workers=DEMO_WORKERS, parse_workers=PARSE_WORKERS, rounds=None, redo=False):
+    """返回 {demo_path: (是否成功, 耗时秒)}"""
+    gateway = get_client(api_key)
+    print(f"🗂️ [Batch] {len(demo_paths)} 个 demo, 并行 {demo_workers} 个, 解析进程 {parse_workers} 个")
+
+    t0 = time.perf_counter()
+    results = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers) as procs, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=demo_workers) as threads:
+        futures = {threads.submit(_run_one, p, api_key, test_mode, procs, rounds, redo): p for p in demo_paths}
+        for f in concurrent.futures.as_completed(futures):
+            path = futures[f]
+            results[path] = f.result()
+            ok, sec = results[path]
+            print(f"   {'✅' if ok else '❌'} [Batch] {os.path.basename(path)} ({sec:.0f}s) [{len(results)}/{len(demo_paths)}]")
+    elapsed = time.perf_counter() - t0
+
+    done = sum(ok for ok, _ in results.values())
+    rate = done / elapsed * 3600 if elapsed else 0.0
+    print(f"\n📊 [Batch] 完成 {done}/{len(demo_paths)}, 总耗时 {elapsed / 60:.1f} 分钟, 吞吐 {rate:.1f} demos/小时")
+    print(f"   🤖 [LLM] {gateway.summary()}")
+    return results
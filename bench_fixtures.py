@@ -0,0 +1,151 @@
+# bench_fixtures.py：合成比赛数据，用于没有真实 demo 时的性能测试
+# 生成与 demo_tables.parse_demo_tables 相同布局的 Arrow 表 (ticks/kills/rounds/smokes/infernos/economy/item_pickup + header.json)，
+# 规模由回合数、每回合秒数和 tick 采样步长控制
+import os
+import json
+import numpy as np
+import pandas as pd
+import polars as pl
+import config
+from mapping_table import anchors
+from demo_tables import ECONOMY_FIELDS
+
+TEAM_SIZE = 5
+ROUND_SECONDS = 100   # 冻结时间之后的回合时长
+FREEZE_SECONDS = 15
+WEAPONS = ["ak47", "m4a1", "awp", "deagle", "usp_silencer", "glock", "mp9", "galilar"]
+BUY_ITEMS = ["ak47", "m4a1", "awp", "kevlar", "helmet", "smokegrenade", "molotov", "flashbang", "hegrenade", "defuser"]
+REASONS = ["ct_killed", "t_killed", "bomb_exploded", "bomb_defused", "time_ran_out"]
+
+def _players():
+    names = [f"T_player{i}" for i in range(TEAM_SIZE)] + [f"CT_player{i}" for i in range(TEAM_SIZE)]
+    sides = ["t"] * TEAM_SIZE + ["ct"] * TEAM_SIZE
+    return np.array(names), np.array(sides), np.arange(76561190000000000, 76561190000000000 + 2 * TEAM_SIZE)
+
+def build_rounds(n_rounds, tickrate, round_seconds=ROUND_SECONDS):
+    length = int((FREEZE_SECONDS + round_seconds + 5) * tickrate)
+    start = np.arange(n_rounds) * length + tickrate
+    rng = np.random.default_rng(1)
+    winner = rng.choice(["ct", "t"], n_rounds)
+    return pd.DataFrame({
+        "round_num": np.arange(1, n_rounds + 1),
+        "start": start,
+        "freeze_end": start + FREEZE_SECONDS * tickrate,
+        "end": start + (FREEZE_SECONDS + round_seconds) * tickrate,
+        "official_end": start + (FREEZE_SECONDS + round_seconds + 5) * tickrate,
+        "winner": winner,
+        "reason": np.where(winner == "ct", "t_killed", "ct_killed"),
+    })
+
+def build_kills(rounds, tickrate, rng):
+    """每回合 3~9 次击杀，受害者不重复，凶手从对方存活选手里选"""
+    names, sides, _ = _players()
+    rows = []
+    ax, ay = anchors["x"].to_numpy(), anchors["y"].to_numpy()
+    for r in rounds.itertuples(index=False):
+        n = int(rng.integers(3, 10))
+        victims = rng.permutation(2 * TEAM_SIZE)[:n]
+        ticks = np.sort(rng.integers(r.freeze_end + 5 * tickrate, r.end, n))
+        dead = set()
+        for v, t in zip(victims, ticks):
+            enemies = [i for i in range(2 * TEAM_SIZE) if sides[i] != sides[v] and i not in dead]
+            if not enemies: break
+            a = int(rng.choice(enemies))
+            pa, pv = rng.integers(0, len(ax), 2)
+            rows.append({
+                "tick": int(t), "round_num": r.round_num,
+                "attacker_name": names[a], "attacker_side": sides[a],
+                "victim_name": names[v], "victim_side": sides[v],
+                "weapon": str(rng.choice(WEAPONS)), "headshot": bool(rng.random() < 0.4),
+                "attacker_X": ax[pa], "attacker_Y": ay[pa], "victim_X": ax[pv], "victim_Y": ay[pv],
+            })
+            dead.add(v)
+    return pd.DataFrame(rows)
+
+def build_ticks(rounds, kills, tickrate, tick_step, rng):
+    """每个选手从出生点沿直线走向随机锚点；被击杀后血量归零"""
+    names, sides, _ = _players()
+    spawn = {"t": anchors[anchors["macro"] == "匪家"].iloc[0], "ct": anchors[anchors["macro"] == "警家"].iloc[0]}
+    frames = []
+    death = kills.set_index(["round_num", "victim_name"])["tick"].to_dict() if len(kills) else {}
+    for r in rounds.itertuples(index=False):
+        ticks = np.arange(r.start, r.end, tick_step)
+        targets = anchors.iloc[rng.integers(0, len(anchors), 2 * TEAM_SIZE)]
+        frac = np.clip((ticks - r.freeze_end) / max(1, r.end - r.freeze_end), 0, 1)
+        for i, (name, side) in enumerate(zip(names, sides)):
+            s, t = spawn[side], targets.iloc[i]
+            noise = rng.normal(0, 30, (len(ticks), 2))
+            health = np.where(ticks >= death.get((r.round_num, name), np.inf), 0, 100)
+            frames.append(pd.DataFrame({
+                "tick": ticks, "round_num": r.round_num, "name": name, "side": side, "health": health,
+                "X": s["x"] + (t["x"] - s["x"]) * frac + noise[:, 0],
+                "Y": s["y"] + (t["y"] - s["y"]) * frac + noise[:, 1],
+                "Z": np.full(len(ticks), t["z"]),
+            }))
+    return pd.concat(frames, ignore_index=True).sort_values(["tick", "name"], kind="stable").reset_index(drop=True)
+
+def build_grenades(rounds, tickrate, rng, per_round, duration):
+    names, sides, _ = _players()
+    rows = []
+    for r in rounds.itertuples(index=False):
+        for _ in range(per_round):
+            p = int(rng.integers(0, 2 * TEAM_SIZE))
+            a = anchors.iloc[int(rng.integers(0, len(anchors)))]
+            start = int(rng.integers(r.freeze_end, r.end))
+            rows.append({"entity_id": len(rows) + 1, "round_num": r.round_num, "thrower_name": names[p], "thrower_side": sides[p],
+                         "start_tick": start, "end_tick": start + int(duration * tickrate), "X": a["x"], "Y": a["y"], "Z": a["z"]})
+    return pd.DataFrame(rows)
+
+def build_economy(rounds, rng):
+    """每回合冻结时间结束时每人一条经济快照"""
+    names, sides, steamids = _players()
+    n = len(rounds) * len(names)
+    money = rng.integers(800, 16000, n)
+    return pd.DataFrame({
+        "tick": np.repeat(rounds["freeze_end"].to_numpy(), len(names)),
+        "name": np.tile(names, len(rounds)), "steamid": np.tile(steamids, len(rounds)),
+        ECONOMY_FIELDS[0]: money - rng.integers(0, 800, n).clip(max=money),
+        ECONOMY_FIELDS[1]: money,
+        ECONOMY_FIELDS[2]: np.tile(np.where(sides == "t", 2, 3), len(rounds)),
+    })
+
+def build_item_pickup(rounds, rng, per_player=3):
+    names, _, steamids = _players()
+    rows = []
+    for r in rounds.itertuples(index=False):
+        for name, sid in zip(names, steamids):
+            for item in rng.choice(BUY_ITEMS, per_player, replace=False):
+                rows.append({"tick": int(rng.integers(r.start, r.freeze_end)), "user_name": name, "user_steamid": sid, "item": str(item)})
+    return pd.DataFrame(rows)
+
+def write_match_tables(out_dir, n_rounds=24, round_seconds=ROUND_SECONDS, tick_step=1, grenades_per_round=6, seed=0):
+    """生成一整场合成比赛并写成 Arrow，返回与 parse_demo_tables 相同的 {表名: 路径}"""
+    os.makedirs(out_dir, exist_ok=True)
+    tickrate = int(config.TICKRATE)
+    rng = np.random.default_rng(seed)
+
+    rounds = build_rounds(n_rounds, tickrate, round_seconds)
+    kills = build_kills(rounds, tickrate, rng)
+    tables = {
+        "rounds": rounds,
+        "kills": kills,
+        "ticks": build_ticks(rounds, kills, tickrate, tick_step, rng),
+        "smokes": build_grenades(rounds, tickrate, rng, grenades_per_round // 2, config.GRENADE_DURATIONS["smoke"]),
+        "infernos": build_grenades(rounds, tickrate, rng, grenades_per_round - grenades_per_round // 2, config.GRENADE_DURATIONS["molotov"]),
+        "economy": build_economy(rounds, rng),
+        "item_pickup": build_item_pickup(rounds, rng),
+    }
+
+    paths = {}
+    for name, df in tables.items():
+        path = os.path.join(out_dir, f"{name}.arrow")
+        pl.from_pandas(df).write_ipc(path)
+        paths[name] = path
+    header_path = os.path.join(out_dir, "header.json")
+    with open(header_path, "w", encoding="utf-8") as f:
+        json.dump({"map_name": "de_mirage", "tickrate": tickrate}, f)
+    paths["header"] = header_path
+
+    sizes = ", ".join(f"{k} {len(v)}" for k, v in tables.items())
+    print(f"🧪 [Fixtures] {n_rounds} 回合: {sizes}")
+    return paths
@@ -0,0 +1,138 @@
+# benchmark.py：端到端基准测试
+# 用合成比赛数据 + 本地 LLM 桩服务跑一遍 MasterScheduler，记录各阶段/各模块耗时、请求数、tokens 和内存峰值，
+# 结果追加到 data/bench/history.jsonl，并与相同参数的上一次记录对比，超过阈值的指标标记为回归
+#
+#   python benchmark.py --rounds 24 --latency 0.3 --error-rate 0.02
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(ROOT, "data", "bench", "history.jsonl")
+REGRESSION_THRESHOLD = 0.10  # 比上次慢/多 10% 以上算回归
+TRACKED_METRICS = ["wall_s", "llm_requests", "prompt_tokens", "completion_tokens", "peak_mb"]
+
+def git_revision():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip())
+        return rev + ("-dirty" if dirty else "")
+    except Exception:
+        return "unknown"
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path): return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def append_history(record, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def compare(record, history, threshold=REGRESSION_THRESHOLD):
+    """与同参数的上一条记录逐项对比，返回 [(指标, 上次, 本次, 变化率, 是否回归)]"""
+    prev = next((h for h in reversed(history) if h.get("params") == record["params"]), None)
+    if prev is None: return []
+    rows = []
+    for m in TRACKED_METRICS:
+        old, new = prev.get(m), record.get(m)
+        if not old or new is None: continue
+        change = (new - old) / old
+        rows.append((m, old, new, change, change > threshold))
+    return rows
+
+def run_benchmark(rounds=24, round_seconds=100, tick_step=1, grenades_per_round=6,
+                  latency=0.3, jitter=0.1, error_rate=0.0, rpm=0, test_mode=False, keep=False):
+    from mock_llm_server import start_mock_server
+    server, mock, base_url = start_mock_server(latency=latency, jitter=jitter, error_rate=error_rate, rpm=rpm)
+    # 网关在导入时读取这些环境变量，必须在导入 master_scheduler 之前设置
+    os.environ["LLM_BASE_URL"] = base_url
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["DASHSCOPE_API_KEY"] = os.environ["OPENAI_API_KEY"] = "mock-key"
+
+    from bench_fixtures import write_match_tables
+    from master_scheduler import MasterScheduler
+    from llm_gateway import get_client
+
+    workdir = tempfile.mkdtemp(prefix="caster_bench_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        t0 = time.perf_counter()
+        paths = write_match_tables(os.path.join(workdir, "fixtures"), rounds, round_seconds, tick_step, grenades_per_round)
+        fixture_s = time.perf_counter() - t0
+
+        demo_path = os.path.join(workdir, f"bench_r{rounds}.dem")
+        open(demo_path, "wb").close()  # 占位文件：各模块只用它推导输出目录
+        scheduler = MasterScheduler(demo_path, "mock-key", test_mode=test_mode, table_paths=paths)
+        t0 = time.perf_counter()
+        scheduler.run()
+        wall = time.perf_counter() - t0
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        if not keep: shutil.rmtree(workdir, ignore_errors=True)
+
+    llm = get_client("mock-key").stats
+    return {
+        "commit": git_revision(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "params": {"rounds": rounds, "round_seconds": round_seconds, "tick_step": tick_step,
+                   "grenades_per_round": grenades_per_round, "latency": latency, "error_rate": error_rate,
+                   "rpm": rpm, "test_mode": test_mode},
+        "fixture_s": round(fixture_s, 3),
+        "wall_s": round(wall, 3),
+        "stages": {r["stage"]: {"seconds": round(r["seconds"], 3), "peak_mb": round(r["peak_mb"], 1)} for r in scheduler.mem.stages},
+        "modules": {k: round(v, 3) for k, v in scheduler.module_times.items()},
+        "llm_requests": llm["requests"] + llm["errors"],
+        "llm_cache_hits": llm["cache_hits"],
+        "llm_prefix_hits": llm["prefix_hits"],
+        "prompt_tokens": llm["prompt_tokens"],
+        "completion_tokens": llm["completion_tokens"],
+        "server": dict(mock.stats),
+        "peak_mb": round(max((r["peak_mb"] for r in scheduler.mem.stages), default=0.0), 1),
+        "workdir": workdir if keep else None,
+    }
+
+def print_report(record, diff):
+    print(f"\n📊 [Bench] {record['commit']}  总耗时 {record['wall_s']:.2f}s  峰值 {record['peak_mb']:.0f} MB")
+    print(f"   LLM 请求 {record['llm_requests']} 次 (桩服务: 429 {record['server']['rate_limited']} 次, 500 {record['server']['errors']} 次), "
+          f"tokens {record['prompt_tokens']} + {record['completion_tokens']}")
+    for name, st in record["stages"].items():
+        print(f"   {name:<16}{st['seconds']:>9.2f}s{st['peak_mb']:>9.0f} MB")
+    for name, sec in sorted(record["modules"].items(), key=lambda kv: -kv[1]):
+        print(f"   模块 {name:<11}{sec:>9.2f}s")
+    if not diff:
+        print("   (没有相同参数的历史记录可对比)")
+        return
+    print("   与上次对比:")
+    for m, old, new, change, regressed in diff:
+        print(f"   {'⚠️' if regressed else '  '} {m:<18}{old:>12.2f} -> {new:<12.2f}{change:+.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=24)
+    parser.add_argument("--round-seconds", type=int, default=100)
+    parser.add_argument("--tick-step", type=int, default=1, help="合成 tick 的采样步长 (需能整除 tickrate)")
+    parser.add_argument("--grenades", type=int, default=6, help="每回合道具数")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--test", action="store_true", help="只跑第一回合")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录")
+    parser.add_argument("--no-record", action="store_true", help="不写入历史记录")
+    args = parser.parse_args()
+
+    record = run_benchmark(args.rounds, args.round_seconds, args.tick_step, args.grenades,
+                           args.latency, args.jitter, args.error_rate, args.rpm, args.test, args.keep)
+    diff = compare(record, load_history())
+    print_report(record, diff)
+    if not args.no_record: append_history(record)
+    sys.exit(1 if any(r[-1] for r in diff) else 0)
@@ -0,0 +1,87 @@
+# cache_writer.py：多线程生成结果的缓存写入
+# 生成线程只往内存缓冲里追加 (不碰文件)，攒够一批或超过间隔时由当前线程整批写进 SQLite (WAL 模式，一批一个事务)；
+# 进程中途崩溃时已提交的批次都还在，下次运行打开同一个库会自动恢复，调用方用 done_ids() 跳过已生成的事件；
+# 要求重做 (reset=True，对应 --redo) 时先删掉上次留下的库，不再恢复。
+# close() 时把全部结果一次性导出成原来的 *_gen_cache.csv (先写临时文件再替换)，下游读缓存的方式不变
+import os
+import json
+import time
+import sqlite3
+import threading
+import pandas as pd
+
+FLUSH_ROWS = 20        # 缓冲满多少条写一批
+FLUSH_INTERVAL = 2.0   # 距上次写入超过多少秒也写一批 (秒)
+
+class CacheWriter:
+    def __init__(self, csv_path, fields, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL, reset=False):
+        self.csv_path = csv_path
+        self.fields = list(fields)
+        self.db_path = os.path.splitext(csv_path)[0] + ".sqlite"
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        if reset: self._remove_db()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rows (event_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._conn.commit()
+        recovered = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        if recovered: print(f"   ♻️ [Cache] 从上次中断的运行恢复 {recovered} 条: {os.path.basename(self.db_path)}")
+
+    def done_ids(self):
+        """已经提交过的 event_id (上次中断前写入的也算)"""
+        with self._flush_lock:
+            return {r[0] for r in self._conn.execute("SELECT event_id FROM rows")}
+
+    def add(self, row):
+        with self._buffer_lock:
+            self._buffer.append(row)
+            due = len(self._buffer) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval
+        if due: self.flush()
+
+    def flush(self):
+        """把缓冲整批写入一个事务；失败时放回缓冲等下次再写"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                batch, self._buffer = self._buffer, []
+                self._last_flush = time.monotonic()
+            if not batch: return 0
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO rows (event_id, data) VALUES (?, ?)",
+                        [(str(r.get("event_id")), json.dumps(r, ensure_ascii=False, default=str)) for r in batch])
+            except sqlite3.Error as e:
+                print(f"   ⚠️ [Cache] 写入失败，稍后重试: {e}")
+                with self._buffer_lock: self._buffer = batch + self._buffer
+                return 0
+            return len(batch)
+
+    def close(self, keep=None):
+        """写完剩余缓冲，导出 CSV (keep 为要保留的已有行) 并删除临时库；返回导出的 DataFrame"""
+        self.flush()
+        with self._flush_lock:
+            if self._buffer: raise RuntimeError(f"缓存写入失败: {self.db_path}")
+            rows = [json.loads(r[0]) for r in self._conn.execute("SELECT data FROM rows ORDER BY rowid")]
+            df = pd.DataFrame(rows, columns=self.fields)
+            if keep is not None and not keep.empty:
+                df = pd.concat([keep, df], ignore_index=True).drop_duplicates("event_id", keep="last")
+            tmp = self.csv_path + ".tmp"
+            df.to_csv(tmp, index=False, encoding="utf-8-sig")
+            os.replace(tmp, self.csv_path)
+            self._conn.close()
+        # CSV 已经落盘，库文件 (含 WAL/SHM) 不再需要
+        self._remove_db()
+        return df
+
+    def _remove_db(self):
+        for suffix in ("", "-wal", "-shm"):
+            try: os.remove(self.db_path + suffix)
+            except OSError: pass
@@ -1,35 +1,157 @@
-import pandas as pd
+# clean_cache.py：缓存维护
+# 1. 文本规整：各模块写缓存时就用 normalize_text/normalize_events 去掉“短版/Short/：”之类的标签 (一条预编译正则)
+# 2. 增量清洗：清单里记下每个 *_gen_cache.csv 上次处理后的 (mtime, size)，没变的文件不再读写；读到的文件顺便去掉完全重复的行
+# 3. 压实：LLM 响应缓存是只追加的 JSONL，同一个 key 只保留最后一条
+# 4. 淘汰 (默认关闭)：按 demo 目录的最近修改时间和总大小预算删除 cache/raw 子目录 (output 里的成品保留)，本次要处理的 demo 不淘汰
 import os
+import re
+import json
 import glob
+import time
+import shutil
+import argparse
+import pandas as pd
+from llm_gateway import CACHE_PATH
 
-def clean_text(text):
-    if pd.isna(text): return ""
-    txt = str(text)
-    # 脏词黑名单
-    tags = ["短版", "中版", "长版", "Short", "Medium", "Long", ":", "：", "version"]
-    for tag in tags:
-        txt = txt.replace(tag, "")
-    return txt.replace("---", "").strip()
-
-def main():
-    # 扫描所有缓存文件
-    files = glob.glob(os.path.join("data", "**", "*_gen_cache.csv"), recursive=True)
-    if not files:
-        print("❌ 没找到缓存文件")
-        return
+TEXT_COLUMNS = ['short_text_neutral', 'medium_text_neutral', 'long_text_neutral']
+# 脏词黑名单，一次替换完
+CLEAN_PATTERN = re.compile(r"短版|中版|长版|Short|Medium|Long|version|---|[:：]")
+MANIFEST_NAME = ".clean_manifest.json"
+CACHE_MAX_AGE_DAYS = float(os.getenv("CACHE_MAX_AGE_DAYS", "0"))  # 超过这么多天没动过的 demo 缓存被淘汰，0 (默认) 表示不按时间淘汰
+CACHE_BUDGET_MB = float(os.getenv("CACHE_BUDGET_MB", "0"))        # 所有 demo 的 cache/raw 总大小上限，0 (默认) 表示不限
+EVICTABLE_DIRS = ["cache", "raw"]
+SHARED_DIRS = {"llm_cache", "bench"}  # data 下不属于单个 demo 的目录
+
+def normalize_text(text):
+    if text is None or (isinstance(text, float) and pd.isna(text)): return ""
+    return CLEAN_PATTERN.sub("", str(text)).strip()
+
+def normalize_events(df):
+    """向量化清洗三列文本 (写缓存前调用)"""
+    for c in TEXT_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].fillna("").astype(str).str.replace(CLEAN_PATTERN, "", regex=True).str.strip()
+    return df
+
+def find_cache_files(root="data"):
+    return glob.glob(os.path.join(root, "**", "*_gen_cache.csv"), recursive=True)
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+def load_manifest(root="data"):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return {}
+
+def save_manifest(manifest, root="data"):
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(manifest, f)
+    os.replace(tmp, os.path.join(root, MANIFEST_NAME))
 
-    print(f"🔍 找到 {len(files)} 个文件，开始清洗...")
+def clean_files(files, manifest=None):
+    """清洗并压实；传入 manifest 时跳过上次处理后没有变化的文件。返回实际处理的文件数"""
+    done = 0
     for f in files:
         try:
+            key = os.path.abspath(f)
+            if manifest is not None and manifest.get(key) == _stat_key(f): continue
             df = pd.read_csv(f, encoding='utf-8-sig')
-            cols = ['short_text_neutral', 'medium_text_neutral', 'long_text_neutral']
-            for c in cols:
-                if c in df.columns:
-                    df[c] = df[c].apply(clean_text) # 洗刷刷
-            df.to_csv(f, index=False, encoding='utf-8-sig')
-            print(f"   ✅ 已清洗: {os.path.basename(f)}")
+            before = df.copy()
+            df = normalize_events(df)
+            # 追加写的缓存里同一行可能出现多次；只去掉完全相同的行 (旧的道具缓存里不同道具可能共用 event_id)
+            df = df.drop_duplicates(keep='last')
+            if not df.equals(before):
+                df.to_csv(f, index=False, encoding='utf-8-sig')
+                print(f"   ✅ 已清洗: {os.path.basename(f)} ({len(before)} -> {len(df)} 行)")
+            if manifest is not None: manifest[key] = _stat_key(f)
+            done += 1
         except Exception as e:
             print(f"   ❌ 失败 {f}: {e}")
+    return done
+
+def compact_jsonl(path, key_field="key"):
+    """只追加的 JSONL 按 key 去重 (保留最后一条)，没有重复时不改写。返回去掉的行数"""
+    if not path or not os.path.exists(path): return 0
+    latest, total = {}, 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try: rec = json.loads(line)
+            except ValueError: continue
+            total += 1
+            latest.pop(rec.get(key_field), None)  # 重新插入，保持最后出现的顺序
+            latest[rec.get(key_field)] = line if line.endswith("\n") else line + "\n"
+    removed = total - len(latest)
+    if removed <= 0: return 0
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: f.writelines(latest.values())
+    os.replace(tmp, path)
+    return removed
+
+def _tree_stats(path):
+    """目录总大小 (字节) 和最近修改时间"""
+    size, newest = 0, 0.0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try: st = os.stat(os.path.join(dirpath, name))
+            except OSError: continue
+            size += st.st_size
+            newest = max(newest, st.st_mtime)
+    return size, newest
+
+def evict_demo_caches(root="data", max_age_days=CACHE_MAX_AGE_DAYS, budget_mb=CACHE_BUDGET_MB, keep=()):
+    """先淘汰超龄的 demo，再按最久未修改的顺序淘汰到预算以内。返回被淘汰的 demo 名"""
+    if not os.path.isdir(root): return []
+    demos = []
+    for entry in os.scandir(root):
+        if not entry.is_dir() or entry.name in SHARED_DIRS or entry.name.startswith(".") or entry.name in keep: continue
+        dirs = [os.path.join(entry.path, d) for d in EVICTABLE_DIRS if os.path.isdir(os.path.join(entry.path, d))]
+        if not dirs: continue
+        stats = [_tree_stats(d) for d in dirs]
+        demos.append({"name": entry.name, "dirs": dirs, "size": sum(s for s, _ in stats), "mtime": max(m for _, m in stats)})
+
+    demos.sort(key=lambda d: d["mtime"])
+    now = time.time()
+    total = sum(d["size"] for d in demos)
+    evicted = []
+    for d in demos:
+        too_old = max_age_days and now - d["mtime"] > max_age_days * 86400
+        over_budget = budget_mb and total > budget_mb * 1024 * 1024
+        if not (too_old or over_budget): continue
+        for path in d["dirs"]: shutil.rmtree(path, ignore_errors=True)
+        total -= d["size"]
+        evicted.append(d["name"])
+        print(f"   🗑️ 淘汰 {d['name']} ({d['size'] / 1024 / 1024:.1f} MB, {(now - d['mtime']) / 86400:.0f} 天未使用)")
+    return evicted
+
+def main(root="data", max_age_days=CACHE_MAX_AGE_DAYS, budget_mb=CACHE_BUDGET_MB, keep=()):
+    """keep: 本次要处理的 demo 名 (data 下的目录名)，不参与淘汰"""
+    evicted = evict_demo_caches(root, max_age_days, budget_mb, keep)
+
+    manifest = load_manifest(root)
+    files = find_cache_files(root)
+    # 已删除的文件不再留在清单里
+    alive = {os.path.abspath(f) for f in files}
+    manifest = {k: v for k, v in manifest.items() if k in alive}
+    if files:
+        print(f"🔍 找到 {len(files)} 个缓存文件，只处理有变化的...")
+        done = clean_files(files, manifest)
+        print(f"   {done} 个文件有变化，{len(files) - done} 个跳过")
+    else:
+        print("❌ 没找到缓存文件")
+    save_manifest(manifest, root)
+
+    removed = compact_jsonl(CACHE_PATH)
+    if removed: print(f"   🗜️ 响应缓存压实: 去掉 {removed} 条重复记录")
+    if evicted: print(f"   共淘汰 {len(evicted)} 个 demo 的缓存")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", default="data")
+    parser.add_argument("--max-age-days", type=float, default=CACHE_MAX_AGE_DAYS)
+    parser.add_argument("--budget-mb", type=float, default=CACHE_BUDGET_MB)
+    parser.add_argument("--keep", type=str, default="", help="不淘汰的 demo 名，逗号分隔")
+    args = parser.parse_args()
+    main(args.root, args.max_age_days, args.budget_mb, [k.strip() for k in args.keep.split(",") if k.strip()])
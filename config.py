@@ -24,4 +24,8 @@ GRENADE_DURATIONS = {
     "incendiary": 7,
     "flashbang": 3,
     "hegrenade": 1
-}
\ No newline at end of file
+}
+# 5. LLM 并发
+# 所有模块共用网关的一个并发预算；拆成共享网关之前各模块线程池合计约 31 个请求同时在途 (10/8/8/5)。
+# 调小可以降低限流 (429) 和排队抖动，但整场生成会更慢；环境变量 LLM_MAX_CONCURRENCY 或 main.py --llm-concurrency 可覆盖
+LLM_MAX_CONCURRENCY = 31
@@ -4,21 +4,19 @@ import csv
 import time
 import json
 import concurrent.futures
-from openai import OpenAI
-from read_demo import makeCSV
+from llm_gateway import get_client
+from read_demo import load_grenade_tables
 import config # 引入 config 确保统一
+from events import to_event_table
+from tracing import span, submit_traced
+from prompts import build_messages
+from clean_cache import normalize_events
+from round_select import resolve_rounds, filter_rounds, plan_cache, merge_cache, load_cache, save_coverage
 
 OPENAI_API_KEY = None
-OPENAI_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 MODEL_NAME = "qwen-max" 
 MAX_WORKERS = 8 
 
-CSV_FILES = {
-    "smoke": "烟雾弹详细信息.csv",
-    "inferno": "燃烧弹详细信息.csv",
-    "other": "其他投掷物详细信息.csv"
-}
-
 def setAPI_KEY(api_key):
     global OPENAI_API_KEY
     if api_key: OPENAI_API_KEY = api_key
@@ -31,27 +29,24 @@ def clean_json_text(text):
     if text.endswith("```"): text = text[:-3]
     return text.strip()
 
-def analyze_grenade_with_llm(row_data):
+def analyze_grenade_with_llm(row_data, match_dir=None, match_state=None):
     if not OPENAI_API_KEY: return "", "", ""
-    client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    client = get_client(OPENAI_API_KEY)
     
     grenade_type = str(row_data.get('投掷物类型', '道具'))
     thrower = str(row_data.get('投掷人', '未知选手'))
     land_area = str(row_data.get('落点所在范围', '未知区域'))
     
-    prompt = f"""
-    解说CS2投掷物事件：
-    选手：{thrower}
-    投掷：{grenade_type}
-    落点：{land_area}
-    输出JSON: {{"short": "...", "medium": "...", "long": "..."}}
-    """
+    prompt = f"选手：{thrower}\n投掷：{grenade_type}\n落点：{land_area}"
+    if match_state is not None:
+        ctx = match_state.describe(row_data.get('回合数', 0), int(row_data.get('tick时间戳', 0)))
+        if ctx: prompt += f"\n{ctx}"
     
     for _ in range(3):
         try:
             resp = client.chat.completions.create(
                 model=MODEL_NAME,
-                messages=[{"role": "system", "content": "你是一个CS2解说。请输出标准JSON。"}, {"role": "user", "content": prompt}],
+                messages=build_messages("grenade", prompt, match_dir),
                 response_format={"type": "json_object"}
             )
             content = resp.choices[0].message.content
@@ -61,44 +56,39 @@ def analyze_grenade_with_llm(row_data):
             
     return f"{thrower}{land_area}投掷{grenade_type}", "", ""
 
-def run_grenade_analysis(demo_path=None, test_mode=False):
+def run_grenade_analysis(demo_path=None, test_mode=False, demo_tables=None, rounds=None, redo=False, match_state=None):
     print("💣 [Grenade] 开始道具分析...")
     
-    if demo_path and os.path.exists(demo_path):
-        try: makeCSV(demo_path) 
-        except: pass
-
     base_name = os.path.splitext(os.path.basename(demo_path))[0] if demo_path else "demo"
     output_dir = os.path.join("data", base_name)
+    raw_dir = os.path.join(output_dir, "raw")
     cache_dir = os.path.join(output_dir, "cache")
     if not os.path.exists(cache_dir): os.makedirs(cache_dir)
     cache_path = os.path.join(cache_dir, "grenade_gen_cache.csv")
 
-    if os.path.exists(cache_path):
+    rounds = resolve_rounds(rounds, test_mode)
+    cached, covered = load_cache(cache_path)
+    # 选中回合都有缓存时直接返回，否则只生成缺的回合
+    todo, keep = plan_cache(cached, rounds, redo, covered)
+    if todo == []: return to_event_table(filter_rounds(keep, rounds), "grenade")
+
+    # 道具表直接在内存中交接，只在本 demo 的 raw 目录留一份副本
+    tables = {}
+    if demo_path and os.path.exists(demo_path):
         try:
-            df = pd.read_csv(cache_path)
-            if not df.empty:
-                if test_mode and 'round_num' in df.columns:
-                    df = df[df['round_num'] == 1]
-                return df
-        except: pass
+            with span("grenade_tables", "pandas"): tables = load_grenade_tables(demo_path, raw_dir, demo_tables, todo)
+        except Exception as e: print(f"   ⚠️ [Grenade] 道具解析失败: {e}")
 
     all_grenades = []
-    for fname in CSV_FILES.values():
-        if os.path.exists(fname):
-            try:
-                df = pd.read_csv(fname, encoding='utf-8-sig')
-                grenades = df.to_dict('records')
-                if test_mode and '回合数' in df.columns:
-                    grenades = [g for g in grenades if g.get('回合数') == 1]
-                all_grenades.extend(grenades)
-            except: pass
+    for df in tables.values():
+        if df.empty: continue
+        all_grenades.extend(df.to_dict('records'))
             
-    if not all_grenades: return pd.DataFrame()
+    if not all_grenades: return to_event_table(filter_rounds(keep, rounds), "grenade")
 
     results = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_map = {executor.submit(analyze_grenade_with_llm, item): item for item in all_grenades}
+        future_map = {submit_traced(executor, analyze_grenade_with_llm, item, output_dir, match_state): item for item in all_grenades}
         
         for future in concurrent.futures.as_completed(future_map):
             item = future_map[future]
@@ -112,8 +102,9 @@ def run_grenade_analysis(demo_path=None, test_mode=False):
                     start_time = float(item.get("tick时间戳", 0)) / float(config.TICKRATE)
 
                 results.append({
-                    "event_id": f"grenade_{item.get('tick时间戳')}",
+                    "event_id": f"grenade_{item.get('tick时间戳')}_{item.get('投掷人', '')}_{item.get('投掷物类型', '')}",  # 同一 tick 可能有多颗道具
                     "round_num": item.get("回合数"),
+                    "players": item.get("投掷人", ""),
                     "start_time": start_time, 
                     "priority": 3,
                     "short_text_neutral": s,
@@ -124,7 +115,10 @@ def run_grenade_analysis(demo_path=None, test_mode=False):
             except: pass
 
     df_res = pd.DataFrame(results)
+    if not df_res.empty: df_res = normalize_events(df_res)
+    df_res = merge_cache(keep, df_res)
     if not df_res.empty:
         df_res.to_csv(cache_path, index=False, encoding='utf-8-sig')
+        if OPENAI_API_KEY: save_coverage(cache_path, covered, todo, df_res)
     
-    return df_res
\ No newline at end of file
+    return to_event_table(filter_rounds(df_res, rounds), "grenade")
\ No newline at end of file
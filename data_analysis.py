@@ -1,12 +1,18 @@
 import pandas as pd
 import os
 import random
-import uuid
 import json
 import concurrent.futures
-from openai import OpenAI
+from llm_gateway import get_client
 import time
 import csv
+from features import build_feature_store
+from events import to_event_table, empty_events
+from tracing import span, submit_traced
+from prompts import build_messages
+from clean_cache import normalize_text
+from cache_writer import CacheWriter
+from round_select import resolve_rounds, filter_rounds, plan_cache, load_cache, save_coverage
 
 # 全局配置
 LLM_API_KEY = None
@@ -14,10 +20,20 @@ def setAPI(API_KEY):
     global LLM_API_KEY
     LLM_API_KEY = API_KEY
 
-LLM_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 MAX_WORKERS = 8 
 SKIP_SECONDS = 20.0 
 
+# 事件驱动采样：只在局势发生变化的秒触发战术分析
+SITE_AREAS = ["A区", "B区"]     # 包点区域
+STACK_MIN_PLAYERS = 3          # 同一区域 >= 3 人视为抱团
+ENTRY_MIN_PLAYERS = 2          # 包点内 T >= 2 人视为进点
+ROTATE_WINDOW = 5              # 回防判定窗口(秒)
+ROTATE_MIN_SHIFT = 2           # CT 在 A/B 两侧的人数差变化 >= 2 视为转点
+SWING_WINDOW = 5               # 人数优势判定窗口(秒)
+SWING_MIN_DELTA = 2            # 双方人数差变化 >= 2 视为局势逆转
+MIN_TRIGGER_GAP = 8.0          # 同一回合两次战术分析的最小间隔(秒)
+TACTICAL_FIELDS = ["event_id", "round_num", "tick", "priority", "short_text_neutral", "medium_text_neutral", "long_text_neutral", "event_type"]
+
 def clean_json_text(text):
     text = text.strip()
     if text.startswith("```json"): text = text[7:]
@@ -28,20 +44,37 @@ def clean_json_text(text):
     if s != -1 and e != -1: text = text[s:e+1]
     return text.strip()
 
-def generate_prompt_from_data(slice_df, r_num, t_rel):
+def generate_prompt_from_data(slice_df, r_num, t_rel, reason=None, store=None, utility_index=None, match_state=None):
     alive = slice_df[slice_df['health'] > 0]
     t_p = alive[alive['side'] == 'T']
     ct_p = alive[alive['side'] == 'CT']
     if t_p.empty and ct_p.empty: return None
 
-    def get_pos(df): return ", ".join([f"{r['name']}@{r.get('location_name', r.get('area','?'))}" for _, r in df.iterrows()])
+    loc_col = next((c for c in ['location_name', 'area'] if c in alive.columns), None)
+    def get_pos(df):
+        if loc_col is None: return ", ".join(df['name'].astype(str))
+        return (df['name'].astype(str) + "@" + df[loc_col].astype(str)).str.cat(sep=", ")
     
     prompt = f"第{r_num}回合，进行到{int(t_rel)}秒。\n"
+    if reason: prompt += f"局势变化: {reason}\n"
     prompt += f"T位置: {get_pos(t_p)}\nCT位置: {get_pos(ct_p)}\n"
-    prompt += "分析双方意图(Short:10字, Medium:30字)。"
-    return prompt
+    if store is not None:
+        feats = store.describe(r_num, t_rel)
+        if feats: prompt += f"阵型特征:\n{feats}\n"
+    if utility_index is not None:
+        utils = utility_index.describe(r_num, int(slice_df['tick'].min()))
+        if utils: prompt += f"场上道具: {utils}\n"
+    if match_state is not None:
+        # 站位里已经能看出存活人数，这里只补比分
+        ctx = match_state.describe(r_num, int(slice_df['tick'].min()), alive=False)
+        if ctx: prompt += f"{ctx}\n"
+    return prompt.rstrip("\n")
+
+def tactical_event_id(r_num, tick):
+    """同一触发点每次运行得到同一个 id，中断后重跑可以跳过已生成的"""
+    return f"tactical_{int(r_num)}_{int(tick)}"
 
-def process_slice_task(slice_df, r_num):
+def process_slice_task(slice_df, r_num, reason=None, store=None, utility_index=None, match_dir=None, match_state=None):
     min_tick = slice_df['tick'].min()
     if 'second' in slice_df.columns:
         t_rel = slice_df['second'].min()
@@ -49,17 +82,17 @@ def process_slice_task(slice_df, r_num):
 
     if t_rel < SKIP_SECONDS: return None
 
-    prompt = generate_prompt_from_data(slice_df, r_num, t_rel)
+    with span("tactical_prompt", "prompt"):
+        prompt = generate_prompt_from_data(slice_df, r_num, t_rel, reason, store, utility_index, match_state)
     if not prompt or not LLM_API_KEY: return None
     
-    client = OpenAI(api_key=LLM_API_KEY, base_url=LLM_BASE_URL)
+    client = get_client(LLM_API_KEY)
     for _ in range(2):
         try:
             # 不用 response_format，兼容性更好
             resp = client.chat.completions.create(
                 model="qwen-max",
-                messages=[{"role": "system", "content": "你是CS2战术分析师。输出JSON: {\"short\":\"...\", \"medium\":\"...\", \"long\":\"...\"}"}, 
-                          {"role": "user", "content": prompt}]
+                messages=build_messages("tactical", prompt, match_dir)
             )
             raw = resp.choices[0].message.content
             try:
@@ -73,81 +106,148 @@ def process_slice_task(slice_df, r_num):
                 long = raw
 
             return {
-                "event_id": str(uuid.uuid4()),
+                "event_id": tactical_event_id(r_num, min_tick),
                 "round_num": r_num,
                 "tick": int(min_tick),
                 "priority": 4, 
-                "short_text_neutral": short,
-                "medium_text_neutral": medium,
-                "long_text_neutral": long,
+                "short_text_neutral": normalize_text(short),
+                "medium_text_neutral": normalize_text(medium),
+                "long_text_neutral": normalize_text(long),
                 "event_type": "tactical"
             }
         except: time.sleep(0.5)
     return None
 
-def run_tactical_analysis(df_pretreatment, output_dir=None, target_rounds=None, test_mode=False):
+def _label(mask, text):
+    """把布尔掩码变成标签列 (命中为 text，否则为空串)"""
+    return mask.map({True: text, False: ""})
+
+def detect_tactical_triggers(store):
+    """
+    向量化的局势变化检测：基于特征库里 (回合, 秒) 的存活人数、区域占位，
+    与上一秒/窗口前比较，返回 [round_num, sec, reason] 触发表
+    """
+    cols = ['round_num', 'sec', 'reason']
+    if store.teams.empty or store.occupancy.empty: return pd.DataFrame(columns=cols)
+    keys = ['round_num', 'sec']
+
+    # 1. 双方存活人数
+    st = store.teams['alive'].unstack('side', fill_value=0)
+    st = st.reindex(columns=['T', 'CT'], fill_value=0).rename(columns={'T': 'alive_T', 'CT': 'alive_CT'})
+
+    # 2. 每队人数最多的区域 (主控区域) 及其人数
+    occ = store.occupancy
+    dom = occ.sort_values('n', ascending=False).drop_duplicates(keys + ['side'])
+    dom = dom.pivot_table(index=keys, columns='side', values=['area', 'n'], aggfunc='first', observed=True)
+    dom.columns = [f"{'dom' if a == 'area' else 'dom_n'}_{b}" for a, b in dom.columns]
+    st = st.join(dom)
+
+    # 3. 包点内 T 人数、CT 在 A/B 两侧的分布
+    site_t = occ[(occ['side'] == 'T') & occ['area'].isin(SITE_AREAS)]
+    site_t = site_t.pivot_table(index=keys, columns='area', values='n', aggfunc='sum', observed=True)
+    st = st.join(site_t.reindex(columns=SITE_AREAS).add_prefix('t_in_'))
+    ct = occ[occ['side'] == 'CT']
+    ct_half = ct['area'].str[0].where(ct['area'].str[0].isin(['A', 'B']))
+    ct_bal = ct.assign(half=ct_half).dropna(subset=['half'])
+    ct_bal = ct_bal.pivot_table(index=keys, columns='half', values='n', aggfunc='sum', observed=True).reindex(columns=['A', 'B'])
+    st = st.join((ct_bal['A'].fillna(0) - ct_bal['B'].fillna(0)).rename('ct_balance'))
+
+    for c in ['dom_T', 'dom_CT']:
+        if c not in st: st[c] = None
+    for c in ['dom_n_T', 'dom_n_CT', 't_in_A区', 't_in_B区', 'ct_balance']:
+        st[c] = st[c].fillna(0) if c in st else 0
+    st = st.sort_index()
+
+    # 与上一秒 / 窗口前对比 (按回合分组，避免跨回合比较)
+    g = st.groupby(level='round_num')
+    prev = g.shift(1)
+    lag_rot = g['ct_balance'].shift(ROTATE_WINDOW)
+    adv = st['alive_T'] - st['alive_CT']
+    lag_adv = adv.groupby(level='round_num').shift(SWING_WINDOW)
+
+    labels = []
+    for side in ['T', 'CT']:
+        dom_c, n_c = f'dom_{side}', f'dom_n_{side}'
+        shift = prev[dom_c].notna() & (st[dom_c] != prev[dom_c]) & (st[n_c] >= 2)
+        labels.append(_label(shift, f"{side}主控区域转移"))
+        stack = (st[n_c] >= STACK_MIN_PLAYERS) & (prev[n_c].fillna(0) < STACK_MIN_PLAYERS)
+        labels.append(_label(stack, f"{side}抱团"))
+    for site in SITE_AREAS:
+        c = f't_in_{site}'
+        entry = (st[c] >= ENTRY_MIN_PLAYERS) & (prev[c].fillna(0) < ENTRY_MIN_PLAYERS)
+        labels.append(_label(entry, f"T进{site}"))
+    labels.append(_label((st['ct_balance'] - lag_rot).abs() >= ROTATE_MIN_SHIFT, "CT转点回防"))
+    labels.append(_label((adv - lag_adv).abs() >= SWING_MIN_DELTA, "人数优势逆转"))
+
+    # 整列拼接后去掉空标签留下的多余分隔符
+    reason = labels[0].str.cat(labels[1:], sep="，").str.replace(r"，{2,}", "，", regex=True).str.strip("，")
+    trig = reason[reason != ""].rename('reason').reset_index()
+    trig = trig[trig['sec'] >= SKIP_SECONDS]
+
+    # 同一回合内按最小间隔去抖 (触发点数量很少，直接遍历)
+    keep, last = [], {}
+    for i, r_num, sec in zip(trig.index, trig['round_num'], trig['sec']):
+        if sec - last.get(r_num, -1e9) >= MIN_TRIGGER_GAP:
+            keep.append(i)
+            last[r_num] = sec
+    return trig.loc[keep, cols].reset_index(drop=True)
+
+def run_tactical_analysis(df_pretreatment, output_dir=None, target_rounds=None, test_mode=False, utility_index=None, redo=False, match_state=None):
     print(f"🧠 [Tactical] 开始战术分析...")
     
     if df_pretreatment is None or df_pretreatment.empty: 
         print("   ⚠️ [Tactical] 预处理数据为空，跳过")
-        return pd.DataFrame()
+        return empty_events()
 
+    rounds = resolve_rounds(target_rounds, test_mode)
     cache_path = None
     if output_dir:
         cache_dir = os.path.join(output_dir, "cache")
         os.makedirs(cache_dir, exist_ok=True)
         cache_path = os.path.join(cache_dir, "tactical_gen_cache_v2.csv")
-        
-        # 缓存检查
-        if os.path.exists(cache_path):
-            try:
-                df = pd.read_csv(cache_path)
-                if not df.empty:
-                    if test_mode and 'round_num' in df.columns:
-                        if 1 in df['round_num'].values:
-                            return df[df['round_num'] == 1]
-                    else:
-                        return df
-            except: pass
-        # 清除旧缓存
-        try: os.remove(cache_path)
-        except: pass
+    # 缓存检查：选中回合都有缓存时直接返回，否则只分析缺的回合
+    cached, covered = load_cache(cache_path)
+    todo, keep = plan_cache(cached, rounds, redo, covered)
+    if todo == []: return to_event_table(filter_rounds(keep, rounds), "tactical")
 
     tasks = []
     print(f"   🚀 生成任务队列...")
+    # 结果先进缓冲，整批写入 SQLite，结束时导出 CSV
+    writer = CacheWriter(cache_path, TACTICAL_FIELDS, reset=redo) if cache_path else None
+    done_ids = writer.done_ids() if writer else set()
+
+    df_rounds = filter_rounds(df_pretreatment, todo)
+    # 整场特征一次算好，触发检测和 Prompt 都直接查表
+    with span("feature_store", "pandas", rows=len(df_rounds)):
+        store = build_feature_store(df_rounds)
+    with span("tactical_triggers", "pandas"):
+        triggers = detect_tactical_triggers(store)
+    print(f"   🎯 [Tactical] 检测到 {len(triggers)} 个局势变化点")
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        for r_num, df_round in df_pretreatment.groupby("round_num"):
-            if test_mode and r_num != 1: continue
-            
-            if 'second' in df_round.columns:
-                min_sec = df_round['second'].min()
-                max_sec = df_round['second'].max()
-                curr = min_sec
-                # 间隔 15 秒
-                while curr < max_sec:
-                    slice_df = df_round[(df_round['second'] >= curr) & (df_round['second'] < curr + 1.0)]
-                    if not slice_df.empty:
-                        tasks.append(executor.submit(process_slice_task, slice_df, r_num))
-                    curr += 15.0
+        if not triggers.empty:
+            # 一次 groupby 切出所有触发秒的切片，替代逐段布尔掩码
+            df_sec = df_rounds.assign(sec=df_rounds['second'].astype(float).floordiv(1).astype(int))
+            df_sec = df_sec.merge(triggers, on=['round_num', 'sec'])
+            for (r_num, _), slice_df in df_sec.groupby(['round_num', 'sec']):
+                if tactical_event_id(r_num, slice_df['tick'].min()) in done_ids: continue
+                reason = slice_df['reason'].iloc[0]
+                tasks.append(submit_traced(executor, process_slice_task, slice_df, r_num, reason, store, utility_index, output_dir, match_state))
 
     results = []
-    # 如果有 cache path，先写入表头
-    if output_dir and cache_path:
-        pd.DataFrame(columns=["event_id", "round_num", "tick", "priority", "short_text_neutral", "medium_text_neutral", "long_text_neutral", "event_type"]).to_csv(cache_path, index=False, encoding="utf-8-sig")
-
     count = 0
     for f in concurrent.futures.as_completed(tasks):
         try:
             res = f.result()
             if res: 
                 results.append(res)
-                if output_dir and cache_path:
-                    pd.DataFrame([res]).to_csv(cache_path, mode='a', index=False, header=False, encoding="utf-8-sig")
+                if writer: writer.add(res)
                 count += 1
                 if count % 10 == 0: print(f"      [Tactical] 进度: {count}/{len(tasks)}")
         except: pass
         
-    df_res = pd.DataFrame(results)
+    df_res = writer.close(keep) if writer else pd.DataFrame(results)
+    if writer and LLM_API_KEY: save_coverage(cache_path, covered, todo, df_res)
+    df_res = filter_rounds(df_res, rounds)
     print(f"✅ [Tactical] 完成，生成 {len(df_res)} 条")
-    return df_res
\ No newline at end of file
+    return to_event_table(df_res, "tactical")
\ No newline at end of file
@@ -0,0 +1,107 @@
+# dedup.py：整场解说文本的近似重复检测
+# 按“字”切 n-gram (中文一个字、英文/数字一整个词算一个单位) 做 MinHash 签名，按段 (band) 做 LSH 分桶；新文本只和同桶候选比精确 Jaccard，单条检查在亚毫秒级。
+# 排期和风格润色之前，把与前面台词近似重复的低权重台词去掉，观众不会把同一句话听五遍，润色也不用为它再付一次钱。
+# 只在同一回合、DEDUP_WINDOW 秒以内比较；涉及的选手也算进签名，不同选手的同类台词不会互相抵消
+import re
+import time
+import zlib
+import numpy as np
+from airtime import priority_weights
+
+NGRAM = 2              # 相邻两个单位一组
+NUM_PERM = 64          # MinHash 签名长度
+BANDS = 16             # LSH 段数 (每段 NUM_PERM / BANDS 行)
+DEDUP_THRESHOLD = 0.7  # Jaccard >= 阈值视为近似重复
+DEDUP_WINDOW = 20.0    # 只和前面这么多秒以内的台词比较 (秒)
+PROTECTED_TYPES = {"kill", "round_summary"}  # 每一条都是真实发生的事，从不去掉
+
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)  # 奇数乘子，乘法在 uint64 上是置换
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_UNITS = re.compile(r"[a-z0-9]+|[^\W\d_a-z]", re.IGNORECASE)  # 英文/数字连成一个词，其余按单字，标点空白丢掉
+
+def shingles(text, n=NGRAM, players=()):
+    """文本 n-gram + 每名选手一个单独的 token (选手不同，相似度就被拉低)"""
+    units = _UNITS.findall(str(text).lower())
+    if len(units) <= n: grams = {"\x1f".join(units)} if units else set()
+    else: grams = {"\x1f".join(units[i:i + n]) for i in range(len(units) - n + 1)}
+    return grams | {f"@{p.strip().lower()}" for p in players if p and p.strip()}
+
+def minhash(grams):
+    x = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    return (_A[:, None] * x[None, :] + _B[:, None]).min(axis=1)
+
+class NearDuplicateIndex:
+    """增量索引：check() 只查询，add() 登记；check_and_add() 没有重复时顺便登记"""
+    def __init__(self, threshold=DEDUP_THRESHOLD, bands=BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.items = []    # [(shingles, payload)]
+        self._buckets = [{} for _ in range(bands)]
+
+    def _band_keys(self, sig):
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def check(self, text, players=(), accept=None):
+        """返回 (最相似条目的 payload, 相似度)；没有达到阈值时 payload 为 None。accept(payload) 为 False 的条目不参与比较"""
+        grams = shingles(text, players=players)
+        if not grams: return None, 0.0
+        keys = self._band_keys(minhash(grams))
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys): candidates.update(bucket.get(key, ()))
+        best, best_sim = None, 0.0
+        for i in candidates:
+            if accept is not None and not accept(self.items[i][1]): continue
+            other = self.items[i][0]
+            sim = len(grams & other) / len(grams | other)
+            if sim > best_sim: best, best_sim = i, sim
+        if best is None or best_sim < self.threshold: return None, best_sim
+        return self.items[best][1], best_sim
+
+    def add(self, text, payload=None, players=()):
+        grams = shingles(text, players=players)
+        if not grams: return
+        i = len(self.items)
+        self.items.append((grams, payload))
+        for bucket, key in zip(self._buckets, self._band_keys(minhash(grams))): bucket.setdefault(key, []).append(i)
+
+    def check_and_add(self, text, payload=None, players=()):
+        match, sim = self.check(text, players)
+        if match is None: self.add(text, payload, players)
+        return match, sim
+
+    def __len__(self):
+        return len(self.items)
+
+def suppress_near_duplicates(df, threshold=DEDUP_THRESHOLD, window=DEDUP_WINDOW):
+    """
+    按时间顺序过一遍事件表：与同一回合、window 秒内已保留台词近似重复、且排期权重不更高的事件去掉。
+    击杀和回合总结从不去掉 (但仍登记进索引，后面复述它们的道具/战术台词会被去掉)
+    """
+    if df.empty: return df
+    df = df.sort_values(['round_num', 'start_time']).reset_index(drop=True)
+    medium = df['medium_text_neutral'].fillna("")
+    texts = medium.where(medium != "", df['short_text_neutral'].fillna("")).astype(str).to_numpy()
+    weights = priority_weights(df['priority'].to_numpy())
+    rounds = df['round_num'].to_numpy()
+    starts = df['start_time'].to_numpy(dtype=np.float64)
+    protected = df['event_type'].astype(str).isin(PROTECTED_TYPES).to_numpy()
+    players = df['players'].fillna("").astype(str).str.split(",").to_numpy() if 'players' in df.columns else [()] * len(df)
+
+    keep = np.ones(len(df), dtype=bool)
+    t0 = time.perf_counter()
+    index, current_round = None, None
+    for i, text in enumerate(texts):
+        if rounds[i] != current_round:
+            index, current_round = NearDuplicateIndex(threshold), rounds[i]
+        if not protected[i]:
+            match, _ = index.check(text, players[i], accept=lambda j: starts[i] - starts[j] <= window)
+            if match is not None and weights[i] <= weights[match]:
+                keep[i] = False
+                continue
+        index.add(text, i, players[i])
+    elapsed = time.perf_counter() - t0
+    dropped = int((~keep).sum())
+    print(f"   🧹 [Dedup] 近似重复 {dropped}/{len(df)} 条已去掉 (平均每条 {elapsed / len(df) * 1000:.3f} ms)")
+    return df[keep].reset_index(drop=True)
@@ -0,0 +1,102 @@
+# demo_tables.py：demo 只解析一次，各张表以 Arrow IPC 落盘
+# 解析在子进程里完成，主进程和其他子进程按路径内存映射读取，不再各自重复 dem.parse()
+# 转 pandas 一律走 arrow_pandas：列仍指向 Arrow 缓冲区，换库不复制整张表
+import os
+import json
+import threading
+import polars as pl
+from tracing import span
+
+ECONOMY_FIELDS = [
+    "CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iAccount",
+    "CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iStartAccount",
+    "team_num",
+]
+
+def _to_polars(data):
+    if data is None: return None
+    if isinstance(data, pl.DataFrame): return data
+    return pl.from_pandas(data)
+
+def arrow_pandas(df):
+    """
+    polars -> pandas 时保留 Arrow 缓冲区 (ArrowDtype 列)，不再按 numpy/object 复制一份；
+    已经是 pandas 的原样返回
+    """
+    if df is None or not isinstance(df, pl.DataFrame): return df
+    return df.to_pandas(use_pyarrow_extension_array=True)
+
+def parse_demo_tables(demo_path, out_dir):
+    """
+    解析 demo 并把 kills/rounds/smokes/infernos/ticks/economy/item_pickup 写成 Arrow IPC，
+    返回 {表名: 路径}；适合直接丢进进程池执行
+    """
+    from awpy import Demo  # 重依赖只在执行解析的进程里加载
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"🔧 [Tables] 解析: {os.path.basename(demo_path)}")
+
+    with span("dem.parse", "parse"):
+        dem = Demo(demo_path)
+        dem.parse()
+
+    tables = {
+        "kills": getattr(dem, "kills", None),
+        "rounds": getattr(dem, "rounds", None),
+        "smokes": getattr(dem, "smokes", None),
+        "infernos": getattr(dem, "infernos", None),
+        "ticks": getattr(dem, "ticks", None),
+    }
+    try: tables["economy"] = dem.parser.parse_ticks(wanted_props=ECONOMY_FIELDS)
+    except Exception as e: print(f"   ⚠️ [Tables] 经济字段解析失败: {e}")
+    try: tables["item_pickup"] = dem.parser.parse_event("item_pickup")
+    except Exception as e: print(f"   ⚠️ [Tables] 拾取事件解析失败: {e}")
+
+    paths = {}
+    for name, data in tables.items():
+        df = _to_polars(data)
+        if df is None: continue
+        path = os.path.join(out_dir, f"{name}.arrow")
+        with span(f"write {name}", "io", rows=len(df)):
+            df.write_ipc(path)
+        paths[name] = path
+
+    header = {k: (v if isinstance(v, (int, float, str, bool)) else str(v)) for k, v in dict(dem.header or {}).items()}
+    header["tickrate"] = getattr(dem, "tickrate", None)
+    header_path = os.path.join(out_dir, "header.json")
+    with open(header_path, "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False)
+    paths["header"] = header_path
+
+    print(f"✅ [Tables] 已导出 {len(paths) - 1} 张表")
+    return paths
+
+class DemoTables:
+    """按需读取 parse_demo_tables 导出的表；同一张表只读一次，线程安全"""
+    def __init__(self, paths):
+        self.paths = dict(paths)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def has(self, name):
+        return name in self.paths
+
+    def polars(self, name):
+        if name not in self.paths: return None
+        with self._lock:
+            if name not in self._cache:
+                self._cache[name] = pl.read_ipc(self.paths[name])
+            return self._cache[name]
+
+    def pandas(self, name):
+        df = self.polars(name)
+        return arrow_pandas(df)
+
+    @property
+    def header(self):
+        if "header" not in self._cache:
+            try:
+                with open(self.paths["header"], encoding="utf-8") as f:
+                    self._cache["header"] = json.load(f)
+            except Exception:
+                self._cache["header"] = {}
+        return self._cache["header"]
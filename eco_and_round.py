@@ -1,16 +1,18 @@
-from awpy import Demo
 import polars as pl
-import pandas as pd
 import os
 import json
-import threading
-import csv
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from openai import OpenAI
+from llm_gateway import get_client
 from dotenv import load_dotenv
 import config  # 引入配置
+from demo_tables import ECONOMY_FIELDS
+from events import to_event_table
+from tracing import get_tracer, now_us, submit_traced
+from prompts import build_messages
+from clean_cache import normalize_text
+from cache_writer import CacheWriter
+from round_select import resolve_rounds, filter_rounds, plan_cache, load_cache, save_coverage
 
-csv_lock = threading.Lock()
 FORCE_TICKRATE = 64.0
 
 ITEM_NAME_CN = {
@@ -52,7 +54,7 @@ def clean_json_text(text):
     if s != -1 and e != -1: text = text[s:e+1]
     return text.strip()
 
-def process_single_eco_task(client, system_prompt, user_prompt, metadata, cache_file):
+def process_single_eco_task(client, messages, metadata, writer):
     short, medium, long = "", "", ""
     raw_content = ""
     
@@ -60,7 +62,7 @@ def process_single_eco_task(client, system_prompt, user_prompt, metadata, cache_
         # 🔥🔥🔥 移除 response_format，改用普通文本生成，兼容性更好 🔥🔥🔥
         resp = client.chat.completions.create(
             model="qwen-max",
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+            messages=messages
         )
         raw_content = resp.choices[0].message.content
         
@@ -83,7 +85,7 @@ def process_single_eco_task(client, system_prompt, user_prompt, metadata, cache_
     # 终极兜底：如果还是空的
     if not short:
         # 如果是经济分析，生成简单文本
-        if metadata['event_type'] == 2:
+        if metadata['event_type'] == "economy":
             short = f"第{metadata['round_num']}回合开局，双方准备就绪。"
         else:
             short = f"第{metadata['round_num']}回合结束。"
@@ -97,109 +99,104 @@ def process_single_eco_task(client, system_prompt, user_prompt, metadata, cache_
         "end_time": metadata['end_time'],
         "event_type": metadata['event_type'],
         "priority": metadata['priority'],
-        "short_text_neutral": short,
-        "medium_text_neutral": medium,
-        "long_text_neutral": long
+        "short_text_neutral": normalize_text(short),
+        "medium_text_neutral": normalize_text(medium),
+        "long_text_neutral": normalize_text(long)
     }
-    
-    with csv_lock:
-        try:
-            file_exists = os.path.exists(cache_file) and os.path.getsize(cache_file) > 0
-            with open(cache_file, mode='a', encoding='utf-8-sig', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=row.keys())
-                if not file_exists: writer.writeheader()
-                writer.writerow(row)
-        except: pass
-
-def analyze_economy(demo_path: str, enable_llm: bool = True, test_mode: bool = False):
+    writer.add(row)
+
+def analyze_economy(demo_path: str, enable_llm: bool = True, test_mode: bool = False, demo_tables=None, rounds=None, redo=False, match_state=None):
     base_name = os.path.splitext(os.path.basename(demo_path))[0]
     output_dir = os.path.join("data", base_name)
     os.makedirs(output_dir, exist_ok=True)
     cache_file = os.path.join(output_dir, "economy_gen_cache.csv")
 
-    # 缓存检查：如果是测试模式且缓存里有第一回合，直接返回
-    if os.path.exists(cache_file):
-        try:
-            df = pd.read_csv(cache_file, encoding='utf-8-sig')
-            if not df.empty:
-                if test_mode:
-                    if 1 in df['round_num'].values:
-                        print("   💰 [Economy] 读取缓存")
-                        return df[df['round_num'] == 1]
-                else:
-                    print("   💰 [Economy] 读取缓存")
-                    return df
-        except: pass
-
-    # 重新生成前清理旧文件
-    if os.path.exists(cache_file):
-        try: os.remove(cache_file)
-        except: pass
-
-    print(f"💰 [Economy] 解析 Demo (强制64Tick)...")
-    demo = Demo(demo_path)
-    demo.parse()
+    rounds = resolve_rounds(rounds, test_mode)
+
+    # 缓存检查：选中的回合都在缓存里时直接返回，否则只生成缺的回合
+    cached, covered = load_cache(cache_file)
+    todo, keep = plan_cache(cached, rounds, redo, covered)
+    if todo == []:
+        print("   💰 [Economy] 读取缓存")
+        return to_event_table(filter_rounds(keep, rounds))
+
+    # 调度器已在子进程里解析过 demo 时直接读表，否则自己解析
+    if demo_tables is not None and demo_tables.has("economy") and demo_tables.has("item_pickup"):
+        raw_economy = demo_tables.polars("economy")
+        raw_pickup = demo_tables.polars("item_pickup")
+        kills_df = demo_tables.polars("kills")
+        rounds_df = demo_tables.polars("rounds")
+    else:
+        print(f"💰 [Economy] 解析 Demo (强制64Tick)...")
+        from awpy import Demo
+        demo = Demo(demo_path)
+        demo.parse()
+        # demoparser 只给 pandas，这里是唯一一次换库
+        raw_economy = pl.from_pandas(demo.parser.parse_ticks(wanted_props=ECONOMY_FIELDS))
+        raw_pickup = pl.from_pandas(demo.parser.parse_event("item_pickup"))
+        kills_df = demo.kills
+        rounds_df = demo.rounds
     
     tickrate = float(config.TICKRATE)
-    map_name = demo.header.get('map_name', 'unknown')
     
     client = None
     if enable_llm:
         load_dotenv()
         key = os.getenv("DASHSCOPE_API_KEY") or os.getenv("OPENAI_API_KEY")
-        if key: client = OpenAI(api_key=key, base_url="https://dashscope.aliyuncs.com/compatible-mode/v1")
+        if key: client = get_client(key)
 
     # 数据提取
-    economy_fields = ["CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iAccount", "CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iStartAccount", "team_num"]
-    economy_df = pl.from_pandas(demo.parser.parse_ticks(wanted_props=economy_fields)).rename({"CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iAccount": "remaining_money", "CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iStartAccount": "start_money"})
+    economy_df = raw_economy.rename({"CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iAccount": "remaining_money", "CCSPlayerController.CCSPlayerController_InGameMoneyServices.m_iStartAccount": "start_money"})
     economy_df = economy_df.with_columns(pl.when(pl.col("team_num") == 2).then(pl.lit("T")).when(pl.col("team_num") == 3).then(pl.lit("CT")).otherwise(pl.lit("未知")).alias("side"))
-    item_pickup_df = pl.from_pandas(demo.parser.parse_event("item_pickup")).rename({"user_name": "name", "user_steamid": "steamid"})
-    kills_df = demo.kills
-    rounds_df = demo.rounds
-    
-    round_ranges = []
-    for row in rounds_df.to_dicts():
-        round_ranges.append({"round_num": row["round_num"], "start": row["start"], "freeze_end": row["freeze_end"], "end": row["official_end"]})
+    item_pickup_df = raw_pickup.rename({"user_name": "name", "user_steamid": "steamid"})
     
-    def get_round_num(tick, ranges):
-        for r in ranges:
-            if r["start"] <= tick <= r["end"]: return r["round_num"]
-        return None
-    def is_freeze_time(tick, ranges):
-        for r in ranges:
-            if r["start"] <= tick <= r["freeze_end"]: return True
-        return False
-
-    round_economy_data = []
-    for round_info in rounds_df.to_dicts():
-        freeze_end_tick = round_info["freeze_end"]
-        round_economy = economy_df.filter((pl.col("tick") >= freeze_end_tick - 10) & (pl.col("tick") <= freeze_end_tick + 10))
-        if len(round_economy) == 0: continue
-        player_economy = round_economy.group_by("name").agg([pl.col("start_money").first(), pl.col("remaining_money").first(), pl.col("steamid").first(), pl.col("side").first()])
-        for player in player_economy.to_dicts():
-            round_economy_data.append({"round_num": round_info["round_num"], "name": player["name"], "steamid": player["steamid"], "start_money": player["start_money"], "remaining_money": player["remaining_money"], "side": player["side"]})
-    round_economy_df = pl.DataFrame(round_economy_data)
-    
-    item_pickup_with_round = []
-    for item in item_pickup_df.to_dicts():
-        tick = item["tick"]
-        rnum = get_round_num(tick, round_ranges)
-        in_freeze = is_freeze_time(tick, round_ranges)
-        if rnum is not None:
-            item_pickup_with_round.append({**item, "round_num": rnum, "in_freeze_time": in_freeze, "is_purchase": in_freeze})
-    purchases_df = pl.DataFrame(item_pickup_with_round).filter(~pl.col("item").is_in(["knife", "knife_t", "c4"]))
+    # 回合归属用 join_asof 在 polars 内完成，不再逐行转 dict
+    round_ranges = rounds_df.select([
+        pl.col("round_num"), pl.col("start").alias("r_start"),
+        pl.col("freeze_end").alias("r_freeze_end"), pl.col("official_end").alias("r_end"),
+    ]).sort("r_start")
+
+    # 只跑部分回合时提取前先按回合裁剪：经济快照只留选中回合冻结结束前后的 tick，
+    # 购买记录只留选中回合和它们的上一回合 (Prompt 里要写“上局买”)，击杀只留选中回合
+    if todo is not None:
+        round_ranges = round_ranges.filter(pl.col("round_num").is_in(sorted(set(todo) | {r - 1 for r in todo})))
+        freeze_ticks = round_ranges.filter(pl.col("round_num").is_in(todo))["r_freeze_end"].to_list()
+        economy_df = economy_df.filter(pl.col("tick").is_in(sorted({t + d for t in freeze_ticks for d in range(-10, 11)})))
+        item_pickup_df = item_pickup_df.filter(pl.col("tick").is_between(round_ranges["r_start"].min(), round_ranges["r_end"].max()))
+        kills_df = kills_df.filter(pl.col("round_num").is_in(todo))
+
+    # 冻结时间结束前后 10 tick 内各选手的第一条经济快照
+    round_economy_df = (
+        economy_df.sort("tick")
+        .join_asof(round_ranges.sort("r_freeze_end"), left_on="tick", right_on="r_freeze_end", strategy="nearest")
+        .filter((pl.col("tick") - pl.col("r_freeze_end")).abs() <= 10)
+        .group_by(["round_num", "name"], maintain_order=True)
+        .agg([pl.col("start_money").first(), pl.col("remaining_money").first(), pl.col("steamid").first(), pl.col("side").first()])
+    )
+
+    purchases_df = (
+        item_pickup_df.sort("tick")
+        .join_asof(round_ranges, left_on="tick", right_on="r_start", strategy="backward")
+        .filter(pl.col("round_num").is_not_null() & (pl.col("tick") <= pl.col("r_end")))
+        .with_columns((pl.col("tick") <= pl.col("r_freeze_end")).alias("in_freeze_time"))
+        .with_columns(pl.col("in_freeze_time").alias("is_purchase"))
+        .drop(["r_start", "r_freeze_end", "r_end"])
+        .filter(~pl.col("item").is_in(["knife", "knife_t", "c4"]))
+    )
 
     csv_fields = ["event_id", "round_num", "start_time", "end_time", "event_type", "priority", "short_text_neutral", "medium_text_neutral", "long_text_neutral"]
-    with open(cache_file, 'w', encoding='utf-8-sig', newline='') as f:
-        csv.DictWriter(f, fieldnames=csv_fields).writeheader()
+    # 结果先进缓冲，整批写入 SQLite，结束时导出 CSV；上次中断前已生成的事件直接跳过 (redo 时不恢复)
+    writer = CacheWriter(cache_file, csv_fields, reset=redo)
+    done_ids = writer.done_ids()
 
     llm_tasks = []
     print(f"   [Economy] 需处理 {len(rounds_df)} 回合...")
+    t_prompts = now_us()
 
-    for round_num in range(1, len(rounds_df) + 1):
-        if test_mode and round_num != 1: continue
-        
-        round_info = rounds_df.filter(pl.col("round_num") == round_num).to_dicts()[0]
+    for round_num in (todo if todo is not None else range(1, len(rounds_df) + 1)):
+        round_rows = rounds_df.filter(pl.col("round_num") == round_num).to_dicts()
+        if not round_rows: continue
+        round_info = round_rows[0]
         
         eco_time = round_info.get('start', 0) / tickrate
         sum_time = round_info.get('official_end', 0) / tickrate
@@ -208,7 +205,10 @@ def analyze_economy(demo_path: str, enable_llm: bool = True, test_mode: bool = F
         if len(round_eco) == 0: continue
 
         # 经济 Prompt (防剧透)
-        eco_prompt = f"地图: {map_name}\n第 {round_num} 回合开始。\n"
+        eco_prompt = f"第 {round_num} 回合开始。\n"
+        if match_state is not None:
+            ctx = match_state.describe_round(round_num)
+            if ctx: eco_prompt += f"{ctx}\n"
         for side_label, side_filter in [("CT", "CT"), ("T", "T")]:
             side_players = round_eco.filter(pl.col("side") == side_filter).sort("name").to_dicts()
             if not side_players: continue
@@ -221,33 +221,37 @@ def analyze_economy(demo_path: str, enable_llm: bool = True, test_mode: bool = F
                     prev_items = [get_item_cn(i) for i in prev_purchases.select("item").to_series().to_list()]
                 else: prev_items = []
                 eco_prompt += f"  - {name}: ${start_money}, 上局买: {', '.join(prev_items) if prev_items else '无'}\n"
-        eco_prompt += "分析开局经济和起枪情况。JSON字段: short, medium, long"
 
         # 总结 Prompt (含胜者)
         winner = "CT" if round_info['winner'] == "ct" else "T"
         reason = get_reason_cn(round_info['reason'])
-        sum_prompt = f"地图: {map_name}\n第 {round_num} 回合结束。\n获胜: {winner}\n原因: {reason}\n关键击杀:\n"
+        sum_prompt = f"第 {round_num} 回合结束。\n获胜: {winner}\n原因: {reason}\n关键击杀:\n"
         round_kills = kills_df.filter(pl.col("round_num") == round_num)
         for kill in round_kills.sort("tick").to_dicts()[:5]:
             attacker = kill.get('attacker_name', '未知')
             victim = kill.get('victim_name', '未知')
             weapon = get_item_cn(kill.get('weapon', ''))
             sum_prompt += f"  - {attacker}({weapon}) 击杀 {victim}\n"
-        sum_prompt += "总结本回合。JSON字段: short, medium, long"
 
         if client:
-            meta_eco = {'event_id': f"{round_num}_2_1", 'round_num': round_num, 'start_time': eco_time, 'end_time': eco_time+5, 'event_type': 2, 'priority': 2}
-            sys_prompt = "你是CS2解说。请用JSON格式输出: {\"short\":\"...\", \"medium\":\"...\", \"long\":\"...\"}"
-            llm_tasks.append((client, sys_prompt, eco_prompt, meta_eco, cache_file))
+            meta_eco = {'event_id': f"{round_num}_2_1", 'round_num': round_num, 'start_time': eco_time, 'end_time': eco_time+5, 'event_type': "economy", 'priority': 2}
+            if meta_eco['event_id'] not in done_ids:
+                llm_tasks.append((client, build_messages("economy", eco_prompt.rstrip("\n"), output_dir), meta_eco, writer))
             
-            meta_sum = {'event_id': f"{round_num}_1_1", 'round_num': round_num, 'start_time': sum_time, 'end_time': sum_time+5, 'event_type': 1, 'priority': 1}
-            llm_tasks.append((client, sys_prompt, sum_prompt, meta_sum, cache_file))
+            meta_sum = {'event_id': f"{round_num}_1_1", 'round_num': round_num, 'start_time': sum_time, 'end_time': sum_time+5, 'event_type': "round_summary", 'priority': 1}
+            if meta_sum['event_id'] not in done_ids:
+                llm_tasks.append((client, build_messages("round_summary", sum_prompt.rstrip("\n"), output_dir), meta_sum, writer))
+
+    get_tracer().record("economy_prompts", "prompt", t_prompts, now_us(), tasks=len(llm_tasks))
 
     with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [executor.submit(process_single_eco_task, *t) for t in llm_tasks]
+        futures = [submit_traced(executor, process_single_eco_task, *t) for t in llm_tasks]
         for _ in as_completed(futures): pass
 
-    return pd.read_csv(cache_file, encoding='utf-8-sig')
+    df = writer.close(keep)
+    # 没有开 LLM 时什么都没生成，不记覆盖，下次开了 LLM 还会生成
+    if client: save_coverage(cache_file, covered, todo, df)
+    return to_event_table(filter_rounds(df, rounds))
 
-def get_events_df(demo_path: str, enable_llm: bool = True, test_mode: bool = False):
-    return analyze_economy(demo_path, enable_llm, test_mode)
\ No newline at end of file
+def get_events_df(demo_path: str, enable_llm: bool = True, test_mode: bool = False, demo_tables=None, rounds=None, redo=False, match_state=None):
+    return analyze_economy(demo_path, enable_llm, test_mode, demo_tables, rounds, redo, match_state)
\ No newline at end of file
@@ -0,0 +1,85 @@
+# events.py：统一的事件表结构
+# 所有模块 (击杀/道具/战术/经济) 输出同一套列和类型，下游直接按列处理
+import pandas as pd
+import config
+
+EVENT_TYPES = ["kill", "grenade", "tactical", "economy", "round_summary"]
+SIDES = ["", "T", "CT"]
+
+# 经济模块历史缓存里的整数类型
+LEGACY_EVENT_TYPES = {1: "round_summary", 2: "economy", "1": "round_summary", "2": "economy"}
+
+EVENT_SCHEMA = {
+    "event_id": "string",
+    "round_num": "int16",
+    "start_time": "float32",
+    "end_time": "float32",
+    "span_duration": "float32",
+    "event_type": pd.CategoricalDtype(EVENT_TYPES),
+    "priority": "int8",
+    "side": pd.CategoricalDtype(SIDES),
+    "area": "category",
+    "sequence_id": "Int32",
+    "players": "string",  # 事件涉及的选手，逗号分隔 (击杀: 击杀者,被杀者；道具: 投掷人)
+    "short_text_neutral": "string",
+    "medium_text_neutral": "string",
+    "long_text_neutral": "string",
+}
+EVENT_COLUMNS = list(EVENT_SCHEMA.keys())
+
+def empty_events():
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in EVENT_SCHEMA.items()})
+
+def to_event_table(df, event_type=None, tickrate=None):
+    """把任意模块的输出规整成统一事件表 (只做列级向量化转换)"""
+    if df is None or len(df) == 0: return empty_events()
+    tickrate = float(tickrate or config.TICKRATE)
+    n = len(df)
+    out = pd.DataFrame(index=pd.RangeIndex(n))
+
+    def col(name, default):
+        return df[name].reset_index(drop=True) if name in df.columns else pd.Series([default] * n)
+
+    etype = col("event_type", event_type)
+    etype = etype.map(lambda v: LEGACY_EVENT_TYPES.get(v, v))
+    if event_type is not None: etype = etype.fillna(event_type)
+
+    start = pd.to_numeric(col("start_time", None), errors="coerce")
+    if "tick" in df.columns:
+        start = start.fillna(pd.to_numeric(df["tick"].reset_index(drop=True), errors="coerce") / tickrate)
+    start = start.fillna(0.0)
+    end = pd.to_numeric(col("end_time", None), errors="coerce").fillna(start)
+
+    event_id = col("event_id", None)
+    if "unique_key" in df.columns: event_id = event_id.fillna(df["unique_key"].reset_index(drop=True))
+    fallback_id = etype.astype(str) + "_" + col("round_num", 0).astype(str) + "_" + pd.Series(range(n)).astype(str)
+    event_id = event_id.fillna(fallback_id)
+
+    side = col("side", "").fillna("").astype(str).str.upper().replace({"TERRORIST": "T"})
+
+    # 击杀缓存里是 attacker/victim 两列，其它模块直接给 players
+    names = [col(c, "").fillna("").astype(str) for c in ["attacker", "victim"] if c in df.columns and "players" not in df.columns]
+    players = names[0].str.cat(names[1:], sep=",") if names else col("players", "").fillna("").astype(str)
+    players = players.replace("nan", "").str.strip(",")
+
+    out["event_id"] = event_id
+    out["round_num"] = pd.to_numeric(col("round_num", 0), errors="coerce").fillna(0)
+    out["start_time"] = start
+    out["end_time"] = end
+    out["span_duration"] = pd.to_numeric(col("span_duration", 0.0), errors="coerce").fillna(0.0)
+    out["event_type"] = etype
+    out["priority"] = pd.to_numeric(col("priority", 0), errors="coerce").fillna(0)
+    out["side"] = side.where(side.isin(SIDES), "")
+    out["area"] = col("area", "").fillna("").astype(str)
+    out["sequence_id"] = pd.to_numeric(col("sequence_id", None), errors="coerce")
+    out["players"] = players
+    for c in ["short_text_neutral", "medium_text_neutral", "long_text_neutral"]:
+        out[c] = col(c, "").fillna("").astype(str).replace("nan", "")
+    return out.astype(EVENT_SCHEMA)
+
+def concat_events(frames):
+    """合并多张事件表；area 的类别集合各不相同，合并后重新转换一次"""
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames: return empty_events()
+    merged = pd.concat([f.astype({"area": "object"}) for f in frames], ignore_index=True)
+    return merged.astype(EVENT_SCHEMA)
@@ -0,0 +1,111 @@
+# features.py：整场比赛的位置特征库
+# 对降采样后的 tick 表一次性向量化计算，之后按 (回合, 秒) O(1) 查询
+import numpy as np
+import pandas as pd
+
+# 包点参考坐标取自 mapping_table 的锚点名
+BOMBSITE_ANCHORS = {"A": "A包", "B": "包点箱子上"}
+FEATURE_KEYS = ['round_num', 'sec', 'side']
+
+def get_bombsites():
+    try:
+        from mapping_table import anchors
+        sites = {}
+        for site, anchor_name in BOMBSITE_ANCHORS.items():
+            row = anchors[anchors['name'] == anchor_name].iloc[0]
+            sites[site] = (float(row['x']), float(row['y']))
+        return sites
+    except Exception:
+        return {}
+
+class FeatureStore:
+    """
+    teams:     index=(round_num, sec, side)，列 alive/cx/cy/spread/speed/dist_A/dist_B
+    occupancy: 列 round_num/sec/side/area/n，每队每个区域的人数
+    """
+    def __init__(self, teams, occupancy):
+        self.teams = teams
+        self.occupancy = occupancy
+
+        # 查询索引：{(round, sec): {side: {...}}}
+        self._teams = {}
+        for (r_num, sec, side), row in zip(teams.index, teams.to_dict('records')):
+            self._teams.setdefault((r_num, sec), {})[side] = row
+        self._areas = {}
+        for r_num, sec, side, area, n in occupancy[FEATURE_KEYS + ['area', 'n']].itertuples(index=False):
+            self._areas.setdefault((r_num, sec), {}).setdefault(side, {})[area] = int(n)
+
+    def __len__(self):
+        return len(self._teams)
+
+    def get(self, r_num, sec):
+        """返回 {side: 特征字典}，不存在时返回 {}"""
+        return self._teams.get((r_num, int(sec)), {})
+
+    def areas(self, r_num, sec):
+        """返回 {side: {area: 人数}}"""
+        return self._areas.get((r_num, int(sec)), {})
+
+    def describe(self, r_num, sec):
+        """生成可直接拼进 Prompt 的特征文本"""
+        teams = self.get(r_num, sec)
+        areas = self.areas(r_num, sec)
+        lines = []
+        for side in ['T', 'CT']:
+            f = teams.get(side)
+            if not f: continue
+            line = f"{side}: 存活{int(f['alive'])}人, 分散度{f['spread']:.0f}"
+            if not pd.isna(f.get('dist_A')): line += f", 距A包{f['dist_A']:.0f}"
+            if not pd.isna(f.get('dist_B')): line += f", 距B包{f['dist_B']:.0f}"
+            if not pd.isna(f.get('speed')): line += f", 平均移速{f['speed']:.0f}/s"
+            occ = areas.get(side, {})
+            if occ:
+                line += ", 分布: " + " ".join(f"{a}{n}" for a, n in sorted(occ.items(), key=lambda x: -x[1]))
+            lines.append(line)
+        return "\n".join(lines)
+
+def build_feature_store(df_pretreatment):
+    """整场一次遍历：重心、分散度、区域人数、到包点距离、移动速度"""
+    need = {'round_num', 'second', 'side', 'name', 'health', 'X', 'Y'}
+    if df_pretreatment is None or not need.issubset(df_pretreatment.columns):
+        return FeatureStore(pd.DataFrame(), pd.DataFrame(columns=FEATURE_KEYS + ['area', 'n']))
+
+    alive = df_pretreatment[df_pretreatment['health'] > 0]
+    alive = alive.assign(sec=alive['second'].astype(float).floordiv(1).astype(int))
+    if 'area' not in alive.columns: alive = alive.assign(area='Unknown')
+    alive = alive.sort_values(['round_num', 'name', 'sec'])
+
+    x = alive['X'].to_numpy(dtype=np.float64)
+    y = alive['Y'].to_numpy(dtype=np.float64)
+    sec = alive['sec'].to_numpy()
+
+    # 移动速度：同一回合同一选手相邻采样点的位移 / 时间
+    same = np.zeros(len(alive), dtype=bool)
+    if len(alive) > 1:
+        same[1:] = (alive['name'].to_numpy()[1:] == alive['name'].to_numpy()[:-1]) & \
+                   (alive['round_num'].to_numpy()[1:] == alive['round_num'].to_numpy()[:-1])
+    dt = np.diff(sec, prepend=sec[:1]).astype(np.float64) if len(alive) else np.array([])
+    step = np.hypot(np.diff(x, prepend=x[:1]), np.diff(y, prepend=y[:1])) if len(alive) else np.array([])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(same & (dt > 0), step / dt, np.nan)
+
+    cols = {'speed': speed}
+    for site, (sx, sy) in get_bombsites().items():
+        cols[f'dist_{site}'] = np.hypot(x - sx, y - sy)
+    alive = alive.assign(**cols)
+
+    grouped = alive.groupby(FEATURE_KEYS, observed=True)
+    cx = grouped['X'].transform('mean').to_numpy()
+    cy = grouped['Y'].transform('mean').to_numpy()
+    alive = alive.assign(_spread=np.hypot(x - cx, y - cy))
+
+    agg = {'alive': ('name', 'size'), 'cx': ('X', 'mean'), 'cy': ('Y', 'mean'),
+           'spread': ('_spread', 'mean'), 'speed': ('speed', 'mean')}
+    for c in cols:
+        if c.startswith('dist_'): agg[c] = (c, 'min')
+    teams = alive.groupby(FEATURE_KEYS, observed=True).agg(**agg)
+    for c in ['dist_A', 'dist_B']:
+        if c not in teams: teams[c] = np.nan
+
+    occupancy = alive.groupby(FEATURE_KEYS + ['area'], observed=True).size().reset_index(name='n')
+    return FeatureStore(teams, occupancy)
@@ -5,27 +5,35 @@ import time
 import json
 import uuid
 import concurrent.futures
-from openai import OpenAI
+from llm_gateway import get_client
 import warnings
 import config # 引入 config
+from kill_sequence import build_kill_sequences
+from events import to_event_table
+from tracing import span, submit_traced
+from prompts import build_messages
+from clean_cache import normalize_events
+from round_select import resolve_rounds, filter_rounds, plan_cache, merge_cache, load_cache, save_coverage
 
 warnings.filterwarnings('ignore')
 
 OPENAI_API_KEY = os.getenv("DASHSCOPE_API_KEY") 
-BASE_URL = "[https://dashscope.aliyuncs.com/compatible-mode/v1](https://dashscope.aliyuncs.com/compatible-mode/v1)"
 MODEL_NAME = "qwen3-max"
 MAX_WORKERS = 10 
 
-def analyze_kill_with_llm(client, event_data):
+def analyze_kill_with_llm(client, event_data, match_dir=None):
     if not client: return {"short": f"{event_data['attacker']}击杀{event_data['victim']}", "medium":"", "long":""}
-    desc = f"击杀: {event_data['attacker']} 用 {event_data['weapon']} 击杀 {event_data['victim']}."
-    if event_data['is_headshot']: desc += "爆头."
+    # 击杀序列事件自带本地算好的描述 (多杀/补枪/残局等)，单条击杀走旧格式
+    desc = event_data.get('description')
+    if not desc:
+        desc = f"击杀: {event_data['attacker']} 用 {event_data['weapon']} 击杀 {event_data['victim']}."
+        if event_data['is_headshot']: desc += "爆头."
     
     for _ in range(3):
         try:
             resp = client.chat.completions.create(
                 model=MODEL_NAME,
-                messages=[{"role": "system", "content": "你是CS2解说。输出JSON: {\"short\":\"...\", \"medium\":\"...\", \"long\":\"...\"}"}, {"role": "user", "content": desc}],
+                messages=build_messages("kill", desc, match_dir),
                 response_format={"type": "json_object"}
             )
             content = resp.choices[0].message.content
@@ -34,8 +42,8 @@ def analyze_kill_with_llm(client, event_data):
         except: time.sleep(0.5)
     return {"short": desc, "medium": "", "long": ""}
 
-def process_single_kill(client, evt):
-    res = analyze_kill_with_llm(client, evt)
+def process_single_kill(client, evt, match_dir=None):
+    res = analyze_kill_with_llm(client, evt, match_dir)
     evt['short_text_neutral'] = res.get('short', '')
     evt['medium_text_neutral'] = res.get('medium', '')
     evt['long_text_neutral'] = res.get('long', '')
@@ -43,7 +51,7 @@ def process_single_kill(client, evt):
     evt['event_type'] = 'kill'
     return evt
 
-def process_dem_file(demo_path, test_mode=False):
+def process_dem_file(demo_path, test_mode=False, utility_index=None, demo_tables=None, rounds=None, redo=False, match_state=None):
     print(f"🔫 [Kill] 开始分析击杀...")
     
     base_name = os.path.splitext(os.path.basename(demo_path))[0]
@@ -52,53 +60,55 @@ def process_dem_file(demo_path, test_mode=False):
     if not os.path.exists(cache_dir): os.makedirs(cache_dir)
     cache_path = os.path.join(cache_dir, "kill_gen_cache.csv")
     
-    if os.path.exists(cache_path):
-        try:
-            df = pd.read_csv(cache_path)
-            if not df.empty:
-                if test_mode and 'round_num' in df.columns:
-                    df = df[df['round_num'] == 1]
-                return df
-        except: pass
+    rounds = resolve_rounds(rounds, test_mode)
+    cached, covered = load_cache(cache_path)
+    # 选中回合都有缓存时直接返回，否则只生成缺的回合
+    todo, keep = plan_cache(cached, rounds, redo, covered)
+    if todo == []: return to_event_table(filter_rounds(keep, rounds), "kill")
 
-    from awpy import Demo
-    dem = Demo(demo_path)
-    dem.parse()
-    
-    kills = dem.kills
+    # 调度器已在子进程里解析过 demo 时直接读表，否则自己解析
+    if demo_tables is not None and demo_tables.has("kills"):
+        kills = demo_tables.pandas("kills")
+    else:
+        from awpy import Demo
+        dem = Demo(demo_path)
+        dem.parse()
+        kills = dem.kills
     if not isinstance(kills, pd.DataFrame): kills = kills.to_pandas()
-    if kills.empty: return pd.DataFrame()
+    kills = filter_rounds(kills, todo)
+    if kills.empty: return to_event_table(filter_rounds(keep, rounds), "kill")
     
-    processed_events = []
-    client = OpenAI(api_key=OPENAI_API_KEY, base_url=BASE_URL) if OPENAI_API_KEY else None
-
-    for k in kills.to_dict('records'):
-        r_num = k.get('round', k.get('round_num', 0))
-        if r_num == 0 or (test_mode and r_num != 1): continue
+    client = get_client(OPENAI_API_KEY) if OPENAI_API_KEY else None
 
-        tick = k.get('tick', 0)
-        evt = {
-            'round_num': int(r_num),
-            # 🔥🔥🔥 强制使用 64 Tick 🔥🔥🔥
-            'start_time': tick / float(config.TICKRATE),
-            'attacker': k.get('attacker_name', 'Unknown'),
-            'victim': k.get('victim_name', 'Unknown'),
-            'weapon': k.get('weapon', 'Unknown'),
-            'is_headshot': bool(k.get('headshot', False)),
-            'unique_key': str(uuid.uuid4())
-        }
-        processed_events.append(evt)
+    # 🔥🔥🔥 强制使用 64 Tick 🔥🔥🔥
+    # 本地先把击杀切成序列 (补枪/多杀/残局...)，一个序列只调用一次 LLM
+    tickrate = float(config.TICKRATE)
+    with span("kill_sequences", "pandas", kills=len(kills)):
+        processed_events = build_kill_sequences(kills, tickrate, rounds=todo)
+    for evt in processed_events:
+        if utility_index is not None:
+            utils = utility_index.describe(evt['round_num'], int(evt['start_time'] * tickrate))
+            if utils: evt['description'] += f"\n场上道具: {utils}"
+        if match_state is not None:
+            # 存活人数序列描述里已经有了，这里只补比分和双方选手本场数据
+            ctx = match_state.describe(evt['round_num'], int(evt['start_time'] * tickrate), [evt['attacker'], evt['victim']], alive=False)
+            if ctx: evt['description'] += f"\n{ctx}"
+        evt['unique_key'] = str(uuid.uuid4())
+    print(f"   [Kill] {len(kills)} 次击杀 -> {len(processed_events)} 个击杀序列")
 
     results = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_evt = {executor.submit(process_single_kill, client, evt): evt for evt in processed_events}
+        future_to_evt = {submit_traced(executor, process_single_kill, client, evt, output_dir): evt for evt in processed_events}
         for future in concurrent.futures.as_completed(future_to_evt):
             try: results.append(future.result())
             except: pass
             
     df = pd.DataFrame(results)
+    if not df.empty: df = normalize_events(df)
+    df = merge_cache(keep, df)
     if not df.empty:
         df = df.sort_values(by=['round_num', 'start_time']) # 排序
         df.to_csv(cache_path, index=False, encoding='utf-8-sig')
+        if client: save_coverage(cache_path, covered, todo, df)
         
-    return df
\ No newline at end of file
+    return to_event_table(filter_rounds(df, rounds), "kill")
\ No newline at end of file
@@ -0,0 +1,131 @@
+# kill_sequence.py：击杀序列分析 (本地向量化计算，不调用 LLM)
+# 把 dem.kills 切成“时间上连在一起”的击杀序列，标注首杀/补枪/多杀/残局/大狙，
+# 每个序列输出一条富信息事件，之后一个序列只生成一次解说
+import numpy as np
+import pandas as pd
+import config
+from mapping_table import nearest_locations
+
+SEQUENCE_GAP = 5.0   # 相邻击杀间隔 < 5s 视为同一序列
+TRADE_WINDOW = 4.0   # 被杀后 4s 内击杀凶手视为补枪
+TEAM_SIZE = 5
+
+def _col(df, name, default):
+    return df[name] if name in df.columns else pd.Series(default, index=df.index)
+
+def _norm_side(s):
+    s = s.astype(str).str.upper()
+    return s.replace({"TERRORIST": "T", "TERRORISTS": "T", "COUNTERTERRORIST": "CT"})
+
+def enrich_kills(kills, tickrate=None):
+    """逐条击杀加标注 (全部向量化)，返回按 (回合, tick) 排序的新表"""
+    tickrate = float(tickrate or config.TICKRATE)
+    if kills is None: return pd.DataFrame()
+    if not isinstance(kills, pd.DataFrame): kills = kills.to_pandas()
+    if kills.empty: return pd.DataFrame()
+
+    k = kills.copy()
+    if 'round_num' not in k.columns: k['round_num'] = _col(k, 'round', 0)
+    k = k[k['round_num'] > 0].sort_values(['round_num', 'tick']).reset_index(drop=True)
+    if k.empty: return k
+    n = len(k)
+
+    k['attacker_name'] = _col(k, 'attacker_name', 'Unknown').fillna('Unknown')
+    k['victim_name'] = _col(k, 'victim_name', 'Unknown').fillna('Unknown')
+    k['attacker_side'] = _norm_side(_col(k, 'attacker_side', ''))
+    k['victim_side'] = _norm_side(_col(k, 'victim_side', ''))
+    k['weapon'] = _col(k, 'weapon', 'Unknown').fillna('Unknown').astype(str)
+    k['headshot'] = _col(k, 'headshot', False).fillna(False).astype(bool)
+
+    rnd = k['round_num'].to_numpy()
+    tick = k['tick'].to_numpy()
+
+    # 1. 序列切分：换回合或间隔超过阈值即新序列
+    new_seq = np.ones(n, dtype=bool)
+    new_seq[1:] = (rnd[1:] != rnd[:-1]) | (np.diff(tick) > SEQUENCE_GAP * tickrate)
+    k['sequence_id'] = np.cumsum(new_seq) - 1
+
+    # 2. 首杀
+    k['is_opening'] = k.groupby('round_num').cumcount().eq(0)
+
+    # 3. 补枪：本次的受害者是窗口内上一次击杀的凶手
+    left = pd.DataFrame({'i': np.arange(n), 'round_num': rnd, 'tick': tick, 'name': k['victim_name'].to_numpy()})
+    right = pd.DataFrame({'round_num': rnd, 'tick_prev': tick, 'name': k['attacker_name'].to_numpy()})
+    m = left.merge(right, on=['round_num', 'name'])
+    dt = m['tick'] - m['tick_prev']
+    traded = m.loc[(dt > 0) & (dt <= TRADE_WINDOW * tickrate), 'i'].unique()
+    k['is_trade'] = np.isin(np.arange(n), traded)
+
+    # 4. 多杀：本回合该选手第几个击杀 (不算误伤)
+    valid = k['attacker_side'] != k['victim_side']
+    k['round_kill_no'] = valid.astype(int).groupby([k['round_num'], k['attacker_name']]).cumsum()
+
+    # 5. 存活人数与残局
+    for side in ['T', 'CT']:
+        dead = (k['victim_side'] == side).astype(int).groupby(k['round_num']).cumsum()
+        k[f'alive_{side}'] = (TEAM_SIZE - dead).clip(lower=0)
+    for side, other in [('T', 'CT'), ('CT', 'T')]:
+        clutch = (k[f'alive_{side}'] == 1) & (k[f'alive_{other}'] >= 2)
+        prev = clutch.groupby(k['round_num']).shift(1, fill_value=False).astype(bool)
+        k[f'clutch_{side}'] = clutch & ~prev
+
+    # 6. 大狙与位置
+    k['is_awp'] = k['weapon'].str.lower().eq('awp')
+    for who in ['attacker', 'victim']:
+        if f'{who}_X' in k.columns and f'{who}_Y' in k.columns:
+            k[f'{who}_location'] = nearest_locations(k[f'{who}_X'].fillna(0), k[f'{who}_Y'].fillna(0))
+        else:
+            k[f'{who}_location'] = ""
+    return k
+
+def _sequence_event(seq, tickrate):
+    first, last = seq.iloc[0], seq.iloc[-1]
+    r_num = int(first['round_num'])
+    lines, tags = [], []
+
+    for row in seq.itertuples(index=False):
+        line = f"{row.attacker_name}({row.weapon}) 击杀 {row.victim_name}"
+        if row.headshot: line += " 爆头"
+        if row.attacker_location or row.victim_location:
+            line += f" [{row.attacker_location or '?'}→{row.victim_location or '?'}]"
+        lines.append(line)
+
+        if row.is_opening: tags.append("首杀")
+        if row.is_trade: tags.append(f"{row.attacker_name}补枪")
+        if row.is_awp: tags.append(f"{row.attacker_name}大狙击杀")
+        if row.round_kill_no >= 3: tags.append(f"{row.attacker_name}本回合{int(row.round_kill_no)}杀")
+        if row.clutch_T: tags.append(f"T进入1v{int(row.alive_CT)}残局")
+        if row.clutch_CT: tags.append(f"CT进入1v{int(row.alive_T)}残局")
+
+    multi = seq.groupby('attacker_name').size()
+    for name, cnt in multi[multi >= 2].items():
+        tags.append(f"{name} {cnt}连杀")
+    tags = list(dict.fromkeys(tags))
+
+    desc = "击杀序列:\n" + "\n".join(f"  - {l}" for l in lines)
+    if tags: desc += f"\n亮点: {'，'.join(tags)}"
+    desc += f"\n场上人数: T {int(last['alive_T'])} vs CT {int(last['alive_CT'])}"
+
+    return {
+        'round_num': r_num,
+        'sequence_id': int(first['sequence_id']),
+        'start_time': float(first['tick']) / tickrate,
+        'span_duration': float(last['tick'] - first['tick']) / tickrate,
+        'kill_count': len(seq),
+        'attacker': first['attacker_name'],
+        'victim': first['victim_name'],
+        'weapon': first['weapon'],
+        'is_headshot': bool(first['headshot']),
+        'tags': "，".join(tags),
+        'alive_T': int(last['alive_T']),
+        'alive_CT': int(last['alive_CT']),
+        'description': desc,
+    }
+
+def build_kill_sequences(kills, tickrate=None, rounds=None):
+    """返回每个击杀序列一条的事件列表；rounds 非空时只保留这些回合"""
+    tickrate = float(tickrate or config.TICKRATE)
+    k = enrich_kills(kills, tickrate)
+    if k.empty: return []
+    if rounds is not None: k = k[k['round_num'].isin(list(rounds))]
+    return [_sequence_event(seq, tickrate) for _, seq in k.groupby('sequence_id', sort=True)]
@@ -0,0 +1,28 @@
+# lazy_loader.py：按需导入模块，并记录每个模块第一次导入的耗时
+# awpy / polars / scipy / openai 这类重依赖只在真正用到的阶段才加载
+import time
+import importlib
+import threading
+
+IMPORT_TIMES = {}  # 模块名 -> 首次导入耗时 (秒)
+_lock = threading.Lock()  # 只保护 IMPORT_TIMES；导入本身由 import 系统的模块锁串行化，不能在这把锁里导入 (被导入模块再 load() 会死锁)
+
+def load(module_name, attr=None):
+    """导入 module_name (可选取其属性)；失败时打印原因并返回 None"""
+    try:
+        t0 = time.perf_counter()
+        module = importlib.import_module(module_name)
+        elapsed = time.perf_counter() - t0
+        with _lock: IMPORT_TIMES.setdefault(module_name, elapsed)
+    except Exception as e:
+        print(f"   ⚠️ [Import] 无法加载 {module_name}: {e}")
+        return None
+    return getattr(module, attr, None) if attr else module
+
+def import_report():
+    """按耗时排序的导入报告"""
+    if not IMPORT_TIMES: return "   (没有延迟导入的模块)"
+    rows = sorted(IMPORT_TIMES.items(), key=lambda kv: -kv[1])
+    lines = [f"   {name:<20}{sec * 1000:>9.0f} ms" for name, sec in rows]
+    lines.append(f"   {'合计':<20}{sum(IMPORT_TIMES.values()) * 1000:>9.0f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,214 @@
+# llm_gateway.py：进程内共享的 LLM 网关
+# 所有模块通过 get_client() 拿到同一个客户端：共用一个 OpenAI 连接、一个并发/速率预算和一份响应缓存。
+# 网关对外保持 client.chat.completions.create(...) 的接口，调用点不用改写法
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+import config
+from tracing import get_tracer
+
+DEFAULT_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", config.LLM_MAX_CONCURRENCY))  # 同时在途的请求数 (全进程共享)
+MAX_RPM = float(os.getenv("LLM_MAX_RPM", "0"))                 # 每分钟请求上限，0 表示不限
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache", "responses.jsonl"))  # 设为空串则不落盘
+BASE_URL_OVERRIDE = os.getenv("LLM_BASE_URL")  # 设置后所有模块都改连这个地址 (如本地桩服务)
+MAX_CACHE_ENTRIES = 20000                      # 内存里最多保留的响应条数 (LRU)，落盘文件不受影响
+MAX_PREFIXES = 4096                            # 前缀复用统计最多记住的前缀数
+MAX_RETRIES = 2                                # 限流/5xx/网络错误时网关自己重试的次数
+RETRY_BACKOFF = 0.5                            # 重试退避基数 (秒)，按 2^n 增长
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_planner = None  # --plan 预演时设置：请求只记账不发送
+
+def set_planner(planner):
+    global _planner
+    _planner = planner
+
+def request_key(kwargs):
+    """同一模型 + 同一组消息 + 同一参数视为同一请求"""
+    payload = json.dumps(kwargs, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def prefix_key(kwargs):
+    """除最后一条消息以外的部分 (模型 + 固定前缀)，用来统计前缀复用"""
+    messages = kwargs.get("messages") or []
+    payload = json.dumps([kwargs.get("model"), messages[:-1]], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _retry_after(exc, attempt):
+    """优先用服务端给的 retry-after，否则指数退避"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for key, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try: return min(30.0, float(headers[key]) * scale)
+        except (KeyError, TypeError, ValueError): continue
+    return RETRY_BACKOFF * (2 ** attempt)
+
+def _retryable(exc):
+    if getattr(exc, "status_code", None) in RETRYABLE_STATUS: return True
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+def _cached_response(content):
+    message = SimpleNamespace(content=content, role="assistant")
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+class LLMGateway:
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, max_concurrency=MAX_CONCURRENCY,
+                 max_rpm=MAX_RPM, cache_path=CACHE_PATH):
+        self._client_args = {"api_key": api_key, "base_url": base_url}
+        self._client = None
+        self.cache_path = cache_path
+        self.stats = {"requests": 0, "cache_hits": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                      "prefix_hits": 0, "cached_tokens": 0}
+        self._sem = threading.Semaphore(max_concurrency)
+        self._interval = 60.0 / max_rpm if max_rpm else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()  # 只管追加写缓存文件，不挡住其它线程的统计/查缓存
+        self._local = threading.local()
+        self._prefixes = OrderedDict()
+        self._cache = self._load_cache()
+        # 兼容 OpenAI 客户端的调用方式
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @property
+    def client(self):
+        """openai 在第一次真正发请求时才导入"""
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+                # 重试由网关自己做，才能统计重试次数
+                self._client = OpenAI(max_retries=0, **self._client_args)
+            return self._client
+
+    def _load_cache(self):
+        cache = OrderedDict()
+        if not self.cache_path or not os.path.exists(self.cache_path): return cache
+        with open(self.cache_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    cache[rec["key"]] = rec["content"]
+                    cache.move_to_end(rec["key"])
+                    if len(cache) > MAX_CACHE_ENTRIES: cache.popitem(last=False)
+                except Exception: continue
+        return cache
+
+    def _lookup(self, key):
+        with self._lock:
+            content = self._cache.get(key)
+            if content is not None: self._cache.move_to_end(key)
+            return content
+
+    def _store(self, key, content):
+        with self._lock:
+            self._cache[key] = content
+            self._cache.move_to_end(key)
+            if len(self._cache) > MAX_CACHE_ENTRIES: self._cache.popitem(last=False)
+        if not self.cache_path: return
+        line = json.dumps({"key": key, "content": content}, ensure_ascii=False) + "\n"
+        with self._file_lock:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "a", encoding="utf-8") as f: f.write(line)
+
+    def _wait_rate(self):
+        if not self._interval: return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now: time.sleep(slot - now)
+
+    def create(self, **kwargs):
+        key = request_key(kwargs)
+        if _planner is not None: return _cached_response(_planner.record(key, kwargs))
+        tracer = get_tracer()
+        t_call = time.time_ns() // 1000
+        # 同一线程紧接着发出相同请求说明上次结果没用上 (解析失败后重试)，这时跳过缓存
+        retry = getattr(self._local, "last_key", None) == key
+        self._local.last_key = key
+        cached = None if retry else self._lookup(key)
+        if cached is not None:
+            with self._lock: self.stats["cache_hits"] += 1
+            tracer.record("chat", "llm", t_call, time.time_ns() // 1000, model=kwargs.get("model"), cache_hit=True)
+            return _cached_response(cached)
+
+        telemetry = {"model": kwargs.get("model"), "cache_hit": False, "caller_retry": retry, "retries": 0}
+        # 同一前缀之前发过，服务商那边大概率命中前缀缓存
+        pk = prefix_key(kwargs)
+        with self._lock:
+            telemetry["prefix_hit"] = pk in self._prefixes
+            self._prefixes[pk] = True
+            self._prefixes.move_to_end(pk)
+            if len(self._prefixes) > MAX_PREFIXES: self._prefixes.popitem(last=False)
+        t_sent = t_call
+        try:
+            with self._sem:
+                self._wait_rate()
+                t_sent = time.time_ns() // 1000
+                telemetry["queue_wait_s"] = (t_sent - t_call) / 1e6
+                for attempt in range(MAX_RETRIES + 1):
+                    try:
+                        resp = self.client.chat.completions.create(**kwargs)
+                        break
+                    except Exception as e:
+                        if attempt >= MAX_RETRIES or not _retryable(e): raise
+                        telemetry["retries"] += 1
+                        time.sleep(_retry_after(e, attempt))
+        except Exception as e:
+            with self._lock: self.stats["errors"] += 1
+            telemetry["error"] = type(e).__name__
+            tracer.record("chat", "llm", t_call, time.time_ns() // 1000, **telemetry)
+            raise
+
+        usage = getattr(resp, "usage", None)
+        telemetry["prompt_tokens"] = (getattr(usage, "prompt_tokens", 0) or 0) if usage is not None else 0
+        telemetry["completion_tokens"] = (getattr(usage, "completion_tokens", 0) or 0) if usage is not None else 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        telemetry["cached_tokens"] = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+        telemetry["latency_s"] = (time.time_ns() // 1000 - t_sent) / 1e6
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["retries"] += telemetry["retries"]
+            self.stats["prompt_tokens"] += telemetry["prompt_tokens"]
+            self.stats["completion_tokens"] += telemetry["completion_tokens"]
+            self.stats["prefix_hits"] += telemetry["prefix_hit"]
+            self.stats["cached_tokens"] += telemetry["cached_tokens"]
+        tracer.record("chat", "llm", t_call, time.time_ns() // 1000, **telemetry)
+        content = resp.choices[0].message.content
+        if content: self._store(key, content)
+        return resp
+
+    def snapshot(self):
+        with self._lock: return dict(self.stats)
+
+    def summary(self, since=None):
+        """统计摘要；给了 since (snapshot() 的结果) 时只算那之后的增量"""
+        s = self.snapshot()
+        if since: s = {k: v - since.get(k, 0) for k, v in s.items()}
+        total = s["requests"] + s["cache_hits"]
+        hit = s["cache_hits"] / total if total else 0.0
+        return (f"请求 {s['requests']} 次, 缓存命中 {s['cache_hits']} 次 ({hit:.0%}), 重试 {s['retries']} 次, 失败 {s['errors']} 次, "
+                f"tokens {s['prompt_tokens']} + {s['completion_tokens']}, 前缀复用 {s['prefix_hits']} 次 (服务端缓存 {s['cached_tokens']} tokens)")
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+def normalize_base_url(base_url):
+    """同一个地址的不同写法 (markdown 链接、末尾斜杠) 归成一个，避免拆出绕开共享预算的第二个网关"""
+    found = re.search(r"https?://[^\s\])]+", str(base_url or ""))
+    return found.group(0).rstrip("/") if found else DEFAULT_BASE_URL
+
+def get_client(api_key=None, base_url=DEFAULT_BASE_URL):
+    """按 (api_key, base_url) 返回进程内唯一的网关"""
+    api_key = api_key or os.getenv("DASHSCOPE_API_KEY") or os.getenv("OPENAI_API_KEY")
+    base_url = normalize_base_url(BASE_URL_OVERRIDE or base_url)
+    with _gateways_lock:
+        gw = _gateways.get((api_key, base_url))
+        if gw is None:
+            gw = _gateways[(api_key, base_url)] = LLMGateway(api_key, base_url)
+        return gw
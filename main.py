@@ -1,9 +1,10 @@
+import time
+_START = time.perf_counter()
+
 import os
 import argparse
-import subprocess
-import sys
-from dotenv import load_dotenv 
-from master_scheduler import MasterScheduler
+from dotenv import load_dotenv
+from lazy_loader import load, import_report
 
 # 加载 .env 文件中的变量
 load_dotenv()
@@ -11,70 +12,121 @@ load_dotenv()
 # 从环境变量获取 Key
 MY_API_KEY = os.getenv("DASHSCOPE_API_KEY")
 
-def run_script(script_name, test_mode=False):
-    """辅助函数：运行外部脚本"""
-    if not os.path.exists(script_name):
-        print(f"⚠️ [Skipped] 找不到脚本: {script_name}，跳过该步骤。")
+STAGES = ["clean", "schedule", "style"]
+
+def run_stage(name, fn, *args, **kwargs):
+    """辅助函数：在当前进程里执行一个阶段 (不再另起解释器)"""
+    print(f"\n🚀 [Auto-Runner] 正在执行: {name} ...")
+    t0 = time.perf_counter()
+    try:
+        fn(*args, **kwargs)
+    except Exception as e:
+        print(f"❌ [Error] {name} 运行出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    print(f"✅ [Success] {name} 执行完毕。({time.perf_counter() - t0:.1f}s)")
+    return True
+
+def clean_stage(demo_paths=()):
+    # 本次要处理的 demo 不参与缓存淘汰
+    keep = [os.path.splitext(os.path.basename(p))[0] for p in demo_paths if p]
+    load("clean_cache", "main")(keep=keep)
+
+def style_stage(personas=None):
+    style_rewriter = load("style_rewriter")
+    style_rewriter.MY_API_KEY = MY_API_KEY
+    target_files = style_rewriter.find_schedule_files()
+    if not target_files:
+        print("⚠️ 未找到 final_schedule.csv，请先运行主程序。")
         return
-    
-    print(f"\n🚀 [Auto-Runner] 正在执行: {script_name} ...")
-    # 使用当前解释器运行脚本
-    # 如果是 style_rewriter.py 且测试模式，通过环境变量传递
-    env = os.environ.copy()
-    if script_name == "style_rewriter.py" and test_mode:
-        env["TEST_MODE"] = "1"
-    
-    result = subprocess.run([sys.executable, script_name], capture_output=False, env=env)
-    
-    if result.returncode != 0:
-        print(f"❌ [Error] {script_name} 运行出错！")
+    personas = personas or os.getenv("STYLE_PERSONAS") or ",".join(style_rewriter.DEFAULT_PERSONAS)
+    style_rewriter.rewrite_files(target_files, style_rewriter.parse_persona_list(personas))
+
+def schedule_stage(demo=None, demo_paths=None, test_mode=False, jobs=None, rounds=None, redo=False):
+    print("\n⚔️ [Master] 开始运行主调度器 (v3.3 固定64Tick版)...")
+    if demo_paths:
+        # 批量：共享进程池与 LLM 网关
+        batch_runner = load("batch_runner")
+        batch_runner.run_batch(demo_paths, MY_API_KEY, test_mode=test_mode, demo_workers=jobs or batch_runner.DEMO_WORKERS, rounds=rounds, redo=redo)
     else:
-        print(f"✅ [Success] {script_name} 执行完毕。")
+        # 实例化并运行
+        scheduler = load("master_scheduler", "MasterScheduler")(demo, MY_API_KEY, test_mode=test_mode, rounds=rounds, redo=redo)
+        scheduler.run()
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--demo", type=str, required=True, help="Demo文件路径")
+    parser.add_argument("--demo", type=str, default=None, help="Demo文件路径")
+    parser.add_argument("--batch", type=str, default=None, help="批量模式：demo 目录或通配符 (如 \"event/*.dem\")")
+    parser.add_argument("--jobs", type=int, default=None, help="批量模式下同时调度的 demo 数")
     parser.add_argument("--test", action="store_true", help="测试模式：只生成第一回合的文本")
+    parser.add_argument("--rounds", type=str, default=None, help="只处理指定回合，如 \"3,7,9\" 或 \"1-5,13\" (默认整场)")
+    parser.add_argument("--redo", action="store_true", help="忽略选中回合已有的模块缓存，重新生成")
+    parser.add_argument("--personas", type=str, default=None, help="风格润色人设，逗号分隔 (如 machine,classic,english)")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES), help=f"要执行的阶段，逗号分隔 (可选: {', '.join(STAGES)})")
+    parser.add_argument("--plan", action="store_true", help="预演：只跑解析和 prompt 构建，估算请求数/tokens/耗时，不调用模型")
+    parser.add_argument("--import-report", action="store_true", help="结束时打印各模块导入耗时")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="所有模块共享的 LLM 并发请求数 (默认见 config.LLM_MAX_CONCURRENCY)")
     args = parser.parse_args()
+    # 网关在第一次 load 时才导入，在那之前写进环境变量即可生效
+    if args.llm_concurrency: os.environ["LLM_MAX_CONCURRENCY"] = str(max(1, args.llm_concurrency))
+
+    try: rounds = load("round_select", "parse_rounds")(args.rounds)
+    except ValueError: parser.error(f"--rounds 格式不对: {args.rounds}")
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown: parser.error(f"未知阶段: {', '.join(unknown)}")
 
-    if not os.path.exists(args.demo):
-        print(f"❌ 找不到文件: {args.demo}")
+    demo_paths = []
+    if "schedule" in stages or args.plan:
+        if bool(args.demo) == bool(args.batch):
+            parser.error("--demo 和 --batch 必须且只能指定一个")
+        if args.batch:
+            demo_paths = load("batch_runner", "find_demos")(args.batch)
+            if not demo_paths:
+                print(f"❌ 没有找到 demo: {args.batch}")
+                return
+        elif not os.path.exists(args.demo):
+            print(f"❌ 找不到文件: {args.demo}")
+            return
+
+    if args.plan:
+        personas = args.personas or os.getenv("STYLE_PERSONAS")
+        parse_personas = load("style_rewriter", "parse_persona_list")
+        load("planner", "run_plan")(demo_paths or [args.demo], MY_API_KEY, args.test, parse_personas(personas) if personas else None, rounds)
         return
 
-    if not MY_API_KEY:
+    if not MY_API_KEY and stages != ["clean"]:
         print("❌ 错误：未找到 API Key！请确保项目根目录下有 .env 文件并配置了 DASHSCOPE_API_KEY")
         return
 
+    # 设置环境变量，确保子模块能读到 Key
+    if MY_API_KEY:
+        os.environ["DASHSCOPE_API_KEY"] = MY_API_KEY
+        os.environ["OPENAI_API_KEY"] = MY_API_KEY
+    print(f"⏱️ [Startup] 启动耗时 {(time.perf_counter() - _START) * 1000:.0f} ms")
+
     # ==========================================
     # 第一步：数据清洗 (Clean Module)
     # ==========================================
-    run_script("clean_cache.py", test_mode=args.test)
+    if "clean" in stages: run_stage("clean_cache", clean_stage, demo_paths or [args.demo])
 
     # ==========================================
     # 第二步：核心调度与生成 (Master Scheduler)
     # ==========================================
-    print("\n⚔️ [Master] 开始运行主调度器 (v3.3 固定64Tick版)...")
-    try:
-        # 设置环境变量，确保子模块能读到 Key
-        os.environ["DASHSCOPE_API_KEY"] = MY_API_KEY
-        os.environ["OPENAI_API_KEY"] = MY_API_KEY
-        
-        # 实例化并运行
-        scheduler = MasterScheduler(args.demo, MY_API_KEY, test_mode=args.test)
-        scheduler.run()
-        
-    except Exception as e:
-        print(f"❌ 运行调度器出错: {e}")
-        import traceback
-        traceback.print_exc()
-        return 
+    if "schedule" in stages:
+        if not run_stage("master_scheduler", schedule_stage, args.demo, demo_paths, args.test, args.jobs, rounds, args.redo): return
 
     # ==========================================
     # 第三步：风格润色 (Style Rewriter)
     # ==========================================
-    run_script("style_rewriter.py", test_mode=args.test)
+    if "style" in stages: run_stage("style_rewriter", style_stage, args.personas)
 
+    if args.import_report:
+        print("\n📦 [Import] 延迟导入耗时:")
+        print(import_report())
     print("\n🎉🎉🎉 全流程执行完毕！可以直接去 data 文件夹看结果了！")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 # 这里是你刚才提供的完整数据，包含了 macro 字段
@@ -67,3 +68,13 @@ def mapping_table(x, y, z):#输入一组坐标值，返回对应的游戏点位
             if abs(row.z-z) <= abs(clostest[2]-z):#距离相同时按z值接近程度判断
                 clostest = [dist_square, row.name, row.z]
     return clostest[1]
+
+
+def nearest_locations(xs, ys):#向量化版本：输入坐标数组，返回每个点最近的游戏点位名
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if xs.size == 0: return np.array([], dtype=object)
+    ax = anchors['x'].to_numpy(dtype=np.float64)
+    ay = anchors['y'].to_numpy(dtype=np.float64)
+    d2 = (xs[:, None] - ax[None, :]) ** 2 + (ys[:, None] - ay[None, :]) ** 2
+    return anchors['name'].to_numpy()[np.argmin(d2, axis=1)]
@@ -2,44 +2,53 @@ import pandas as pd
 import numpy as np
 import os
 import sys
+import time
+import uuid
 import concurrent.futures
-from openai import OpenAI
-from awpy import Demo 
+from llm_gateway import get_client
 import config 
-
-# 全局变量
-run_tactical_analysis = None
-set_tactical_api = None
-run_grenade_analysis = None
-set_grenade_api = None
-process_dem_file = None
-get_eco_df = None
-extract_specified_player_data_wrapper = None
+from utility_index import build_utility_index
+from match_state import build_match_state
+from events import concat_events
+from airtime import schedule_airtime, priority_weights, estimate_speech_duration
+from mem_profile import MemoryProfiler, run_profiled
+from tick_store import load_tick_store
+from lazy_loader import load
+from tracing import get_tracer, export_chrome_trace, summary_table, run_scope, submit_traced
+from contextlib import contextmanager
+from prompts import build_messages, register_match
+from dedup import suppress_near_duplicates
+from round_select import resolve_rounds, filter_rounds
 
 MERGE_THRESHOLD = 5.0  
 MAX_MERGE_COUNT = 3    
 COMPRESS_MODEL = "qwen-max"
-COMPRESS_PROMPT = "你是一名CS2解说。请将多条解说文案合并为一句简练、紧凑的解说。要求：保留关键信息，字数限制30字以内，口语化。"
-
-print("📦 [System] 加载模块...")
-try: from data_analysis import run_tactical_analysis, setAPI as set_tactical_api
-except: pass
-try: from createTexts import run_grenade_analysis, setAPI_KEY as set_grenade_api
-except: pass
-try: from read_demo import makeCSV
-except: pass
-try: from final_kill import process_dem_file
-except: pass
-try: from eco_and_round import get_events_df as get_eco_df
-except: pass
-try: from pretreatment import extract_specified_player_data_wrapper
-except: pass
+
+# 各阶段入口 (模块名, 函数名)：第一次用到时才导入，只跑部分阶段时不会加载 awpy/scipy 等重依赖
+STAGE_ENTRIES = {
+    "parse_tables": ("demo_tables", "parse_demo_tables"),
+    "demo_tables": ("demo_tables", "DemoTables"),
+    "pretreatment": ("pretreatment", "extract_specified_player_data_wrapper"),
+    "pretreatment_job": ("pretreatment", "pretreatment_job"),
+    "kill": ("final_kill", "process_dem_file"),
+    "economy": ("eco_and_round", "get_events_df"),
+    "grenade": ("createTexts", "run_grenade_analysis"),
+    "grenade_api": ("createTexts", "setAPI_KEY"),
+    "tactical": ("data_analysis", "run_tactical_analysis"),
+    "tactical_api": ("data_analysis", "setAPI"),
+}
+
+def stage_entry(name):
+    return load(*STAGE_ENTRIES[name])
 
 class MasterScheduler:
-    def __init__(self, demo_path, api_key, test_mode=False):
+    def __init__(self, demo_path, api_key, test_mode=False, progress=None, table_paths=None, rounds=None, redo=False):
         self.demo_path = demo_path
         self.api_key = api_key
         self.test_mode = test_mode
+        # 要处理的回合 (None 为整场)，test_mode 等价于只选第 1 回合；redo 时选中回合的模块缓存作废重做
+        self.rounds = resolve_rounds(rounds, test_mode)
+        self.redo = redo
         self.base_name = os.path.splitext(os.path.basename(demo_path))[0]
         self.output_dir = os.path.join("data", self.base_name)
         
@@ -49,16 +58,79 @@ class MasterScheduler:
         for d in [self.output_dir, self.raw_dir, self.cache_dir, self.output_final_dir]:
             if not os.path.exists(d): os.makedirs(d)
             
-        self.client = OpenAI(api_key=api_key, base_url="https://dashscope.aliyuncs.com/compatible-mode/v1")
+        self.client = get_client(api_key)
         self.tickrate = float(config.TICKRATE)
+        self.time_offsets = {"upper": 0.0, "lower": 0.0}
+        self.utility_index = None
+        self.match_state = None
+        self.demo_tables = None
+        self.table_paths = table_paths  # 已有解析好的表 (如合成测试数据) 时跳过解析
+        self.df_pretreatment = None
+        self.module_times = {}
+        self.mem = MemoryProfiler()
+        # 本次运行的 trace id：批量模式下多个 demo 共用一个 tracer，导出时按它过滤
+        self.run_id = f"{self.base_name}-{uuid.uuid4().hex[:8]}"
+        # progress(event: dict)：服务模式用来把阶段进度和中间排期推给客户端
+        self.progress = progress
+
+    def _emit(self, stage, **data):
+        if self.progress is None: return
+        try: self.progress({"stage": stage, **data})
+        except Exception as e: print(f"   ⚠️ 进度回调失败: {e}")
+
+    def _emit_partial(self, all_dfs):
+        """已完成模块的事件先排一版 (不做 LLM 压缩)，给客户端预览；只读调度器状态，预览失败不影响模块结果"""
+        if self.progress is None or not all_dfs: return
+        try: schedule, _ = self.step5_schedule_and_output(self.step3_merge(all_dfs))
+        except Exception as e:
+            print(f"   ⚠️ 中间排期预览失败: {e}")
+            return
+        self._emit("partial_schedule", rows=schedule.to_dict('records'))
+
+    def step0_parse(self, executor=None):
+        """demo 只在子进程里解析一次，导出 Arrow 表；进程池不可用时退回本进程解析"""
+        print("🔄 [Step 0] 解析 Demo...")
+        table_dir = os.path.join(self.raw_dir, "tables")
+        parse_demo_tables = stage_entry("parse_tables")
+        if self.table_paths:
+            self.demo_tables = stage_entry("demo_tables")(self.table_paths)
+        elif parse_demo_tables:
+            try:
+                if executor is not None:
+                    paths, record = executor.submit(run_profiled, "解析(子进程)", parse_demo_tables, self.demo_path, table_dir).result()
+                    self._add_child_record(record)
+                else:
+                    paths = parse_demo_tables(self.demo_path, table_dir)
+                self.demo_tables = stage_entry("demo_tables")(paths)
+            except Exception as e:
+                print(f"   ⚠️ 子进程解析失败，各模块将自行解析: {e}")
         self.time_offsets = self._calculate_half_offsets()
+        # 各模块 prompt 共用的比赛信息 (地图、阵容)，放在 system 前缀里方便服务商做前缀缓存
+        register_match(self.output_dir, self.demo_tables)
 
     def _calculate_half_offsets(self):
         print(f"🕒 [Scheduler] 计算时间锚点 (Tickrate=64)...")
         try:
-            dem = Demo(self.demo_path)
-            dem.parse() 
-            rounds = dem.rounds.to_pandas() if hasattr(dem.rounds, 'to_pandas') else pd.DataFrame(dem.rounds)
+            if self.demo_tables is not None:
+                rounds = self.demo_tables.pandas("rounds")
+                smokes, infernos = self.demo_tables.polars("smokes"), self.demo_tables.polars("infernos")
+                kills, economy = self.demo_tables.pandas("kills"), self.demo_tables.pandas("economy")
+            else:
+                dem = load("awpy", "Demo")(self.demo_path)
+                dem.parse() 
+                rounds = dem.rounds.to_pandas() if hasattr(dem.rounds, 'to_pandas') else pd.DataFrame(dem.rounds)
+                smokes, infernos = getattr(dem, 'smokes', None), getattr(dem, 'infernos', None)
+                kills, economy = getattr(dem, 'kills', None), None
+            # 顺便构建场上道具索引，战术/击杀模块按时刻查询
+            try:
+                self.utility_index = build_utility_index(smokes, infernos, self.tickrate)
+                print(f"   🧱 道具索引: {len(self.utility_index)} 条")
+            except Exception as e: print(f"   ⚠️ 道具索引构建失败: {e}")
+            # 以及整场的局势快照 (比分/存活/击杀/资金)，各模块按 (回合, tick) 查询
+            try:
+                self.match_state = build_match_state(kills, rounds, economy, self.tickrate)
+                print(f"   📊 局势快照: {len(self.match_state)} 回合")
+            except Exception as e: print(f"   ⚠️ 局势快照构建失败: {e}")
             
             offset_upper = 0.0
             offset_lower = 0.0
@@ -78,145 +150,221 @@ class MasterScheduler:
             return {"upper": offset_upper, "lower": offset_lower}
         except: return {"upper": 0.0, "lower": 0.0}
 
-    def step1_pretreatment(self):
+    def step1_pretreatment(self, executor=None):
+        """
+        tick 级预处理是 CPU 密集型：有进程池时提交到子进程并立即返回 Future，
+        结果通过 Arrow IPC 交回；没有进程池时同步执行
+        """
         print("🔄 [Step 1] 提取基础数据...")
+        csv_path = os.path.join(self.raw_dir, "1_raw_data.csv")
+        pretreatment_job = stage_entry("pretreatment_job") if executor is not None else None
+        if pretreatment_job:
+            table_paths = self.demo_tables.paths if self.demo_tables is not None else None
+            return executor.submit(run_profiled, "预处理(子进程)", pretreatment_job, self.demo_path, table_paths, csv_path, os.path.join(self.raw_dir, "1_pretreatment.arrow"), self.rounds)
+        extract_specified_player_data_wrapper = stage_entry("pretreatment")
         if extract_specified_player_data_wrapper:
             try:
-                self.df_pretreatment = extract_specified_player_data_wrapper(self.demo_path, os.path.join(self.raw_dir, "1_raw_data.csv"))
-                if self.test_mode and self.df_pretreatment is not None:
-                    self.df_pretreatment = self.df_pretreatment[self.df_pretreatment['round_num'] == 1]
+                self._set_pretreatment(extract_specified_player_data_wrapper(self.demo_path, csv_path, self.demo_tables, self.rounds))
                 return True
             except: pass
         return False
 
-    def step2_collect_all_modules(self):
+    def _set_pretreatment(self, df):
+        if df is not None and not df.empty:
+            df = filter_rounds(df, self.rounds)
+        self.df_pretreatment = df
+
+    def _collect_pretreatment(self, future):
+        try:
+            arrow_path, record = future.result()
+            self._add_child_record(record)
+            if arrow_path: self._set_pretreatment(load_tick_store(arrow_path))
+        except Exception as e: print(f"   ❌ 预处理失败: {e}")
+
+    def step2_collect_all_modules(self, pretreatment_future=None):
         print("🔄 [Step 2] 并行生成...")
-        if set_tactical_api: set_tactical_api(self.api_key)
-        if set_grenade_api: set_grenade_api(self.api_key)
+        process_dem_file, get_eco_df = stage_entry("kill"), stage_entry("economy")
+        run_grenade_analysis, run_tactical_analysis = stage_entry("grenade"), stage_entry("tactical")
+        for api in ("tactical_api", "grenade_api"):
+            set_api = stage_entry(api)
+            if set_api: set_api(self.api_key)
         
         all_dfs = []
         with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            # 击杀/经济/道具只依赖解析好的表，立刻开始 LLM 生成，不等 tick 预处理
             futures = {}
-            if process_dem_file: futures[executor.submit(process_dem_file, self.demo_path, self.test_mode)] = "Kill"
-            if get_eco_df: futures[executor.submit(get_eco_df, self.demo_path, True, self.test_mode)] = "Eco"
-            if run_grenade_analysis: futures[executor.submit(run_grenade_analysis, self.demo_path, self.test_mode)] = "Grenade"
+            selection = {"rounds": self.rounds, "redo": self.redo, "match_state": self.match_state}
+            if process_dem_file: futures[submit_traced(executor, self._timed, "Kill", process_dem_file, self.demo_path, self.test_mode, self.utility_index, self.demo_tables, **selection)] = "Kill"
+            if get_eco_df: futures[submit_traced(executor, self._timed, "Eco", get_eco_df, self.demo_path, True, self.test_mode, self.demo_tables, **selection)] = "Eco"
+            if run_grenade_analysis: futures[submit_traced(executor, self._timed, "Grenade", run_grenade_analysis, self.demo_path, self.test_mode, self.demo_tables, **selection)] = "Grenade"
             
+            # 战术分析等子进程的预处理结果回来再提交
+            if pretreatment_future is not None:
+                with get_tracer().span("等待预处理", "stage"): self._collect_pretreatment(pretreatment_future)
             if run_tactical_analysis and self.df_pretreatment is not None:
-                futures[executor.submit(run_tactical_analysis, self.df_pretreatment, self.output_dir, None, self.test_mode)] = "Tactical"
+                futures[submit_traced(executor, self._timed, "Tactical", run_tactical_analysis, self.df_pretreatment, self.output_dir, self.rounds, self.test_mode, self.utility_index, redo=self.redo, match_state=self.match_state)] = "Tactical"
 
             for f in concurrent.futures.as_completed(futures):
                 try:
                     df = f.result()
                     if df is not None and not df.empty: all_dfs.append(df)
-                except Exception as e: print(f"   ❌ 模块失败: {e}")
+                    self._emit("module_done", module=futures[f], events=0 if df is None else len(df))
+                    self._emit_partial(all_dfs)
+                except Exception as e:
+                    print(f"   ❌ 模块失败: {e}")
+                    self._emit("module_failed", module=futures[f], error=str(e))
         return all_dfs
 
+    def _timed(self, name, fn, *args, **kwargs):
+        """记录单个模块的耗时 (基准测试和回归对比用)"""
+        t0 = time.perf_counter()
+        try:
+            with get_tracer().span(name, "module") as info:
+                df = fn(*args, **kwargs)
+                info["events"] = 0 if df is None else len(df)
+                return df
+        finally: self.module_times[name] = time.perf_counter() - t0
+
+    @contextmanager
+    def _stage(self, name):
+        """一个调度阶段：同时记内存峰值和 trace span"""
+        with self.mem.stage(name), get_tracer().span(name, "stage"):
+            yield
+
+    def _add_child_record(self, record):
+        """子进程任务带回的内存统计和 span"""
+        get_tracer().extend(record.pop("spans", None))
+        self.mem.add(record)
+
     def step3_merge(self, all_dfs):
-        if not all_dfs: return pd.DataFrame()
-        merged = pd.concat(all_dfs, ignore_index=True)
-        
-        if 'start_time' not in merged.columns:
-            if 'tick' in merged.columns: merged['start_time'] = merged['tick'] / self.tickrate
-        else:
-            if 'tick' in merged.columns: merged['start_time'] = merged['start_time'].fillna(merged['tick'] / self.tickrate)
-        
-        if self.test_mode and 'round_num' in merged.columns:
-            merged = merged[merged['round_num'] == 1]
-            
-        return merged
+        # 各模块已输出统一事件表 (start_time 已补齐)，这里只做合并
+        return filter_rounds(concat_events(all_dfs), self.rounds)
 
     def step4_smart_compression(self, df):
         print("🧠 [Step 4] 智能语义压缩...")
         if df.empty: return df
-        df = df.sort_values(['round_num', 'start_time'])
-        compressed_rows = []
-        buffer = []
-        
-        for _, row in df.iterrows():
-            if row.get('event_type') == 'kill':
-                if not buffer: buffer.append(row)
-                else:
-                    if (row['start_time'] - buffer[-1]['start_time']) < MERGE_THRESHOLD and len(buffer) < MAX_MERGE_COUNT:
-                        buffer.append(row)
-                    else:
-                        compressed_rows.extend(self._flush_buffer(buffer))
-                        buffer = [row]
-            else:
-                if buffer:
-                    compressed_rows.extend(self._flush_buffer(buffer))
-                    buffer = []
-                compressed_rows.append(row)
-        
-        if buffer: compressed_rows.extend(self._flush_buffer(buffer))
-        return pd.DataFrame(compressed_rows)
+        df = df.sort_values(['round_num', 'start_time']).reset_index(drop=True)
 
-    def _flush_buffer(self, buffer):
-        if not buffer: return []
-        if len(buffer) == 1: return buffer
-        
-        base = buffer[0].copy()
-        texts = [b.get('short_text_neutral', '') for b in buffer]
-        
+        # 向量化分组：连续的、间隔 < 阈值的单条击杀归为一组，每组最多 MAX_MERGE_COUNT 条
+        # 击杀序列事件已在 kill_sequence 本地合并过，不再二次压缩
+        mergeable = ((df['event_type'] == 'kill') & df['sequence_id'].isna()).to_numpy()
+        start = df['start_time'].to_numpy()
+        rnd = df['round_num'].to_numpy()
+        new_group = np.ones(len(df), dtype=bool)
+        new_group[1:] = ~mergeable[1:] | ~mergeable[:-1] | (rnd[1:] != rnd[:-1]) | (np.diff(start) >= MERGE_THRESHOLD)
+        group = pd.Series(np.cumsum(new_group))
+        chunk = group.groupby(group).cumcount() // MAX_MERGE_COUNT
+        key = group.astype(str) + "_" + chunk.astype(str)
+        sizes = key.map(key.value_counts())
+
+        multi = sizes.to_numpy() > 1
+        if not multi.any(): return df
+
+        # 只有需要合并的组才逐组调用 LLM
+        keep = ~multi
+        for _, idx in df.index[multi].to_series().groupby(key[multi]):
+            rows = idx.to_numpy()
+            base = rows[0]
+            texts = df.loc[rows, 'short_text_neutral'].tolist()
+            merged_text = self._merge_texts(texts)
+            df.loc[base, 'medium_text_neutral'] = merged_text
+            df.loc[base, 'short_text_neutral'] = merged_text
+            df.loc[base, 'span_duration'] = start[rows[-1]] - start[rows[0]]
+            keep[base] = True
+        return df[keep].reset_index(drop=True)
+
+    def _merge_texts(self, texts):
         try:
             resp = self.client.chat.completions.create(
                 model=COMPRESS_MODEL,
-                messages=[{"role": "system", "content": COMPRESS_PROMPT}, {"role": "user", "content": f"合并: {'；'.join(texts)}"}]
+                messages=build_messages("compression", f"合并: {'；'.join(texts)}", self.output_dir)
             )
-            base['medium_text_neutral'] = resp.choices[0].message.content.strip().strip('"')
-        except: base['medium_text_neutral'] = "；".join(texts)
-        
-        base['short_text_neutral'] = base['medium_text_neutral']
-        base['span_duration'] = buffer[-1]['start_time'] - buffer[0]['start_time']
-        return [base]
+            return resp.choices[0].message.content.strip().strip('"')
+        except: return "；".join(texts)
 
     def step5_schedule_and_output(self, df):
         print("⚔️ [Step 5] 最终对齐...")
-        schedule = []
-        df = df.sort_values(by=['start_time'])
-        
-        off_upper = self.time_offsets.get("upper", 0.0)
-        off_lower = self.time_offsets.get("lower", 0.0)
-        cursor_u, cursor_l = 0.0, 0.0
+        cols = ['回合数', '时间范围', '解说文本']
+        if df.empty: return pd.DataFrame(columns=cols), 0
 
-        for _, row in df.iterrows():
-            r_num = int(row.get('round_num', 0))
-            start_t = float(row.get('start_time', 0))
-            if start_t <= 0.1 and r_num > 1: continue 
+        # 文本优先用 medium，缺失时退回 short
+        medium = df['medium_text_neutral'].fillna("")
+        texts = medium.where(medium != "", df['short_text_neutral'].fillna("")).astype(str)
+        rounds = df['round_num'].to_numpy(dtype=np.int64)
+        starts = df['start_time'].to_numpy(dtype=np.float64)
+        valid = ~((starts <= 0.1) & (rounds > 1)) & (texts != "").to_numpy() & (texts != "nan").to_numpy()
 
-            is_lower = (r_num >= 13)
-            offset = off_lower if is_lower else off_upper
-            adjusted_start = max(0.0, start_t - offset)
+        rounds, starts, texts = rounds[valid], starts[valid], texts[valid].to_numpy()
+        is_lower = rounds >= 13
+        offsets = np.where(is_lower, self.time_offsets.get("lower", 0.0), self.time_offsets.get("upper", 0.0))
+        adjusted = np.maximum(0.0, starts - offsets)
+        dur = estimate_speech_duration([len(t) for t in texts], df['span_duration'].to_numpy()[valid])
+        weights = priority_weights(df['priority'].to_numpy()[valid])
 
-            curr_cursor = cursor_l if is_lower else cursor_u
-            if adjusted_start < curr_cursor: adjusted_start = curr_cursor # 简单防重叠
-            
-            text = row.get('medium_text_neutral') or row.get('short_text_neutral')
-            if not text or str(text) == 'nan': continue
-            
-            dur = max(2.5, len(str(text)) * 0.22, float(row.get('span_duration', 0)))
-            final_end = adjusted_start + dur
-            
-            if is_lower: cursor_l = final_end
-            else: cursor_u = final_end
-            
-            schedule.append({
-                '回合数': r_num,
-                '时间范围': f"{adjusted_start:.1f}-{final_end:.1f}s",
-                '解说文本': text
-            })
-            
-        return pd.DataFrame(schedule), len(schedule)//2
+        # 上下半场各自求解加权区间调度，低权重台词在拥挤时被舍弃而不是一直后推
+        assigned = schedule_airtime(adjusted, dur, weights, group=is_lower.astype(np.int64))
+        chosen = ~np.isnan(assigned)
+        print(f"   📅 入选 {int(chosen.sum())}/{len(chosen)} 条，平均延迟 {np.nanmean(assigned - adjusted) if chosen.any() else 0:.2f}s")
 
-    def run(self):
-        self.step1_pretreatment()
-        merged = self.step3_merge(self.step2_collect_all_modules())
+        order = np.lexsort((assigned[chosen], is_lower[chosen]))
+        a_start = assigned[chosen][order]
+        a_end = a_start + dur[chosen][order]
+        schedule = pd.DataFrame({
+            '回合数': rounds[chosen][order],
+            '时间范围': [f"{st:.1f}-{en:.1f}s" for st, en in zip(a_start, a_end)],
+            '解说文本': texts[chosen][order],
+        }, columns=cols)
+        return schedule, len(schedule)//2
+
+    def run(self, procs=None):
+        """procs 为外部共享的进程池 (批量模式)；不传时自己建一个"""
+        # 解析与 tick 预处理在进程池里跑，和主进程的 LLM 线程互不争 GIL
+        if procs is None:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=2) as own:
+                return self.run(own)
+        with run_scope(self.run_id): return self._run(procs)
+
+    def _run(self, procs):
+        with self._stage("Step0 解析"): self.step0_parse(procs)
+        self._emit("parsed", tables=sorted(self.demo_tables.paths) if self.demo_tables is not None else [])
+        with self._stage("Step1 预处理提交"): pretreatment_future = self.step1_pretreatment(procs)
+        pretreatment_future = pretreatment_future if isinstance(pretreatment_future, concurrent.futures.Future) else None
+        with self._stage("Step2 生成"): all_dfs = self.step2_collect_all_modules(pretreatment_future)
+        with self._stage("Step3 合并"):
+            # 近似重复的台词在压缩、排期和润色之前去掉，后面几步都少处理这些行
+            merged = suppress_near_duplicates(self.step3_merge(all_dfs))
+        self._emit("merged", events=len(merged))
         if merged.empty: 
             print("❌ 无数据")
-            return
+            self.report_memory()
+            self.report_trace()
+            return False
         
         merged.to_csv(os.path.join(self.cache_dir, "debug_3_merged.csv"), index=False, encoding="utf-8-sig")
-        compressed = self.step4_smart_compression(merged)
-        final, _ = self.step5_schedule_and_output(compressed)
+        with self._stage("Step4 压缩"): compressed = self.step4_smart_compression(merged)
+        self._emit("compressed", events=len(compressed))
+        with self._stage("Step5 排期"): final, _ = self.step5_schedule_and_output(compressed)
         
-        final.to_csv(os.path.join(self.output_final_dir, "final_schedule.csv"), index=False, encoding='utf-8-sig')
-        print(f"🎉 完成！")
\ No newline at end of file
+        final_path = os.path.join(self.output_final_dir, "final_schedule.csv")
+        final.to_csv(final_path, index=False, encoding='utf-8-sig')
+        self._emit("scheduled", path=final_path, rows=len(final))
+        self.report_memory()
+        self.report_trace()
+        print(f"🎉 完成！")
+        return True
+
+    def report_trace(self):
+        """导出本次运行的 Chrome trace，并打印按阶段/模块/LLM 汇总的耗时表；导出后从 tracer 里丢掉，常驻服务里不会越积越多"""
+        events = get_tracer().since(run=self.run_id)
+        get_tracer().drop(self.run_id)
+        if not events: return
+        path = export_chrome_trace(os.path.join(self.cache_dir, "trace.json"), events)
+        print(f"🧭 [Trace] 已导出 {len(events)} 个 span: {path}")
+        print(summary_table(events))
+
+    def report_memory(self):
+        """打印各阶段内存峰值，并落盘方便跨版本对比"""
+        if not self.mem.stages: return
+        print("📈 [Memory] 各阶段 RSS:")
+        print(self.mem.summary())
+        pd.DataFrame(self.mem.stages).to_csv(os.path.join(self.cache_dir, "memory_profile.csv"), index=False, encoding='utf-8-sig')
\ No newline at end of file
@@ -0,0 +1,194 @@
+# match_state.py：整场比赛的局势快照
+# 解析完 demo 后按回合顺序把 kills/rounds/economy 扫一遍，增量算出：
+#   每回合开始时: 比分、连胜、失败补偿、双方总资金
+#   回合内每秒:   存活人数、截至此刻每名选手的击杀/死亡
+# 各模块按 (回合, tick) 查询都是常数时间的数组下标，不再为每个事件重新扫击杀表
+import numpy as np
+import pandas as pd
+import config
+from kill_sequence import TEAM_SIZE, _norm_side
+
+HALF_ROUNDS = 12                             # 常规时间每半场回合数 (MR12)
+OT_HALF_ROUNDS = 3                           # 加时每半场回合数
+LOSS_BONUS = [1400, 1900, 2400, 2900, 3400]  # 失败补偿档位；半场开始时双方都在下标 1 (手枪局输了拿 1900)
+ECON_TOLERANCE = 10                          # 经济快照取冻结时间结束后多少 tick 内的第一条
+
+def _to_pandas(data):
+    if data is None: return pd.DataFrame()
+    if hasattr(data, "to_pandas"): return data.to_pandas()
+    return pd.DataFrame(data)
+
+def _half_start(r_num):
+    """半场 (含加时半场) 的第一回合：换边、失败补偿重置"""
+    if r_num <= 2 * HALF_ROUNDS: return (r_num - 1) % HALF_ROUNDS == 0
+    return (r_num - 2 * HALF_ROUNDS - 1) % OT_HALF_ROUNDS == 0
+
+def _round_banks(economy, rounds):
+    """{回合: {"T": 总资金, "CT": 总资金}}，取冻结时间结束时每名选手的开局资金"""
+    econ = _to_pandas(economy)
+    if econ.empty or "freeze_end" not in rounds.columns: return {}
+    from demo_tables import ECONOMY_FIELDS
+    money_col, start_col, team_col = ECONOMY_FIELDS
+    money_col = start_col if start_col in econ.columns else money_col
+    if money_col not in econ.columns or team_col not in econ.columns: return {}
+
+    freeze = rounds["freeze_end"].to_numpy(dtype=np.int64)
+    order = np.argsort(freeze)
+    ticks = econ["tick"].to_numpy(dtype=np.int64)
+    idx = np.searchsorted(freeze[order], ticks, side="right") - 1
+    valid = idx >= 0
+    dt = np.where(valid, ticks - freeze[order][idx.clip(min=0)], -1)
+    mask = valid & (dt >= 0) & (dt <= ECON_TOLERANCE)
+    if not mask.any(): return {}
+
+    snap = pd.DataFrame({
+        "round_num": rounds["round_num"].to_numpy()[order][idx[mask]],
+        "tick": ticks[mask],
+        "name": econ["name"].to_numpy()[mask],
+        "side": np.where(econ[team_col].to_numpy()[mask] == 2, "T", "CT"),
+        "money": pd.to_numeric(econ[money_col], errors="coerce").to_numpy()[mask],
+    }).sort_values("tick").drop_duplicates(["round_num", "name"])
+    banks = snap.groupby(["round_num", "side"])["money"].sum()
+    out = {}
+    for (r_num, side), money in banks.items(): out.setdefault(int(r_num), {})[side] = int(money)
+    return out
+
+class MatchState:
+    """
+    rounds: 每回合开始时的局势 (DataFrame，一回合一行)
+    seconds: 每回合每秒的局势 (DataFrame，供导出/调试)；查询走 _arrays 里的 numpy 数组
+    """
+    def __init__(self, tickrate=None):
+        self.tickrate = float(tickrate or config.TICKRATE)
+        self.rounds = pd.DataFrame()
+        self.seconds = pd.DataFrame()
+        self._round_info = {}   # 回合 -> 回合开始时的局势 dict
+        self._arrays = {}       # 回合 -> (start_tick, alive_T, alive_CT, 全场击杀序号)
+        self._kd = [{}]         # 全场第 i 次击杀之后的 {选手: [击杀, 死亡]}
+
+    def __len__(self):
+        return len(self._round_info)
+
+    def round_start(self, r_num):
+        return self._round_info.get(int(r_num))
+
+    def at(self, r_num, tick):
+        """某回合某一时刻 (精确到秒，不含这一秒内的击杀) 的局势"""
+        info = self._round_info.get(int(r_num))
+        if info is None: return None
+        start, alive_t, alive_ct, kill_no = self._arrays[int(r_num)]
+        sec = int(min(max((tick - start) // self.tickrate, 0), len(alive_t) - 1))
+        return dict(info, second=sec, alive_T=int(alive_t[sec]), alive_CT=int(alive_ct[sec]), kd=self._kd[kill_no[sec]])
+
+    def describe_round(self, r_num):
+        """Prompt 用：回合开始时的比分、连胜、失败补偿、资金"""
+        info = self.round_start(r_num)
+        if info is None: return ""
+        lines = [f"比分: T {info['score_T']} : {info['score_CT']} CT"]
+        for side in ("T", "CT"):
+            if info[f"streak_{side}"] >= 2: lines[0] += f"，{side}方{info[f'streak_{side}']}连胜"
+        lines.append(f"失败补偿: T {info['loss_bonus_T']} / CT {info['loss_bonus_CT']}")
+        if info["bank_T"] or info["bank_CT"]: lines.append(f"开局总资金: T {info['bank_T']} / CT {info['bank_CT']}")
+        return "\n".join(lines)
+
+    def describe(self, r_num, tick, players=None, alive=True):
+        """Prompt 用：比分 (+存活人数) (+指定选手截至此刻的本场击杀/死亡)"""
+        state = self.at(r_num, tick)
+        if state is None: return ""
+        lines = [f"比分: T {state['score_T']} : {state['score_CT']} CT"]
+        if alive: lines.append(f"存活: T {state['alive_T']} vs CT {state['alive_CT']}")
+        if players:
+            stats = [f"{p} {state['kd'].get(p, (0, 0))[0]}杀{state['kd'].get(p, (0, 0))[1]}死" for p in dict.fromkeys(players) if p]
+            if stats: lines.append(f"本场数据: {'，'.join(stats)}")
+        return "\n".join(lines)
+
+def build_match_state(kills, rounds, economy=None, tickrate=None):
+    """按回合顺序增量构建；kills/rounds/economy 接受 pandas/polars"""
+    state = MatchState(tickrate)
+    tickrate = state.tickrate
+    rounds = _to_pandas(rounds)
+    if rounds.empty or "round_num" not in rounds.columns: return state
+    rounds = rounds[rounds["round_num"] > 0].sort_values("round_num").reset_index(drop=True)
+
+    k = _to_pandas(kills)
+    if not k.empty:
+        k = k[k["round_num"] > 0].sort_values(["round_num", "tick"]).reset_index(drop=True)
+        for who in ("attacker", "victim"):
+            k[f"{who}_side"] = _norm_side(k[f"{who}_side"]) if f"{who}_side" in k.columns else ""
+    by_round = dict(tuple(k.groupby("round_num"))) if not k.empty else {}
+    banks = _round_banks(economy, rounds)
+    end_col = next((c for c in ("official_end", "end") if c in rounds.columns), None)
+
+    # 比分/连胜/失败补偿按“队伍”记 (换边后跟着队伍走)；A 队是第一回合的 T 方，两队阵容每回合从击杀里补充
+    roster, score, streak, losses = {"A": set(), "B": set()}, {"A": 0, "B": 0}, {"A": 0, "B": 0}, {"A": 1, "B": 1}
+    t_team = "A"
+    kd, round_rows, second_frames = {}, [], []
+    for r in rounds.itertuples(index=False):
+        r_num = int(r.round_num)
+        rk = by_round.get(r_num, pd.DataFrame())
+        if _half_start(r_num):
+            if r_num > 1: t_team = "B" if t_team == "A" else "A"
+            losses = {"A": 1, "B": 1}
+        # 有击杀数据时用阵容校正哪支队伍在 T 方 (防止换边规则和实际不符)：
+        # 只有本回合两边的选手明显更像对方队伍时才对调，新出现的选手不算数
+        if not rk.empty:
+            names = {side: set(rk.loc[rk["attacker_side"] == side, "attacker_name"]) | set(rk.loc[rk["victim_side"] == side, "victim_name"])
+                     for side in ("T", "CT")}
+            other = "B" if t_team == "A" else "A"
+            same = len(names["T"] & roster[t_team]) + len(names["CT"] & roster[other])
+            swapped = len(names["T"] & roster[other]) + len(names["CT"] & roster[t_team])
+            if swapped > 2 * same: t_team = other
+        ct_team = "B" if t_team == "A" else "A"
+        if not rk.empty:
+            roster[t_team] |= names["T"] - roster[ct_team]
+            roster[ct_team] |= names["CT"] - roster[t_team]
+        team_of = {"T": t_team, "CT": ct_team}
+
+        info = {"round_num": r_num}
+        for side, team in team_of.items():
+            info[f"score_{side}"] = score[team]
+            info[f"streak_{side}"] = streak[team]
+            info[f"loss_bonus_{side}"] = LOSS_BONUS[min(losses[team], len(LOSS_BONUS) - 1)]
+            info[f"bank_{side}"] = banks.get(r_num, {}).get(side, 0)
+        state._round_info[r_num] = info
+        round_rows.append(info)
+
+        # 回合内每秒：第 s 秒对应 start + s*tickrate 之前发生的击杀
+        start = int(getattr(r, "start", 0) or 0)
+        end = int(getattr(r, end_col, start) or start) if end_col else start
+        sec_ticks = start + np.arange(max(1, int((end - start) // tickrate) + 1)) * tickrate
+        kill_ticks = rk["tick"].to_numpy(dtype=np.float64) if not rk.empty else np.array([])
+        counts = np.searchsorted(kill_ticks, sec_ticks, side="left")
+        alive = {}
+        for side in ("T", "CT"):
+            died = np.concatenate([[0], np.cumsum((rk["victim_side"] == side).to_numpy())]) if not rk.empty else np.zeros(1, dtype=int)
+            alive[side] = (TEAM_SIZE - died[counts]).clip(min=0)
+
+        # 击杀/死亡累计：每次击杀存一份快照，每秒只记快照序号
+        base = len(state._kd) - 1
+        for row in rk.itertuples(index=False):
+            victim = getattr(row, "victim_name", None)
+            attacker = getattr(row, "attacker_name", None)
+            if isinstance(victim, str): kd.setdefault(victim, [0, 0])[1] += 1
+            if isinstance(attacker, str) and attacker != victim and row.attacker_side != row.victim_side:
+                kd.setdefault(attacker, [0, 0])[0] += 1
+            state._kd.append({p: tuple(v) for p, v in kd.items()})
+        kill_no = base + counts
+        state._arrays[r_num] = (start, alive["T"], alive["CT"], kill_no)
+        second_frames.append(pd.DataFrame({
+            "round_num": r_num, "second": np.arange(len(sec_ticks)), "tick": sec_ticks.astype(np.int64),
+            "score_T": info["score_T"], "score_CT": info["score_CT"], "alive_T": alive["T"], "alive_CT": alive["CT"],
+        }))
+
+        # 回合结束：更新比分、连胜、失败补偿 (赢一局降一档，输一局升一档)
+        winner = str(getattr(r, "winner", "") or "").upper()
+        if winner in team_of:
+            w, l = team_of[winner], team_of["CT" if winner == "T" else "T"]
+            score[w] += 1
+            streak[w], streak[l] = streak[w] + 1, 0
+            losses[w] = max(losses[w] - 1, 0)
+            losses[l] = min(losses[l] + 1, len(LOSS_BONUS) - 1)
+
+    state.rounds = pd.DataFrame(round_rows)
+    state.seconds = pd.concat(second_frames, ignore_index=True) if second_frames else pd.DataFrame()
+    return state
@@ -0,0 +1,82 @@
+# mem_profile.py：按阶段统计内存峰值 (RSS)
+# 后台线程定时采样当前进程 RSS，每个阶段记录 起始/结束/峰值；子进程任务用 run_profiled 包一层把统计带回来
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+SAMPLE_INTERVAL = 0.05  # 采样间隔 (秒)
+
+try:
+    import psutil
+    _PROC = psutil.Process()
+except ImportError:
+    psutil = None
+    _PROC = None
+
+def current_rss_mb():
+    """当前进程 RSS (MB)；依次尝试 psutil、/proc、resource"""
+    if _PROC is not None:
+        return _PROC.memory_info().rss / 1024 / 1024
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): return int(line.split()[1]) / 1024
+    except OSError: pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return 0.0
+
+class MemoryProfiler:
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stages = []  # [{stage, start_mb, end_mb, peak_mb, seconds, process}]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = current_rss_mb()
+        peak = [start]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(self.interval):
+                peak[0] = max(peak[0], current_rss_mb())
+
+        t = threading.Thread(target=sample, daemon=True)
+        t0 = time.perf_counter()
+        t.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            t.join()
+            end = current_rss_mb()
+            self.add({"stage": name, "start_mb": start, "end_mb": end, "peak_mb": max(peak[0], end),
+                      "seconds": time.perf_counter() - t0, "process": "main"})
+
+    def add(self, record):
+        with self._lock: self.stages.append(record)
+
+    def summary(self):
+        if not self.stages: return ""
+        lines = [f"{'阶段':<16}{'进程':<8}{'起始MB':>10}{'峰值MB':>10}{'增量MB':>10}{'耗时s':>9}"]
+        for r in self.stages:
+            lines.append(f"{r['stage']:<16}{r['process']:<8}{r['start_mb']:>10.0f}{r['peak_mb']:>10.0f}"
+                         f"{r['peak_mb'] - r['start_mb']:>10.0f}{r['seconds']:>9.1f}")
+        return "\n".join(lines)
+
+def run_profiled(name, fn, *args, **kwargs):
+    """进程池入口：在子进程里执行 fn 并返回 (结果, 内存统计)；统计里带上子进程记录的 trace span"""
+    from tracing import get_tracer
+    tracer = get_tracer()
+    mark = tracer.mark()
+    prof = MemoryProfiler()
+    with prof.stage(name), tracer.span(name, "process"):
+        result = fn(*args, **kwargs)
+    record = dict(prof.stages[0], process=f"pid{os.getpid()}", spans=tracer.pop(mark))
+    return result, record
@@ -0,0 +1,126 @@
+# mock_llm_server.py：本地的 OpenAI 兼容桩服务 (POST /v1/chat/completions)
+# 可配置延迟、随机错误率和每分钟请求上限 (超出返回 429)，用于在没有付费 Key 的情况下压测整条流水线
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LATENCY = 0.3    # 秒
+DEFAULT_JITTER = 0.1     # 延迟抖动 (秒)
+DEFAULT_ERROR_RATE = 0.0 # 返回 500 的概率
+DEFAULT_RPM = 0          # 每分钟请求上限，0 表示不限
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 2)
+
+def reply_for(messages):
+    """按请求内容给出各模块能解析的回复"""
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    # 风格润色：输入里是 [{"id":.., "原文":..}] 数组，按 id 原样返回
+    start = user.find("[")
+    if '"id"' in user and start != -1:
+        try:
+            items, _ = json.JSONDecoder().raw_decode(user[start:])
+            return json.dumps({str(it["id"]): str(it.get("原文", "")) for it in items}, ensure_ascii=False)
+        except Exception: pass
+    if "JSON" in system or "JSON" in user:
+        return json.dumps({"short": "精彩瞬间", "medium": "这一波处理得非常漂亮", "long": "这一波双方交火，处理得非常漂亮，局势发生了变化"}, ensure_ascii=False)
+    return "合并后的解说"
+
+class MockState:
+    def __init__(self, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER, error_rate=DEFAULT_ERROR_RATE, rpm=DEFAULT_RPM, seed=0):
+        self.latency, self.jitter, self.error_rate, self.rpm = latency, jitter, error_rate, rpm
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._window = []
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """返回 (状态码, 重试等待秒)"""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if self.rpm:
+                self._window = [t for t in self._window if now - t < 60.0]
+                if len(self._window) >= self.rpm:
+                    self.stats["rate_limited"] += 1
+                    return 429, max(0.05, 60.0 - (now - self._window[0]))
+                self._window.append(now)
+            if self.rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500, 0
+            return 200, 0
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items(): self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"): return self._send(200, state.stats)
+            self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+
+            code, wait = state.admit()
+            if code == 429:
+                return self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                  {"retry-after-ms": str(int(wait * 1000)), "retry-after": str(max(1, int(wait)))})
+            time.sleep(max(0.0, state.latency + state.rng.uniform(-state.jitter, state.jitter)))
+            if code == 500:
+                return self._send(500, {"error": {"message": "mock server error", "type": "server_error"}})
+
+            messages = req.get("messages", [])
+            content = reply_for(messages)
+            prompt_tokens = sum(_estimate_tokens(m.get("content", "")) for m in messages)
+            completion_tokens = _estimate_tokens(content)
+            with state._lock:
+                state.stats["ok"] += 1
+                state.stats["prompt_tokens"] += prompt_tokens
+                state.stats["completion_tokens"] += completion_tokens
+            self._send(200, {
+                "id": f"mock-{state.stats['requests']}", "object": "chat.completion", "created": int(time.time()),
+                "model": req.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def log_message(self, fmt, *args): pass
+    return Handler
+
+def start_mock_server(host="127.0.0.1", port=0, **kwargs):
+    """后台线程启动，返回 (server, state, base_url)"""
+    state = MockState(**kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    parser.add_argument("--jitter", type=float, default=DEFAULT_JITTER)
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_ERROR_RATE)
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM)
+    args = parser.parse_args()
+    server, state, url = start_mock_server(port=args.port, latency=args.latency, jitter=args.jitter,
+                                           error_rate=args.error_rate, rpm=args.rpm)
+    print(f"🤖 [Mock LLM] {url} (延迟 {args.latency}s, 错误率 {args.error_rate}, RPM {args.rpm or '不限'})")
+    try: threading.Event().wait()
+    except KeyboardInterrupt: server.shutdown()
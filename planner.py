@@ -0,0 +1,165 @@
+# planner.py：--plan 预演模式，正式生成之前估算请求数、tokens 和耗时
+# 正常跑解析和各模块的 prompt 构建，但网关不真正请求模型：每个请求只记下所属模块、tokens 和是否命中响应缓存，
+# 回复用 mock_llm_server 的占位内容，保证各模块照常解析、后续的压缩和润色也能构建出 prompt。
+# 预演在临时目录里跑 (相当于 clean 之后的完整运行)，不会覆盖 data 下已有的结果
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import llm_gateway
+from mock_llm_server import reply_for
+from style_rewriter import estimate_tokens
+
+PLAN_LATENCY_S = float(os.getenv("LLM_PLAN_LATENCY", "2.0"))      # 单个请求的固定开销 (首 token 前)
+PLAN_OUTPUT_TPS = float(os.getenv("LLM_PLAN_OUTPUT_TPS", "40"))   # 输出速度 (tokens/s)
+MESSAGE_OVERHEAD = 4  # 每条 message 的角色/分隔符开销
+
+# 按调用栈里的源文件归到模块
+MODULE_LABELS = {
+    "final_kill": "kill", "createTexts": "grenade", "data_analysis": "tactical",
+    "eco_and_round": "economy", "master_scheduler": "compression", "style_rewriter": "style",
+}
+# 同一阶段内的模块并行，阶段之间串行
+PHASES = [("生成", ["kill", "grenade", "tactical", "economy"]), ("压缩", ["compression"]), ("润色", ["style"])]
+
+_encoder = None
+
+def count_tokens(text):
+    """有 tiktoken 时用它分词，否则退回按字符估算"""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder: return len(_encoder.encode(str(text)))
+    return estimate_tokens(text)
+
+def _caller_module():
+    frame = sys._getframe(2)
+    while frame is not None:
+        name = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        if name in MODULE_LABELS: return MODULE_LABELS[name]
+        frame = frame.f_back
+    return "other"
+
+def _load_cached_keys(path):
+    keys = set()
+    if not path or not os.path.exists(path): return keys
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try: keys.add(json.loads(line)["key"])
+            except Exception: continue
+    return keys
+
+class RequestPlan:
+    """网关的记账对象：record() 记下请求并返回占位回复"""
+    def __init__(self, cache_path=llm_gateway.CACHE_PATH):
+        self.cached = _load_cached_keys(cache_path)
+        self.requests = []  # [{module, thread, prompt_tokens, completion_tokens, cache_hit, prefix_tokens}]
+        self._seen = set()
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def record(self, key, kwargs):
+        messages = kwargs.get("messages", [])
+        content = reply_for(messages)
+        sizes = [count_tokens(m.get("content", "")) + MESSAGE_OVERHEAD for m in messages]
+        prompt = sum(sizes)
+        pk = llm_gateway.prefix_key(kwargs)
+        completion = count_tokens(content)
+        if kwargs.get("max_tokens"): completion = min(completion, kwargs["max_tokens"])
+        with self._lock:
+            hit = key in self.cached or key in self._seen
+            self._seen.add(key)
+            # 前缀之前出现过：这部分输入预计命中服务商的前缀缓存
+            reused = sum(sizes[:-1]) if pk in self._prefixes else 0
+            self._prefixes.add(pk)
+            self.requests.append({"module": _caller_module(), "thread": threading.get_ident(), "prompt_tokens": prompt,
+                                  "completion_tokens": completion, "cache_hit": hit, "prefix_tokens": reused})
+        return content
+
+    def estimate_seconds(self, requests, concurrency=llm_gateway.MAX_CONCURRENCY, rpm=llm_gateway.MAX_RPM):
+        """
+        一组并行请求的耗时下界取三者最大：
+        同一线程内的请求串行 (最长的那条线程)、并发上限、RPM 上限；命中缓存的请求不计
+        """
+        sent = [r for r in requests if not r["cache_hit"]]
+        if not sent: return 0.0
+        latency = lambda r: PLAN_LATENCY_S + r["completion_tokens"] / PLAN_OUTPUT_TPS
+        per_thread = {}
+        for r in sent: per_thread[r["thread"]] = per_thread.get(r["thread"], 0.0) + latency(r)
+        bounds = [max(per_thread.values()), sum(map(latency, sent)) / max(1, concurrency)]
+        if rpm: bounds.append(len(sent) * 60.0 / rpm)
+        return max(bounds)
+
+    def report(self, local_seconds=0.0):
+        lines = [f"{'模块':<14}{'请求':>6}{'命中缓存':>9}{'输入tokens':>12}{'输出tokens':>12}"]
+        modules = {}
+        for r in self.requests: modules.setdefault(r["module"], []).append(r)
+        for name, reqs in sorted(modules.items(), key=lambda kv: -len(kv[1])):
+            sent = [r for r in reqs if not r["cache_hit"]]
+            lines.append(f"{name:<14}{len(reqs):>6}{len(reqs) - len(sent):>9}"
+                         f"{sum(r['prompt_tokens'] for r in sent):>12}{sum(r['completion_tokens'] for r in sent):>12}")
+
+        total = len(self.requests)
+        hits = sum(1 for r in self.requests if r["cache_hit"])
+        llm_seconds = 0.0
+        for phase, names in PHASES:
+            reqs = [r for r in self.requests if r["module"] in names]
+            if not reqs: continue
+            sec = self.estimate_seconds(reqs)
+            llm_seconds += sec
+            lines.append(f"   {phase}: {len(reqs)} 个请求，预计 {sec / 60:.1f} 分钟")
+        other = [r for r in self.requests if not any(r["module"] in names for _, names in PHASES)]
+        if other: llm_seconds += self.estimate_seconds(other)
+
+        lines.append(f"合计: {total} 个请求，预计缓存命中 {hits} 个 ({hits / total if total else 0:.0%})，实际发送 {total - hits} 个")
+        lines.append(f"tokens: {sum(r['prompt_tokens'] for r in self.requests if not r['cache_hit'])} + "
+                     f"{sum(r['completion_tokens'] for r in self.requests if not r['cache_hit'])} (输出按占位回复长度估算)")
+        sent = [r for r in self.requests if not r["cache_hit"]]
+        reused = sum(r["prefix_tokens"] for r in sent)
+        total_in = sum(r["prompt_tokens"] for r in sent)
+        lines.append(f"前缀复用: {sum(1 for r in sent if r['prefix_tokens'])} 个请求, {reused} tokens (占输入 {reused / total_in if total_in else 0:.0%})")
+        lines.append(f"预计耗时: {(llm_seconds + local_seconds) / 60:.1f} 分钟 (LLM {llm_seconds / 60:.1f} + 本地计算 {local_seconds / 60:.1f}；"
+                     f"并发 {llm_gateway.MAX_CONCURRENCY}，RPM {llm_gateway.MAX_RPM or '不限'}，单请求 {PLAN_LATENCY_S}s + {PLAN_OUTPUT_TPS:.0f} tokens/s)")
+        return "\n".join(lines)
+
+def run_plan(demo_paths, api_key=None, test_mode=False, personas=None, rounds=None):
+    """对一个或多个 demo 预演完整流程 (调度 + 润色)，打印估算结果并返回 RequestPlan"""
+    from master_scheduler import MasterScheduler
+    import style_rewriter
+
+    # 预演不发请求；没有 Key 时用占位值，让各模块照常走到构建 prompt 这一步
+    api_key = api_key or os.getenv("DASHSCOPE_API_KEY") or "plan"
+    os.environ.setdefault("DASHSCOPE_API_KEY", api_key)
+    plan = RequestPlan(os.path.abspath(llm_gateway.CACHE_PATH) if llm_gateway.CACHE_PATH else None)
+    demo_paths = [os.path.abspath(p) for p in demo_paths]
+    workdir = tempfile.mkdtemp(prefix="caster_plan_")
+    cwd = os.getcwd()
+    llm_gateway.set_planner(plan)
+    style_key = style_rewriter.MY_API_KEY
+    t0 = time.perf_counter()
+    try:
+        os.chdir(workdir)
+        style_rewriter.MY_API_KEY = style_key or api_key
+        schedules = []
+        for demo in demo_paths:
+            print(f"\n🧮 [Plan] 预演: {os.path.basename(demo)}")
+            scheduler = MasterScheduler(demo, api_key, test_mode=test_mode, rounds=rounds)
+            if scheduler.run():
+                schedules.append(os.path.join(workdir, scheduler.output_final_dir, "final_schedule.csv"))
+        if schedules: style_rewriter.rewrite_files(schedules, personas)
+    finally:
+        llm_gateway.set_planner(None)
+        style_rewriter.MY_API_KEY = style_key
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n🧮 [Plan] {len(demo_paths)} 个 demo 的预估 (未调用模型):")
+    print(plan.report(time.perf_counter() - t0))
+    return plan
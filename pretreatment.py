@@ -1,10 +1,11 @@
 import pandas as pd
 import numpy as np
-from awpy import Demo
-from scipy.spatial.distance import cdist
 import warnings
 import traceback
 import os
+from tick_store import MEMORY_BUDGET_MB, compact, concat_compact, iter_chunks, memory_mb
+from tracing import span
+from round_select import filter_rounds
 
 warnings.filterwarnings("ignore")
 
@@ -26,10 +27,11 @@ def map_coordinates(df_players):
         df_players['location'] = 'Unknown'
         return df_players
 
-    player_coords = df_players[['X', 'Y', 'Z']].values
-    anchor_coords = anchors[['X', 'Y', 'Z']].values
+    player_coords = df_players[['X', 'Y', 'Z']].to_numpy(dtype=np.float64)
+    anchor_coords = anchors[['X', 'Y', 'Z']].to_numpy(dtype=np.float64)
     
     try:
+        from scipy.spatial.distance import cdist
         dists = cdist(player_coords, anchor_coords)
         min_indices = np.argmin(dists, axis=1)
         df_players['location'] = anchors['name'].values[min_indices]
@@ -40,42 +42,79 @@ def map_coordinates(df_players):
     return df_players
 
 # ===================== 主逻辑 =====================
-def extract_specified_player_data_wrapper(demo_path, output_csv_path):
+RENAME_MAP = {
+    "round": "round_num",
+    "player_name": "name",
+    "team_name": "side"
+}
+KEEP_COLS = ['round_num', 'tick', 'side', 'name', 'health', 'X', 'Y', 'Z']
+
+def downsample_ticks(ticks_df, tickrate):
+    """
+    每秒保留一行，只留需要的列。polars 表在 polars 里先过滤再转 pandas，
+    整张 tick 表不会被复制成 pandas
+    """
+    if isinstance(ticks_df, pd.DataFrame):
+        df = ticks_df.rename(columns=RENAME_MAP)
+        df = df[(df['tick'] % int(tickrate) == 0) & (df['round_num'] > 0)]
+        return df[[c for c in KEEP_COLS if c in df.columns]].reset_index(drop=True)
+
+    import polars as pl
+    from demo_tables import arrow_pandas
+    df = ticks_df.rename({k: v for k, v in RENAME_MAP.items() if k in ticks_df.columns})
+    df = df.filter((pl.col('tick') % int(tickrate) == 0) & (pl.col('round_num') > 0))
+    return arrow_pandas(df.select([c for c in KEEP_COLS if c in df.columns]))
+
+def process_tick_chunk(chunk, tickrate, round_starts):
+    """单块原始 tick -> 紧凑的每秒快照"""
+    df = downsample_ticks(chunk, tickrate)
+    if df.empty: return None
+
+    # 🔥 3. 准确的秒数计算
+    start_t = df['round_num'].map(round_starts).astype('float64').fillna(0)
+    df['second'] = ((df['tick'].astype('float64') - start_t) / float(tickrate)).clip(lower=0)
+    if 'side' in df.columns:
+        df['side'] = df['side'].astype(str).str.upper()
+    if 'X' in df.columns:
+        with span("mapping", "pandas", rows=len(df)):
+            df = map_coordinates(df)
+
+    cols = ['round_num', 'second', 'tick', 'side', 'name', 'health', 'X', 'Y', 'Z', 'location', 'area']
+    return compact(df[[c for c in cols if c in df.columns]])
+
+def extract_specified_player_data_wrapper(demo_path, output_csv_path, demo_tables=None, rounds=None):
     print(f"🔧 [Pretreatment] 开始处理: {os.path.basename(demo_path)}")
     
     try:
-        dem = Demo(demo_path)
-        dem.parse() 
+        if demo_tables is not None and demo_tables.has("ticks"):
+            # 调度器已解析过 demo：直接读 Arrow 表
+            tickrate = demo_tables.header.get("tickrate") or 64
+            ticks_df = demo_tables.polars("ticks")
+            rounds_df = demo_tables.polars("rounds")
+        else:
+            from awpy import Demo
+            dem = Demo(demo_path)
+            dem.parse() 
+            tickrate = dem.tickrate
 
-        # 🔥 1. 动态获取 Tickrate (128)
-        tickrate = dem.tickrate
-        print(f"   ℹ️ [Pretreatment] 动态 Tickrate: {tickrate}")
+            # 提取数据
+            if not hasattr(dem, "ticks") or dem.ticks is None:
+                 ticks_df = dem.parser.parse_ticks(["X", "Y", "Z", "health", "tick", "round", "player_name", "team_name"])
+            else:
+                 ticks_df = dem.ticks
+            rounds_df = dem.rounds
 
-        # 提取数据
-        if not hasattr(dem, "ticks") or dem.ticks is None:
-             ticks_df = dem.parser.parse_ticks(["X", "Y", "Z", "health", "tick", "round", "player_name", "team_name"])
-        else:
-             ticks_df = dem.ticks
+        # 只处理选中的回合，分块之前就把其它回合的 tick 过滤掉
+        if rounds is not None:
+            round_col = "round_num" if "round_num" in ticks_df.columns else "round"
+            ticks_df = filter_rounds(ticks_df, rounds, col=round_col)
 
-        if not isinstance(ticks_df, pd.DataFrame):
-            ticks_df = ticks_df.to_pandas()
+        # 🔥 1. 动态获取 Tickrate (128)
+        print(f"   ℹ️ [Pretreatment] 动态 Tickrate: {tickrate}")
 
-        rename_map = {
-            "round": "round_num",
-            "player_name": "name",
-            "team_name": "side"
-        }
-        df = ticks_df.rename(columns=rename_map)
-        
-        # 🔥 2. 降采样：使用 128 tickrate (每秒一行)
-        df_sampled = df[df['tick'] % int(tickrate) == 0].copy()
-        
         # 获取 Rounds
-        rounds_df = dem.rounds
         if not isinstance(rounds_df, pd.DataFrame):
             rounds_df = rounds_df.to_pandas()
-            
-        df_sampled = df_sampled[df_sampled['round_num'] > 0]
 
         # 计算相对时间 (Second)
         round_starts = {}
@@ -84,26 +123,14 @@ def extract_specified_player_data_wrapper(demo_path, output_csv_path):
         if 'start' in rounds_df.columns:
             round_starts = rounds_df.set_index('round_num')['start'].to_dict()
         
-        def calc_second(row):
-            r = row['round_num']
-            t = row['tick']
-            start_t = round_starts.get(r, 0)
-            if start_t is None: start_t = 0
-            # 🔥 3. 准确的秒数计算
-            return max(0, (t - start_t) / float(tickrate))
-
-        df_sampled['second'] = df_sampled.apply(calc_second, axis=1)
-
-        # 筛选保存
-        keep_cols = ['round_num', 'second', 'tick', 'side', 'name', 'health', 'X', 'Y', 'Z']
-        valid_cols = [c for c in keep_cols if c in df_sampled.columns]
-        df_final = df_sampled[valid_cols].copy()
-        
-        if 'side' in df_final.columns:
-            df_final['side'] = df_final['side'].astype(str).str.upper()
-        
-        if 'X' in df_final.columns:
-            df_final = map_coordinates(df_final)
+        # 🔥 2. 按内存预算分块：降采样 + 秒数 + 点位映射都在块内完成，每块立即压成紧凑类型
+        # 点位映射的距离矩阵按“采样后行数 x 锚点数”计入每行开销
+        cdist_bytes = len(get_anchors_data()) * 8 // max(1, int(tickrate))
+        with span("tick_chunks", "pandas", rows=len(ticks_df)):
+            chunks = [process_tick_chunk(chunk, tickrate, round_starts)
+                      for chunk in iter_chunks(ticks_df, MEMORY_BUDGET_MB, cdist_bytes)]
+        df_final = concat_compact(chunks)
+        print(f"   📦 [Pretreatment] {len(chunks)} 块, {len(df_final)} 行, 占用 {memory_mb(df_final):.1f} MB")
 
         df_final.to_csv(output_csv_path, index=False, encoding='utf-8-sig')
         print(f"✅ [Pretreatment] 预处理完成: {output_csv_path}")
@@ -112,4 +139,19 @@ def extract_specified_player_data_wrapper(demo_path, output_csv_path):
     except Exception as e:
         print(f"❌ [Pretreatment] 失败: {e}")
         traceback.print_exc()
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+def pretreatment_job(demo_path, table_paths, output_csv_path, arrow_path, rounds=None):
+    """
+    进程池入口：读 Arrow 表做预处理，结果写成 Arrow IPC 交回主进程，
+    避免把大 DataFrame 通过 pickle 传回
+    """
+    import polars as pl
+    from demo_tables import DemoTables
+
+    tables = DemoTables(table_paths) if table_paths else None
+    df_final = extract_specified_player_data_wrapper(demo_path, output_csv_path, tables, rounds)
+    if df_final is None or df_final.empty: return None
+    # 列本来就是 Arrow 缓冲区时 from_pandas 不复制
+    pl.from_pandas(df_final).write_ipc(arrow_path)
+    return arrow_path
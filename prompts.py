@@ -0,0 +1,80 @@
+# prompts.py：统一的 prompt 拼装
+# 服务商的前缀缓存按请求开头逐字节匹配，所以固定内容放前面、动态数据放最后：
+#   system = 人设 + 任务/输出格式 + 本场比赛信息 (地图、双方阵容)，同一模块、同一场比赛内逐字节不变
+#   user   = 单个事件的数据
+# 各模块通过 build_messages() 组装请求，不再各写各的 system prompt
+import os
+import threading
+
+PERSONA = "你是CS2比赛解说。"
+JSON_FORMAT = '请直接输出JSON: {"short":"...", "medium":"...", "long":"..."}，不要包含markdown标记。'
+MATCH_CONTEXT_NAME = "match_context.txt"  # 存在 data/<demo>/cache/ 下，单独跑润色等阶段时也能拿到同一份
+
+# 模块 -> (任务说明, 输出格式)
+MODULE_TASKS = {
+    "kill": ("根据击杀描述生成解说。", JSON_FORMAT),
+    "grenade": ("根据投掷物事件 (选手、道具、落点) 生成解说。", JSON_FORMAT),
+    "tactical": ("你负责战术分析：根据双方站位、阵型特征和场上道具分析双方意图 (Short:10字, Medium:30字)。", JSON_FORMAT),
+    "economy": ("根据回合开始时双方的经济和上局购买，分析开局经济和起枪情况。", JSON_FORMAT),
+    "round_summary": ("根据回合结果和关键击杀，总结本回合。", JSON_FORMAT),
+    "compression": ("请将多条解说文案合并为一句简练、紧凑的解说。要求：保留关键信息，字数限制30字以内，口语化。", "直接输出合并后的解说，不要加引号。"),
+}
+
+_contexts = {}
+_lock = threading.Lock()
+
+def _context_path(match_dir):
+    return os.path.join(match_dir, "cache", MATCH_CONTEXT_NAME)
+
+def describe_match(demo_tables):
+    """本场比赛的固定信息：地图 + 上半场双方阵容 (按名字排序，保证每次生成的文本一致)"""
+    lines = ["【本场比赛】"]
+    lines.append(f"地图: {demo_tables.header.get('map_name', '未知')}")
+    if demo_tables.has("kills"):
+        kills = demo_tables.pandas("kills")
+        if "round_num" in kills.columns: kills = kills[kills["round_num"] <= 12]
+        rosters = {}
+        for role in ("attacker", "victim"):
+            if f"{role}_name" not in kills.columns: continue
+            for name, side in zip(kills[f"{role}_name"], kills[f"{role}_side"]):
+                if isinstance(name, str) and isinstance(side, str): rosters.setdefault(side.upper(), set()).add(name)
+        for side in ("T", "CT"):
+            if rosters.get(side): lines.append(f"上半场{side}: {', '.join(sorted(rosters[side]))}")
+        if rosters: lines.append("下半场双方交换攻防。")
+    return "\n".join(lines)
+
+def register_match(match_dir, demo_tables):
+    """调度器解析完 demo 后调用一次；各模块之后按 match_dir 取同一份比赛信息"""
+    if demo_tables is None: return ""
+    try: text = describe_match(demo_tables)
+    except Exception as e:
+        print(f"   ⚠️ 比赛信息生成失败: {e}")
+        return ""
+    os.makedirs(os.path.join(match_dir, "cache"), exist_ok=True)
+    with open(_context_path(match_dir), "w", encoding="utf-8") as f: f.write(text)
+    with _lock: _contexts[os.path.normpath(match_dir)] = text
+    return text
+
+def match_context(match_dir):
+    if not match_dir: return ""
+    key = os.path.normpath(match_dir)
+    with _lock:
+        if key in _contexts: return _contexts[key]
+    text = ""
+    try:
+        with open(_context_path(match_dir), encoding="utf-8") as f: text = f.read()
+    except OSError: pass
+    with _lock: _contexts[key] = text
+    return text
+
+def system_prompt(module, match_dir=None, header=None):
+    """模块的固定前缀；header 用于自带完整说明的模块 (如润色的各人设)"""
+    if header is None:
+        task, fmt = MODULE_TASKS[module]
+        header = f"{PERSONA}\n{task}\n{fmt}"
+    context = match_context(match_dir)
+    return f"{header}\n\n{context}" if context else header
+
+def build_messages(module, suffix, match_dir=None, header=None):
+    return [{"role": "system", "content": system_prompt(module, match_dir, header)},
+            {"role": "user", "content": suffix}]
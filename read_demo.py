@@ -1,5 +1,5 @@
-from awpy import Demo
 from pathlib import Path
+import os
 import csv
 import warnings
 import pandas as pd
@@ -11,27 +11,35 @@ warnings.filterwarnings("ignore")
 SMOKE_CSV = "烟雾弹详细信息.csv"
 INFERNO_CSV = "燃烧弹详细信息.csv"
 
-def parse_demo(demo_path_input):
+def parse_demo(demo_path_input, demo_tables=None):
     demo_path = Path(demo_path_input)
-    print(f"🔧 [read_demo] 解析: {demo_path.name}")
-    
-    dem = Demo(str(demo_path))
-    dem.parse()
 
     # 🔥🔥🔥 强制使用配置中的 64 🔥🔥🔥
     tickrate = config.TICKRATE 
-    print(f"   ℹ️ [read_demo] 强制 Tickrate: {tickrate}")
 
-    def to_df(data):
-        if hasattr(data, "to_pandas"): return data.to_pandas()
-        return pd.DataFrame(data)
+    def to_records(data):
+        if hasattr(data, "to_dicts"): return data.to_dicts()
+        return pd.DataFrame(data).to_dict('records')
+
+    # 调度器已解析过 demo 时直接读表
+    if demo_tables is not None and demo_tables.has("smokes"):
+        # 道具表很小，直接从 Arrow 表取记录，不经过 pandas 中转
+        smokes = demo_tables.polars("smokes").to_dicts()
+        infernos = demo_tables.polars("infernos").to_dicts() if demo_tables.has("infernos") else []
+        return smokes, infernos, tickrate
 
-    smokes = to_df(dem.smokes).to_dict('records') if hasattr(dem, 'smokes') else []
-    infernos = to_df(dem.infernos).to_dict('records') if hasattr(dem, 'infernos') else []
+    print(f"🔧 [read_demo] 解析: {demo_path.name}")
+    print(f"   ℹ️ [read_demo] 强制 Tickrate: {tickrate}")
+    from awpy import Demo  # 只有没拿到解析好的表时才需要 awpy
+    dem = Demo(str(demo_path))
+    dem.parse()
+
+    smokes = to_records(dem.smokes) if hasattr(dem, 'smokes') else []
+    infernos = to_records(dem.infernos) if hasattr(dem, 'infernos') else []
     
     return smokes, infernos, tickrate
 
-def process_grenade_data(raw_data, g_type_name, tickrate):
+def process_grenade_data(raw_data, g_type_name, tickrate, g_key="smoke"):
     processed = []
     
     for item in raw_data:
@@ -51,6 +59,11 @@ def process_grenade_data(raw_data, g_type_name, tickrate):
         tick = item.get("start_tick", 0)
         if tick == 0: tick = item.get("tick", 0)
 
+        # 结束 tick：demo 里有真实值就用，否则按 GRENADE_DURATIONS 估算
+        end_tick = item.get("end_tick", 0)
+        if not end_tick or pd.isna(end_tick) or end_tick <= tick:
+            end_tick = tick + int(config.GRENADE_DURATIONS.get(g_key, 7) * tickrate)
+
         round_num = item.get("round_num", 0)
 
         processed.append({
@@ -60,8 +73,10 @@ def process_grenade_data(raw_data, g_type_name, tickrate):
             "落点所在范围": land_area, 
             "投掷物类型": g_type_name, 
             "tick时间戳": tick, 
+            "结束tick": end_tick,
             # 🔥 统一时间基准
             "start_time": tick / float(tickrate),
+            "end_time": end_tick / float(tickrate),
             "回合数": round_num
         })
     
@@ -75,13 +90,32 @@ def write_csv(file_path, data):
         writer.writeheader()
         writer.writerows(data)
 
-def makeCSV(target_demo_path):
-    smokes_raw, infernos_raw, tickrate = parse_demo(target_demo_path)
+def load_grenade_tables(target_demo_path, raw_dir=None, demo_tables=None, rounds=None):
+    """
+    解析道具并直接在内存中返回 {"smoke": DataFrame, "inferno": DataFrame}；
+    传入 raw_dir (data/<demo>/raw) 时顺便落盘，多个 demo 并行互不覆盖；
+    传入 rounds 时只处理这些回合的道具 (落点映射之前就过滤)
+    """
+    smokes_raw, infernos_raw, tickrate = parse_demo(target_demo_path, demo_tables)
+    if rounds is not None:
+        wanted = set(rounds)
+        smokes_raw = [r for r in smokes_raw if r.get("round_num") in wanted]
+        infernos_raw = [r for r in infernos_raw if r.get("round_num") in wanted]
     
-    s_proc = process_grenade_data(smokes_raw, "Smoke (烟雾弹)", tickrate)
-    i_proc = process_grenade_data(infernos_raw, "Incendiary (燃烧弹)", tickrate)
-    
-    write_csv(SMOKE_CSV, s_proc)
-    write_csv(INFERNO_CSV, i_proc)
+    s_proc = process_grenade_data(smokes_raw, "Smoke (烟雾弹)", tickrate, "smoke")
+    i_proc = process_grenade_data(infernos_raw, "Incendiary (燃烧弹)", tickrate, "incendiary")
+
+    if raw_dir:
+        os.makedirs(raw_dir, exist_ok=True)
+        write_csv(os.path.join(raw_dir, SMOKE_CSV), s_proc)
+        write_csv(os.path.join(raw_dir, INFERNO_CSV), i_proc)
     
-    print(f"✅ [read_demo] 道具解析完成")
\ No newline at end of file
+    print(f"✅ [read_demo] 道具解析完成")
+    return {"smoke": pd.DataFrame(s_proc), "inferno": pd.DataFrame(i_proc)}
+
+def makeCSV(target_demo_path, raw_dir=None):
+    """兼容旧接口：默认写到 data/<demo>/raw 下，而不是当前目录"""
+    if raw_dir is None:
+        base_name = os.path.splitext(os.path.basename(str(target_demo_path)))[0]
+        raw_dir = os.path.join("data", base_name, "raw")
+    return load_grenade_tables(target_demo_path, raw_dir)
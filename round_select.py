@@ -0,0 +1,93 @@
+# round_select.py：回合选择
+# 调度器把要处理的回合 (None 表示整场) 传给各模块，各模块在提取和生成之前就按它过滤。
+# 模块缓存按回合合并：选中回合里已有缓存的直接复用，只生成缺的 (redo 时选中回合全部重做)，其它回合的缓存原样保留。
+# 缓存旁边的 *.rounds.json 记录已经生成过哪些回合 (或整场)，没有事件的回合和只跑过部分回合的缓存都能区分开
+import os
+import json
+import pandas as pd
+
+ALL_ROUNDS = "all"
+
+def parse_rounds(value):
+    """"3,7,9" / "1-5,13" -> [1, 2, 3, 4, 5, 13]；空值返回 None (整场)"""
+    if value is None or str(value).strip() == "": return None
+    rounds = set()
+    for part in str(value).split(","):
+        part = part.strip()
+        if not part: continue
+        lo, _, hi = part.partition("-")
+        rounds.update(range(int(lo), int(hi or lo) + 1))
+    return sorted(rounds) or None
+
+def resolve_rounds(rounds=None, test_mode=False):
+    """旧的 test_mode 等价于只选第 1 回合；显式给了回合时以回合为准"""
+    if rounds: return sorted({int(r) for r in rounds})
+    return [1] if test_mode else None
+
+def filter_rounds(df, rounds, col="round_num"):
+    """pandas/polars 通用；rounds 为 None 时原样返回"""
+    if df is None or rounds is None or col not in df.columns: return df
+    if isinstance(df, pd.DataFrame): return df[df[col].isin(list(rounds))]
+    import polars as pl
+    return df.filter(pl.col(col).is_in(list(rounds)))
+
+def coverage_path(cache_path):
+    return os.path.splitext(cache_path)[0] + ".rounds.json"
+
+def load_cache(cache_path):
+    """读模块缓存，返回 (DataFrame 或 None, covered)；covered 为 ALL_ROUNDS、回合集合，没有覆盖记录的旧缓存为 None"""
+    if not cache_path: return None, None
+    cached, covered = None, None
+    if os.path.exists(cache_path):
+        try: cached = pd.read_csv(cache_path, encoding="utf-8-sig")
+        except: pass
+    try:
+        with open(coverage_path(cache_path), encoding="utf-8") as f: data = json.load(f)
+        covered = ALL_ROUNDS if data.get("all") else {int(r) for r in data.get("rounds", [])}
+    except (OSError, ValueError): pass
+    return cached, covered
+
+def save_coverage(cache_path, covered, todo, df):
+    """
+    生成完 todo (None 为整场) 之后更新覆盖记录；df 为写回缓存的全部行。
+    只记真正产出了行的回合，没有产出 (如没有 Key、LLM 被跳过) 时不写记录，下次照常重新生成
+    """
+    if not cache_path or df is None or df.empty or "round_num" not in df.columns: return
+    produced = set(pd.to_numeric(df["round_num"], errors="coerce").dropna().astype(int))
+    if todo is None: data = {"all": True}
+    else:
+        produced &= {int(r) for r in todo}
+        if not produced: return
+        if covered == ALL_ROUNDS: data = {"all": True}
+        else: data = {"all": False, "rounds": sorted(set(covered or ()) | produced)}
+    tmp = coverage_path(cache_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f)
+    os.replace(tmp, coverage_path(cache_path))
+
+def plan_cache(cached, rounds, redo=False, covered=None):
+    """
+    按回合拆分已有缓存，返回 (todo, keep)：
+      todo: 需要生成的回合；None 表示整场，[] 表示全部命中缓存
+      keep: 写回缓存时保留的已有行 (不含 todo 里的回合)
+    整场运行在缓存记录为覆盖整场时直接复用，只跑过部分回合的缓存整场重新生成；
+    没有覆盖记录的旧缓存 (covered 为 None) 按它包含的回合算，整场运行照旧直接复用
+    """
+    if cached is not None and ("round_num" not in cached.columns or cached.empty): cached = None
+    if rounds is None:
+        reusable = covered == ALL_ROUNDS or (covered is None and cached is not None)
+        return ([], cached) if reusable and not redo else (None, None)
+    if covered == ALL_ROUNDS: have = set(rounds)
+    elif covered is not None: have = covered
+    elif cached is not None: have = set(pd.to_numeric(cached["round_num"], errors="coerce").dropna().astype(int).unique())
+    else: have = set()
+    todo = [r for r in rounds if redo or r not in have]
+    if cached is None: return todo, None
+    return todo, cached[~cached["round_num"].isin(todo)]
+
+def merge_cache(keep, new):
+    """保留行 + 新生成行，同一 event_id 以新生成的为准"""
+    frames = [df for df in (keep, new) if df is not None and not df.empty]
+    if not frames: return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    if "event_id" in merged.columns: merged = merged.drop_duplicates("event_id", keep="last")
+    return merged.reset_index(drop=True)
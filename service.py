@@ -0,0 +1,225 @@
+# service.py：常驻的本地 HTTP 服务
+# 启动时一次性加载所有模块、点位锚点、LLM 网关和解析进程池，之后的 demo 任务都复用这些热资源。
+# 任务进入有界队列，由固定数量的工作线程处理；客户端通过 NDJSON 流实时拿到阶段进度和中间排期
+#
+#   POST /jobs               {"demo": "...", "test": false, "rounds": "3,7,9", "personas": "machine"} -> {"job_id": "..."}
+#   GET  /jobs/<id>          任务状态和已产生的全部事件
+#   GET  /jobs/<id>/events   NDJSON 流，任务结束后关闭
+#   GET  /health             队列与网关统计
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import argparse
+import threading
+import traceback
+import concurrent.futures
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("OPENAI_API_KEY", os.getenv("DASHSCOPE_API_KEY") or "")
+
+import clean_cache
+import style_rewriter
+from llm_gateway import get_client
+from master_scheduler import MasterScheduler
+from round_select import parse_rounds
+from tracing import get_tracer, run_scope
+
+HOST = "127.0.0.1"
+PORT = 8765
+WORKERS = 2         # 同时处理的任务数
+QUEUE_SIZE = 8      # 排队上限，满了直接拒绝
+PARSE_WORKERS = 2   # 解析/预处理进程数
+JOB_HISTORY = 100   # 内存里最多保留多少个任务的记录
+
+def warm_worker():
+    """进程池预热：子进程提前导入解析依赖"""
+    import demo_tables, pretreatment  # noqa: F401
+    return os.getpid()
+
+class Job:
+    def __init__(self, demo, test_mode=False, personas=None, rounds=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.demo = demo
+        self.test_mode = test_mode
+        self.rounds = rounds
+        self.personas = personas
+        self.status = "queued"
+        self.events = []
+        self.created = time.time()
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def emit(self, event):
+        with self._cond:
+            self.events.append(dict(event, t=round(time.time() - self.created, 2)))
+            self._cond.notify_all()
+
+    def set_status(self, status, **data):
+        self.status = status
+        self.emit({"stage": status, **data})
+
+    def wait_events(self, start, timeout=15.0):
+        """阻塞到有第 start 条之后的新事件或任务结束，返回新事件"""
+        with self._cond:
+            if len(self.events) <= start and not self.finished:
+                self._cond.wait(timeout)
+            return self.events[start:]
+
+    def to_dict(self):
+        return {"job_id": self.id, "demo": self.demo, "status": self.status, "events": list(self.events)}
+
+class CasterService:
+    def __init__(self, api_key, workers=WORKERS, queue_size=QUEUE_SIZE, parse_workers=PARSE_WORKERS):
+        self.api_key = api_key
+        self.gateway = get_client(api_key)
+        style_rewriter.MY_API_KEY = api_key
+        self.procs = concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers)
+        for f in [self.procs.submit(warm_worker) for _ in range(parse_workers)]: f.result()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for t in self._threads: t.start()
+
+    def submit(self, demo, test_mode=False, personas=None, rounds=None):
+        """入队成功返回 Job，队列已满返回 None"""
+        job = Job(demo, test_mode, personas, rounds)
+        try: self.queue.put_nowait(job)
+        except queue.Full: return None
+        with self._lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > JOB_HISTORY:
+                oldest = next(iter(self.jobs))
+                if not self.jobs[oldest].finished: break
+                self.jobs.pop(oldest)
+        job.emit({"stage": "queued", "position": self.queue.qsize()})
+        return job
+
+    def get(self, job_id):
+        with self._lock: return self.jobs.get(job_id)
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            try:
+                # 调度器之外 (润色) 记录的 span 也归到这个任务，结束后一起丢掉
+                with run_scope(f"job-{job.id}"): self._run(job)
+            except Exception as e:
+                traceback.print_exc()
+                job.set_status("failed", error=str(e))
+            finally:
+                get_tracer().drop(f"job-{job.id}")
+                self.queue.task_done()
+
+    def _run(self, job):
+        job.set_status("running")
+        llm_start = self.gateway.snapshot()
+        base_name = os.path.splitext(os.path.basename(job.demo))[0]
+        clean_cache.clean_files(clean_cache.find_cache_files(os.path.join("data", base_name)))
+
+        scheduler = MasterScheduler(job.demo, self.api_key, test_mode=job.test_mode, progress=job.emit, rounds=job.rounds)
+        if not scheduler.run(self.procs):
+            job.set_status("failed", error="无数据")
+            return
+
+        final_path = os.path.join(scheduler.output_final_dir, "final_schedule.csv")
+        personas = style_rewriter.parse_persona_list(job.personas or ",".join(style_rewriter.DEFAULT_PERSONAS))
+        style_rewriter.rewrite_files([final_path], personas)
+        styled = {k: style_rewriter.styled_path(final_path, k) for k in personas}
+        # 网关是全进程共享的：这里是任务期间的增量，同时在跑的其它任务的请求也会算进来
+        job.set_status("done", schedule=final_path, styled=styled, llm=self.gateway.summary(since=llm_start), llm_scope="任务期间全进程增量")
+
+    def health(self):
+        with self._lock:
+            running = sum(j.status == "running" for j in self.jobs.values())
+        return {"queued": self.queue.qsize(), "running": running, "queue_size": self.queue.maxsize,
+                "llm": self.gateway.snapshot()}
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("?")[0].split("/") if p]
+            if parts == ["health"]: return self._json(200, service.health())
+            if len(parts) >= 2 and parts[0] == "jobs":
+                job = service.get(parts[1])
+                if job is None: return self._json(404, {"error": "job not found"})
+                if len(parts) == 2: return self._json(200, job.to_dict())
+                if parts[2] == "events": return self._stream(job)
+            self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs": return self._json(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                req = json.loads(self.rfile.read(length) or b"{}")
+            except Exception: return self._json(400, {"error": "invalid json"})
+            demo = req.get("demo")
+            if not demo or not os.path.exists(demo): return self._json(400, {"error": f"demo not found: {demo}"})
+            rounds = req.get("rounds")
+            try: rounds = parse_rounds(",".join(map(str, rounds)) if isinstance(rounds, list) else rounds)
+            except ValueError: return self._json(400, {"error": f"invalid rounds: {rounds}"})
+            job = service.submit(demo, bool(req.get("test")), req.get("personas"), rounds)
+            if job is None: return self._json(503, {"error": "queue full"})
+            self._json(202, {"job_id": job.id})
+
+        def _stream(self, job):
+            # HTTP/1.0 下不写 Content-Length，写完关闭连接即结束
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.end_headers()
+            sent = 0
+            try:
+                while True:
+                    new = job.wait_events(sent)
+                    for ev in new:
+                        self.wfile.write((json.dumps(ev, ensure_ascii=False) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                    sent += len(new)
+                    if job.finished and sent >= len(job.events): break
+            except (BrokenPipeError, ConnectionResetError): pass
+
+        def log_message(self, fmt, *args):
+            sys.stderr.write(f"🌐 [Service] {self.address_string()} {fmt % args}\n")
+    return Handler
+
+def serve(api_key, host=HOST, port=PORT, workers=WORKERS, queue_size=QUEUE_SIZE):
+    service = CasterService(api_key, workers=workers, queue_size=queue_size)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"🛰️ [Service] 监听 http://{host}:{port} (工作线程 {workers}, 队列上限 {queue_size})")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally:
+        server.server_close()
+        service.procs.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE, help="排队上限")
+    args = parser.parse_args()
+
+    key = os.getenv("DASHSCOPE_API_KEY")
+    if not key:
+        print("❌ 错误：未找到 API Key！请确保项目根目录下有 .env 文件并配置了 DASHSCOPE_API_KEY")
+        sys.exit(1)
+    serve(key, args.host, args.port, args.workers, args.queue)
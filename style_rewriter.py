@@ -2,19 +2,126 @@ import pandas as pd
 import os
 import json
 import re
+import hashlib
+import argparse
 import concurrent.futures
-from openai import OpenAI
+from llm_gateway import get_client
+from prompts import build_messages
+from tracing import span
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
 
 # ================= 配置区域 =================
-MY_API_KEY = os.getenv("DASHSCOPE_API_KEY") 
+MY_API_KEY = os.getenv("DASHSCOPE_API_KEY")
 # 建议使用 qwen-max 以获得更好的风格遵循能力，如果想省钱可以用 qwen-plus
-MODEL_NAME = "qwen3-max" 
-BATCH_SIZE = 10  # 批处理大小
+MODEL_NAME = "qwen3-max"
 TARGET_SPEED = 3.5 # 目标语速：每秒 X 个字 (玩机器语速稍快，设为3.5比较自然)
+MAX_WORKERS = 5 # 所有文件、所有人设共用一个并发池
+
+# 按估算 token 打包批次 (替代固定 BATCH_SIZE)
+PROMPT_TOKEN_BUDGET = 2500   # 单批次输入 token 上限 (不含固定模板)
+RESPONSE_TOKEN_BUDGET = 1200 # 单批次输出 token 上限
+MAX_BATCH_ITEMS = 40         # 单批次最多条数，防止 JSON 过长容易截断
+MAX_RETRY_ROUNDS = 2         # 缺失/非法 id 的补发轮数
+
+# 增量润色：按 (原文, 时长, 人设) 指纹复用历史结果
+STYLE_PERSONA = "玩机器"
+STYLE_CACHE_NAME = "style_gen_cache.csv"
+
+# 多人设：同一份中性排期一次性产出多个解说版本，每个人设一个输出文件
+# speed: 每秒字数(中文) 或 每秒词数(英文)；unit: 限制里的计量单位；lang: 固定说明和输入数据用哪套模板 (默认中文)
+PERSONAS = {
+    "machine": {
+        "name": STYLE_PERSONA,
+        "suffix": "_machine_style",
+        "speed": TARGET_SPEED,
+        "unit": "字",
+        "system": "你是一个严格控制语速的CS2解说。请直接输出JSON，不要包含markdown标记。",
+        "intro": "你现在是CS2知名主播“玩机器”（Machine）。\n请将以下【解说原文】重写为【玩机器直播风格】。",
+        "style": """1. **口语化/造梗**：
+   - 拒绝机械播报！不要说"玩家A击杀了玩家B"，要说"A这波定位太准了"、"B直接白给"。
+   - 常用词：干拉、白给、这波、有点东西、也是没谁了、这把没了。
+   - 称呼：ZywOo=载物, s1mple=森破, NiKo=尼公子, donk=东雪, m0NESY=小孩。
+2. **情绪**：
+   - 看到连杀要激动：“卧槽！这也能杀？！”
+   - 看到失误要吐槽：“这波他在干嘛？他在马什么？”""",
+        "example": {"0": "这波载物大狙架得太死，没人能过！", "1": "donk这就直接干拉了？太自信了吧！"},
+    },
+    "classic": {
+        "name": "赛事官方解说",
+        "suffix": "_classic_style",
+        "speed": 3.0,
+        "unit": "字",
+        "system": "你是一个严格控制语速的CS2赛事解说。请直接输出JSON，不要包含markdown标记。",
+        "intro": "你现在是CS2 Major 中文官方解说。\n请将以下【解说原文】重写为【专业赛事解说风格】。",
+        "style": """1. **专业克制**：
+   - 用词准确，点明位置、道具和战术意图，少用网络梗。
+   - 选手使用官方ID，不用外号。
+2. **节奏**：
+   - 关键击杀语气上扬，回合总结平稳清晰。""",
+        "example": {"0": "ZywOo大狙架住中路，一枪带走突破手！", "1": "donk选择正面突破，非常果断。"},
+    },
+    "english": {
+        "name": "English caster",
+        "suffix": "_english_style",
+        "speed": 2.5,
+        "unit": "words",
+        "lang": "en",
+        "system": "You are a CS2 caster with strict pacing. Output raw JSON only, no markdown.",
+        "intro": "You are an energetic English-language CS2 play-by-play caster.\nRewrite each source line (neutral commentary written in Chinese) as an English casting line.",
+        "style": """1. **Play-by-play**: short, punchy, present tense. Use player IDs as written.
+2. **Hype**: multi-kills and clutches get exclamation; mistakes get a light jab.""",
+        "example": {"0": "ZywOo holds mid with the AWP, nobody gets through!", "1": "donk just swings wide, so confident!"},
+    },
+}
+DEFAULT_PERSONAS = ["machine"]
+
+# 固定说明模板：{system} {intro} {speed} {unit} {short_len} {style} {example} 由人设填入
+STYLE_TEMPLATES = {
+    "zh": """{system}
+
+{intro}
+
+【⚠️⚠️ 核心要求：语速控制 ⚠️⚠️】
+1. **严格遵守字数限制**：每条数据都标注了`限制`（基于{speed}{unit}/秒计算）。
+   - 如果时长只有 2秒，你只能说 {short_len} 个{unit}左右！
+   - 绝不要写长！解说必须跟得上画面！
+   - 如果原文很长但时间很短，**必须大幅删减**，只留最核心的击杀信息。
+
+【人设风格】
+{style}
+
+【输出格式】
+请返回一个 JSON 对象，Key是id，Value是重写后的文本。
+例如：
+{example}""",
+    "en": """{system}
+
+{intro}
+
+[CRITICAL: PACING]
+1. **Respect the word limit**: every item carries a `limit` (based on {speed} {unit} per second).
+   - If an item lasts only 2 seconds, you get about {short_len} {unit}!
+   - Never run long. The call has to keep up with the action!
+   - If the source is long but the slot is short, **cut hard** and keep only the key kill.
+
+[STYLE]
+{style}
+
+[OUTPUT FORMAT]
+Return one JSON object: key = id, value = the rewritten line.
+Example:
+{example}""",
+}
+# 输入数据的标题和字段名
+STYLE_INPUT_LABELS = {
+    "zh": {"header": "【输入数据】", "text": "原文", "duration": "时长", "limit": "限制",
+           "duration_fmt": "{:.1f}秒", "limit_fmt": "{}{}左右"},
+    "en": {"header": "[INPUT]", "text": "source", "duration": "duration", "limit": "limit",
+           "duration_fmt": "{:.1f}s", "limit_fmt": "about {} {}"},
+}
 
 # 黑名单关键词（如果原文包含这些，可能需要特殊处理或过滤）
 BLACKLIST_KEYWORDS = [
@@ -32,173 +139,292 @@ def parse_duration(time_range_str):
     except:
         return 4.0 # 默认兜底时长
 
-def get_machine_style_prompt(events_batch):
+def fingerprint(text, duration, persona=STYLE_PERSONA):
+    """同一原文、同一时长、同一人设 => 同一指纹"""
+    raw = f"{persona}\x1f{str(text).strip()}\x1f{duration:.1f}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def styled_path(csv_path, persona_key):
+    return csv_path.replace(".csv", f"{PERSONAS[persona_key]['suffix']}.csv")
+
+def style_cache_path(csv_path):
+    """data/<demo>/output/final_schedule.csv -> data/<demo>/cache/style_gen_cache.csv"""
+    out_dir = os.path.dirname(os.path.abspath(csv_path))
+    if os.path.basename(out_dir) == "output":
+        cache_dir = os.path.join(os.path.dirname(out_dir), "cache")
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, STYLE_CACHE_NAME)
+    return os.path.join(out_dir, STYLE_CACHE_NAME)
+
+def load_style_cache(csv_path, persona_keys=None):
+    """读取指纹缓存；已有的各人设输出文件也作为种子导入"""
+    cache = {}
+    for key in persona_keys or DEFAULT_PERSONAS:
+        old_path = styled_path(csv_path, key)
+        if not os.path.exists(old_path): continue
+        try:
+            old = pd.read_csv(old_path, encoding='utf-8-sig')
+            if {'原解说', '解说文本', '时间范围'}.issubset(old.columns):
+                for src_text, styled, t_range in zip(old['原解说'], old['解说文本'], old['时间范围']):
+                    # 与原文相同的行是失败兜底，不算润色结果
+                    if pd.isna(src_text) or pd.isna(styled) or str(src_text) == str(styled): continue
+                    cache[fingerprint(src_text, parse_duration(t_range), PERSONAS[key]['name'])] = str(styled)
+        except Exception as e:
+            print(f"   ⚠️ 旧润色结果读取失败: {e}")
+
+    cache_path = style_cache_path(csv_path)
+    if os.path.exists(cache_path):
+        try:
+            df = pd.read_csv(cache_path, encoding='utf-8-sig')
+            cache.update(dict(zip(df['fingerprint'], df['styled_text'].astype(str))))
+        except Exception as e:
+            print(f"   ⚠️ 润色缓存读取失败: {e}")
+    return cache
+
+def save_style_cache(csv_path, cache):
+    df = pd.DataFrame({"fingerprint": list(cache.keys()), "styled_text": list(cache.values())})
+    df.to_csv(style_cache_path(csv_path), index=False, encoding='utf-8-sig')
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中文按 1 字 1 token，其余按 4 字符 1 token"""
+    text = str(text)
+    cjk = len(re.findall(r'[\u4e00-\u9fff]', text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+def estimate_item_cost(item):
+    """返回 (prompt_tokens, response_tokens)"""
+    prompt_cost = estimate_tokens(item['text']) + 25  # id/时长/限制 等字段开销
+    # 英文按词计量，一个词约 1.5 token
+    unit_tokens = 1.5 if item.get('unit') == "words" else 1.0
+    response_cost = int(item['target_len'] * unit_tokens) + 10  # JSON key 与引号开销
+    return prompt_cost, response_cost
+
+def pack_batches(items):
+    """按时间顺序贪心装箱，任一预算超限即另起一批"""
+    batches = []
+    current, p_sum, r_sum = [], 0, 0
+    for item in items:
+        p_cost, r_cost = estimate_item_cost(item)
+        if current and (p_sum + p_cost > PROMPT_TOKEN_BUDGET
+                        or r_sum + r_cost > RESPONSE_TOKEN_BUDGET
+                        or len(current) >= MAX_BATCH_ITEMS):
+            batches.append(current)
+            current, p_sum, r_sum = [], 0, 0
+        current.append(item)
+        p_sum += p_cost
+        r_sum += r_cost
+    if current: batches.append(current)
+    return batches
+
+def get_style_system(persona_key="machine"):
     """
-    构建包含【语速限制】的玩机器风格 Prompt
+    人设的固定说明 (含【语速限制】和输出格式)，同一人设逐字节不变，放在 system 前缀里
     """
-    # 将 DataFrame 行转为字典列表，并注入字数限制
+    persona = PERSONAS[persona_key]
+    return STYLE_TEMPLATES[persona.get('lang', 'zh')].format(
+        system=persona['system'], intro=persona['intro'], speed=persona['speed'], unit=persona['unit'],
+        short_len=int(2 * persona['speed']), style=persona['style'],
+        example=json.dumps(persona['example'], ensure_ascii=False, indent=2))
+
+def get_style_prompt(events_batch, persona_key="machine"):
+    """
+    每个批次的动态部分：带字数限制的【输入数据】
+    """
+    persona = PERSONAS[persona_key]
+    labels = STYLE_INPUT_LABELS[persona.get('lang', 'zh')]
+    # 将 DataFrame 行转为字典列表，并注入字数限制 (没有 target_len 时按人设语速现算)
     context_data = []
     for item in events_batch:
-        duration = item['duration']
-        # 计算目标字数：时长 * 语速，上下浮动一点
-        target_len = int(duration * TARGET_SPEED)
-        
+        target_len = item.get('target_len', int(item['duration'] * persona['speed']))
         context_data.append({
             "id": item['idx'],
-            "原文": item['text'],
-            "时长": f"{duration:.1f}秒",
-            "限制": f"{target_len}字左右"  # 显式告诉LLM字数限制
+            labels['text']: item['text'],
+            labels['duration']: labels['duration_fmt'].format(item['duration']),
+            labels['limit']: labels['limit_fmt'].format(target_len, persona['unit'])  # 显式告诉LLM字数限制
         })
+    return labels['header'] + "\n" + json.dumps(context_data, ensure_ascii=False, indent=2)
 
-    events_str = json.dumps(context_data, ensure_ascii=False, indent=2)
-    
-    return f"""
-你现在是CS2知名主播“玩机器”（Machine）。
-请将以下【解说原文】重写为【玩机器直播风格】。
-
-【⚠️⚠️ 核心要求：语速控制 ⚠️⚠️】
-1. **严格遵守字数限制**：每条数据都标注了`限制`（基于3.5字/秒计算）。
-   - 如果时长只有 2秒，你只能说 6-7 个字！(例如："这波donk直接秒了！")
-   - 绝不要写长！解说必须跟得上画面！
-   - 如果原文很长但时间很短，**必须大幅删减**，只留最核心的击杀信息。
-
-【人设风格】
-1. **口语化/造梗**：
-   - 拒绝机械播报！不要说"玩家A击杀了玩家B"，要说"A这波定位太准了"、"B直接白给"。
-   - 常用词：干拉、白给、这波、有点东西、也是没谁了、这把没了。
-   - 称呼：ZywOo=载物, s1mple=森破, NiKo=尼公子, donk=东雪, m0NESY=小孩。
-2. **情绪**：
-   - 看到连杀要激动：“卧槽！这也能杀？！”
-   - 看到失误要吐槽：“这波他在干嘛？他在马什么？”
-
-【输入数据】
-{events_str}
+def get_machine_style_prompt(events_batch):
+    """兼容旧调用：玩机器人设的完整 Prompt (固定说明 + 输入数据)"""
+    return get_style_system("machine") + "\n\n" + get_style_prompt(events_batch, "machine")
 
-【输出格式】
-请返回一个 JSON 对象，Key是id，Value是重写后的文本。
-例如：
-{{
-  "0": "这波载物大狙架得太死，没人能过！",
-  "1": "donk这就直接干拉了？太自信了吧！"
-}}
-"""
-
-def process_batch(client, batch_df):
-    """处理单个批次"""
-    # 准备数据，包含索引以便对应
-    batch_input = []
-    for idx, row in batch_df.iterrows():
-        text = str(row.get('解说文本', ''))
-        if not text or text.lower() == 'nan': continue
-        
-        duration = parse_duration(row.get('时间范围', '0-0s'))
-        
-        batch_input.append({
-            "idx": idx,
-            "text": text,
-            "duration": duration
-        })
-    
+def process_batch(client, batch_input, persona_key="machine", match_dir=None):
+    """处理单个批次，只返回合法的结果 {idx: text}，缺失/非法的 id 由调用方补发"""
     if not batch_input: return {}
 
-    prompt = get_machine_style_prompt(batch_input)
-    
+    with span("style_prompt", "prompt", items=len(batch_input)):
+        prompt = get_style_prompt(batch_input, persona_key)
+
     try:
         resp = client.chat.completions.create(
             model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "你是一个严格控制语速的CS2解说。请直接输出JSON，不要包含markdown标记。"},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_messages("style", prompt, match_dir, header=get_style_system(persona_key)),
             temperature=0.8, # 稍微高一点，增加风格化
             response_format={"type": "json_object"}
         )
         content = resp.choices[0].message.content
         # 清洗可能的 markdown
         if content.startswith("```json"): content = content[7:-3]
-        
-        return json.loads(content)
+        data = json.loads(content)
     except Exception as e:
         print(f"   ⚠️ 批次处理失败: {e}")
-        # 失败兜底：返回原文
-        return {item['idx']: item['text'] for item in batch_input}
+        return {}
+
+    if not isinstance(data, dict): return {}
+    wanted = {item['idx'] for item in batch_input}
+    valid = {}
+    for k, v in data.items():
+        try: idx = int(k)
+        except (TypeError, ValueError): continue
+        if idx in wanted and isinstance(v, str) and v.strip():
+            valid[idx] = v.strip()
+    return valid
+
+def match_dir_of(csv_path):
+    """data/<demo>/output/final_schedule.csv -> data/<demo>"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(csv_path)))
 
-def process_file(csv_path):
+def load_schedule(csv_path):
+    """读取排期文件，返回 (df, 待润色条目列表)；条目与人设无关，可被多个人设共享"""
     if not os.path.exists(csv_path):
         print(f"❌ 文件不存在: {csv_path}")
-        return
+        return None, []
 
-    print(f"✨ [Style] 正在玩机器化 (3.5字/s): {os.path.basename(csv_path)}")
     df = pd.read_csv(csv_path)
-    
     if '解说文本' not in df.columns:
-        print("   ⚠️ 缺少'解说文本'列，跳过")
-        return
+        print(f"   ⚠️ 缺少'解说文本'列，跳过: {csv_path}")
+        return None, []
+
+    items = []
+    for idx, row in df.iterrows():
+        text = str(row.get('解说文本', ''))
+        if not text or text.lower() == 'nan': continue
+        items.append({
+            "idx": idx,
+            "text": text,
+            "duration": parse_duration(row.get('时间范围', '0-0s'))
+        })
+    return df, items
 
-    # 初始化客户端
-    if not MY_API_KEY:
-        print("   ❌ 无 API Key")
+def persona_items(items, persona_key):
+    """为某个人设补上目标长度和指纹"""
+    persona = PERSONAS[persona_key]
+    return [{
+        **item,
+        "target_len": int(item['duration'] * persona['speed']),
+        "unit": persona['unit'],
+        "fp": fingerprint(item['text'], item['duration'], persona['name'])
+    } for item in items]
+
+def write_styled(csv_path, df, results_map, persona_key="machine"):
+    # 回填结果：没有结果的行保留原文本
+    out = df.copy()
+    out['原解说'] = out['解说文本']
+    out['解说文本'] = [results_map.get(idx, df.at[idx, '解说文本']) for idx in df.index]
+
+    new_path = styled_path(csv_path, persona_key)
+    out.to_csv(new_path, index=False, encoding='utf-8-sig')
+    print(f"🎉 润色完成！输出: {new_path}")
+
+def rewrite_files(csv_paths, persona_keys=None):
+    """
+    所有排期文件、所有人设共用一个客户端和并发池：
+    每个 (文件, 人设) 是一条独立的批次流，缺失的 id 单独补发；指纹命中的行不再请求模型
+    """
+    persona_keys = [k for k in (persona_keys or DEFAULT_PERSONAS) if k in PERSONAS]
+    if not persona_keys:
+        print(f"   ❌ 未知人设，可选: {', '.join(PERSONAS)}")
         return
-    client = OpenAI(
-    api_key=MY_API_KEY, 
-    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-)
-
-    # 分批处理
-    results_map = {}
-    batches = [df.iloc[i:i+BATCH_SIZE] for i in range(0, len(df), BATCH_SIZE)]
-    
-    print(f"   🚀 共 {len(df)} 条解说，分为 {len(batches)} 个批次并发处理...")
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_batch = {executor.submit(process_batch, client, batch): i for i, batch in enumerate(batches)}
-        
+
+    jobs = {}
+    for path in csv_paths:
+        df, items = load_schedule(path)
+        if df is None: continue
+        cache = load_style_cache(path, persona_keys)
+        streams = {}
+        for key in persona_keys:
+            p_items = persona_items(items, key)
+            results = {item['idx']: cache[item['fp']] for item in p_items if item['fp'] in cache}
+            todo = [item for item in p_items if item['fp'] not in cache]
+            print(f"✨ [Style] {PERSONAS[key]['name']} ({PERSONAS[key]['speed']}{PERSONAS[key]['unit']}/s): {os.path.basename(path)} (复用 {len(results)} 条，新增 {len(todo)} 条)")
+            streams[key] = {"items": p_items, "results": results, "batches": pack_batches(todo)}
+        jobs[path] = {"df": df, "cache": cache, "streams": streams}
+
+    total = sum(len(s["batches"]) for j in jobs.values() for s in j["streams"].values())
+    client = None
+    if total:
+        if not MY_API_KEY:
+            print("   ❌ 无 API Key")
+            return
+        client = get_client(MY_API_KEY)
+    print(f"   🚀 共 {len(jobs)} 个文件 x {len(persona_keys)} 个人设，{total} 个批次并发处理...")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending = {}
+        for path, job in jobs.items():
+            for key, stream in job["streams"].items():
+                for batch in stream["batches"]:
+                    pending[executor.submit(process_batch, client, batch, key, match_dir_of(path))] = (path, key, batch, 0)
+
         completed = 0
-        for future in concurrent.futures.as_completed(future_to_batch):
-            try:
-                batch_res = future.result()
-                # 将结果合并到总字典中 (Key是索引, Value是文本)
-                # 注意：JSON key 是字符串，需要转回 int 索引
-                for k, v in batch_res.items():
-                    results_map[int(k)] = v
-                
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                path, key, batch, attempt = pending.pop(future)
+                try: batch_res = future.result()
+                except Exception as e:
+                    print(f"      ❌ 批次异常: {e}")
+                    batch_res = {}
+                jobs[path]["streams"][key]["results"].update(batch_res)
+
+                # 只补发缺失或非法的 id
+                missing = [item for item in batch if item['idx'] not in batch_res]
+                if missing and attempt < MAX_RETRY_ROUNDS:
+                    for retry_batch in pack_batches(missing):
+                        pending[executor.submit(process_batch, client, retry_batch, key, match_dir_of(path))] = (path, key, retry_batch, attempt + 1)
+                elif missing:
+                    print(f"      ⚠️ [{PERSONAS[key]['name']}] {len(missing)} 条重试后仍失败，保留原文")
+
                 completed += 1
                 if completed % 5 == 0:
-                    print(f"      进度: {completed}/{len(batches)}")
-            except Exception as e:
-                print(f"      ❌ 批次异常: {e}")
-
-    # 回填结果
-    # 创建新列，如果没有结果则保留原文本
-    new_texts = []
-    for idx in df.index:
-        if idx in results_map:
-            new_texts.append(results_map[idx])
-        else:
-            new_texts.append(df.at[idx, '解说文本']) # 兜底
-            
-    df['原解说'] = df['解说文本']
-    df['解说文本'] = new_texts
-    
-    # 保存
-    new_path = csv_path.replace(".csv", "_machine_style.csv")
-    df.to_csv(new_path, index=False, encoding='utf-8-sig')
-    print(f"🎉 润色完成！输出: {new_path}")
+                    print(f"      进度: {completed} 个批次已返回")
 
-if __name__ == "__main__":
-    # 自动扫描 output 目录
-    base_dir = os.path.join(os.getcwd(), "data")
+    for path, job in jobs.items():
+        for key, stream in job["streams"].items():
+            # 只把模型真正返回的结果写进指纹缓存，兜底原文不入缓存
+            for item in stream["items"]:
+                if item['idx'] in stream["results"]:
+                    job["cache"][item['fp']] = stream["results"][item['idx']]
+            write_styled(path, job["df"], stream["results"], key)
+        save_style_cache(path, job["cache"])
+
+def process_file(csv_path, persona_keys=None):
+    rewrite_files([csv_path], persona_keys)
+
+def find_schedule_files(base_dir=None):
+    # 递归查找 final_schedule.csv
+    base_dir = base_dir or os.path.join(os.getcwd(), "data")
     target_files = []
-    
     if os.path.exists(base_dir):
-        # 递归查找 final_schedule.csv
         for root, dirs, files in os.walk(base_dir):
             for file in files:
                 if file == "final_schedule.csv":
                     target_files.append(os.path.join(root, file))
-    
+    return target_files
+
+def parse_persona_list(value):
+    return [p.strip() for p in str(value).split(",") if p.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--personas", type=str, default=os.getenv("STYLE_PERSONAS", ",".join(DEFAULT_PERSONAS)),
+                        help=f"逗号分隔的人设列表，可选: {', '.join(PERSONAS)}")
+    args = parser.parse_args()
+
+    # 自动扫描 output 目录
+    target_files = find_schedule_files()
+
     if not target_files:
         print("⚠️ 未找到 final_schedule.csv，请先运行主程序。")
     else:
-        for f in target_files:
-            process_file(f)
\ No newline at end of file
+        rewrite_files(target_files, parse_persona_list(args.personas))
@@ -0,0 +1,5 @@
+# 模块都平铺在仓库根目录，测试从这里导入
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
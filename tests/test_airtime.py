@@ -0,0 +1,33 @@
+import numpy as np
+from airtime import priority_weights, estimate_speech_duration, schedule_airtime
+
+def test_priority_weights_lookup_and_default():
+    w = priority_weights([1, 6, 2, 99, -1])
+    assert w.tolist() == [10.0, 8.0, 6.0, 1.0, 1.0]
+
+def test_speech_duration_floor_and_span():
+    dur = estimate_speech_duration([0, 100], span=[5.0, np.nan])
+    assert dur.tolist() == [5.0, 22.0]
+
+def test_heavier_event_wins_overlap():
+    # 两条同时开始：不能同时播，推迟后扣的权重也比不上直接播重的那条
+    out = schedule_airtime([0.0, 0.0], [3.0, 3.0], [10.0, 2.0], max_drift=0.0)
+    assert out[0] == 0.0 and np.isnan(out[1])
+
+def test_two_light_events_beat_one_heavier():
+    # WIS 看总权重：两条不冲突的 6 分胜过一条跨过它们的 10 分
+    out = schedule_airtime([0.0, 3.0, 0.0], [3.0, 3.0, 6.0], [6.0, 6.0, 10.0], max_drift=0.0)
+    assert out[:2].tolist() == [0.0, 3.0] and np.isnan(out[2])
+
+def test_drift_pushes_event_back():
+    out = schedule_airtime([0.0, 1.0], [3.0, 3.0], [10.0, 8.0])
+    assert out[0] == 0.0
+    assert out[1] == 3.0  # 推迟 2 秒接在第一条后面，扣 2 * DRIFT_PENALTY 仍然值得
+
+def test_groups_have_separate_timelines():
+    out = schedule_airtime([0.0, 0.0], [3.0, 3.0], [10.0, 2.0], group=[0, 1], max_drift=0.0)
+    assert out.tolist() == [0.0, 0.0]
+
+def test_each_event_scheduled_at_most_once():
+    out = schedule_airtime([0.0], [1.0], [10.0])
+    assert out.tolist() == [0.0]
@@ -0,0 +1,48 @@
+import os
+import pandas as pd
+from cache_writer import CacheWriter
+
+FIELDS = ["event_id", "round_num", "text"]
+
+def _row(i, r=1):
+    return {"event_id": f"e{i}", "round_num": r, "text": f"t{i}"}
+
+def _crash(path, rows):
+    """写入并提交后不 close，模拟进程中途崩溃"""
+    writer = CacheWriter(path, FIELDS, flush_rows=1)
+    for row in rows: writer.add(row)
+    writer._conn.close()
+
+def test_close_exports_csv_and_removes_db(tmp_path):
+    path = str(tmp_path / "economy_gen_cache.csv")
+    writer = CacheWriter(path, FIELDS, flush_rows=100, flush_interval=100)
+    writer.add(_row(1))
+    writer.add(_row(2))
+    df = writer.close()
+    assert df["event_id"].tolist() == ["e1", "e2"]
+    assert pd.read_csv(path, encoding="utf-8-sig")["event_id"].tolist() == ["e1", "e2"]
+    assert not os.path.exists(writer.db_path)
+
+def test_resume_after_crash(tmp_path):
+    path = str(tmp_path / "economy_gen_cache.csv")
+    _crash(path, [_row(1), _row(2)])
+    writer = CacheWriter(path, FIELDS)
+    assert writer.done_ids() == {"e1", "e2"}
+    writer.add(_row(3))
+    assert writer.close()["event_id"].tolist() == ["e1", "e2", "e3"]
+
+def test_reset_discards_leftover_rows(tmp_path):
+    path = str(tmp_path / "economy_gen_cache.csv")
+    _crash(path, [_row(1)])
+    writer = CacheWriter(path, FIELDS, reset=True)
+    assert writer.done_ids() == set()
+    writer.add(_row(2))
+    assert writer.close()["event_id"].tolist() == ["e2"]
+
+def test_close_keeps_existing_rows_new_wins(tmp_path):
+    path = str(tmp_path / "economy_gen_cache.csv")
+    keep = pd.DataFrame([_row(1), dict(_row(2), text="old")])
+    writer = CacheWriter(path, FIELDS)
+    writer.add(_row(2, r=2))
+    df = writer.close(keep)
+    assert df.set_index("event_id")["text"].to_dict() == {"e1": "t1", "e2": "t2"}
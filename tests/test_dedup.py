@@ -0,0 +1,51 @@
+import pandas as pd
+from dedup import suppress_near_duplicates, NearDuplicateIndex, shingles
+
+TEXT = "ZywOo在中路用大狙架住了对面的突破手，一枪带走"
+
+def _events(rows):
+    cols = ["event_id", "round_num", "start_time", "event_type", "priority", "short_text_neutral", "medium_text_neutral", "players"]
+    return pd.DataFrame(rows, columns=cols)
+
+def test_index_finds_near_duplicate():
+    index = NearDuplicateIndex()
+    assert index.check_and_add(TEXT, "a")[0] is None
+    match, sim = index.check(TEXT + "！")
+    assert match == "a" and sim >= index.threshold
+
+def test_players_lower_similarity():
+    assert shingles(TEXT, players=["ZywOo"]) - shingles(TEXT) == {"@zywoo"}
+    index = NearDuplicateIndex(threshold=0.99)
+    index.add(TEXT, "a", players=["ZywOo"])
+    assert index.check(TEXT, players=["donk"])[0] is None
+
+def test_lighter_duplicate_dropped():
+    df = _events([
+        ["k1", 1, 10.0, "tactical", 1, "", TEXT, ""],
+        ["g1", 1, 12.0, "grenade", 3, "", TEXT, ""],
+    ])
+    out = suppress_near_duplicates(df)
+    assert out["event_id"].tolist() == ["k1"]
+
+def test_kill_and_round_summary_never_dropped():
+    df = _events([
+        ["t1", 1, 10.0, "tactical", 1, "", TEXT, ""],
+        ["k1", 1, 11.0, "kill", 1, "", TEXT, ""],
+        ["s1", 1, 12.0, "round_summary", 1, "", TEXT, ""],
+    ])
+    assert suppress_near_duplicates(df)["event_id"].tolist() == ["t1", "k1", "s1"]
+
+def test_protected_events_still_suppress_followers():
+    df = _events([
+        ["k1", 1, 10.0, "kill", 1, "", TEXT, ""],
+        ["g1", 1, 11.0, "grenade", 3, "", TEXT, ""],
+    ])
+    assert suppress_near_duplicates(df)["event_id"].tolist() == ["k1"]
+
+def test_other_round_and_outside_window_kept():
+    df = _events([
+        ["a", 1, 10.0, "tactical", 1, "", TEXT, ""],
+        ["b", 1, 40.0, "grenade", 3, "", TEXT, ""],
+        ["c", 2, 11.0, "grenade", 3, "", TEXT, ""],
+    ])
+    assert sorted(suppress_near_duplicates(df, window=20.0)["event_id"]) == ["a", "b", "c"]
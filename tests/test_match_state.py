@@ -0,0 +1,60 @@
+import pandas as pd
+from match_state import build_match_state, LOSS_BONUS
+
+TICKRATE = 64
+A = [f"a{i}" for i in range(5)]  # 第一回合在 T 方的队伍
+B = [f"b{i}" for i in range(5)]
+
+def _rounds(winners):
+    rows = []
+    for i, w in enumerate(winners):
+        start = i * 100 * TICKRATE
+        rows.append({"round_num": i + 1, "start": start, "freeze_end": start + 15 * TICKRATE,
+                     "official_end": start + 60 * TICKRATE, "winner": w})
+    return pd.DataFrame(rows)
+
+def _kill(r_num, tick, attacker, victim, attacker_side, victim_side):
+    return {"round_num": r_num, "tick": tick, "attacker_name": attacker, "victim_name": victim,
+            "attacker_side": attacker_side, "victim_side": victim_side}
+
+def test_score_streak_and_loss_bonus():
+    state = build_match_state(pd.DataFrame(), _rounds(["t", "t", "ct", "t"]), tickrate=TICKRATE)
+    r1, r4 = state.round_start(1), state.round_start(4)
+    assert (r1["score_T"], r1["score_CT"]) == (0, 0)
+    assert r1["loss_bonus_T"] == r1["loss_bonus_CT"] == LOSS_BONUS[1]
+    assert (r4["score_T"], r4["score_CT"]) == (2, 1)
+    assert (r4["streak_T"], r4["streak_CT"]) == (0, 1)
+    # T 方赢两局降到 0 档、输一局回到 1 档；CT 方输两局升到 3 档、赢一局回到 2 档
+    assert (r4["loss_bonus_T"], r4["loss_bonus_CT"]) == (LOSS_BONUS[1], LOSS_BONUS[2])
+    assert "比分: T 2 : 1 CT" in state.describe_round(4)
+
+def test_side_swap_at_half():
+    state = build_match_state(pd.DataFrame(), _rounds(["t"] * 12 + ["ct"]), tickrate=TICKRATE)
+    r12, r13 = state.round_start(12), state.round_start(13)
+    assert (r12["score_T"], r12["score_CT"]) == (11, 0)
+    # 换边后比分和连胜跟着队伍走，失败补偿重置
+    assert (r13["score_T"], r13["score_CT"]) == (0, 12)
+    assert r13["streak_CT"] == 12 and r13["streak_T"] == 0
+    assert r13["loss_bonus_T"] == r13["loss_bonus_CT"] == LOSS_BONUS[1]
+
+def test_roster_overrides_swap_rule():
+    # 第 13 回合击杀里 A 队仍在 T 方：按阵容判断没有换边
+    kills = pd.DataFrame([_kill(1, 20 * TICKRATE, A[0], B[0], "t", "ct"), _kill(1, 21 * TICKRATE, B[1], A[1], "ct", "t"),
+                          _kill(13, 1220 * TICKRATE, A[0], B[0], "t", "ct"), _kill(13, 1221 * TICKRATE, A[1], B[1], "t", "ct")])
+    state = build_match_state(kills, _rounds(["t"] * 12 + ["t"]), tickrate=TICKRATE)
+    r13 = state.round_start(13)
+    assert (r13["score_T"], r13["score_CT"]) == (12, 0)
+
+def test_alive_and_kd_per_second():
+    kills = pd.DataFrame([_kill(1, 20 * TICKRATE, A[0], B[0], "t", "ct"), _kill(1, 25 * TICKRATE, B[1], A[0], "ct", "t")])
+    state = build_match_state(kills, _rounds(["ct"]), tickrate=TICKRATE)
+    at = state.at(1, 20 * TICKRATE)
+    assert (at["alive_T"], at["alive_CT"]) == (5, 5)   # 这一秒内的击杀不算
+    at = state.at(1, 22 * TICKRATE)
+    assert (at["alive_T"], at["alive_CT"]) == (5, 4)
+    assert at["kd"][A[0]] == (1, 0)
+    at = state.at(1, 30 * TICKRATE)
+    assert (at["alive_T"], at["alive_CT"]) == (4, 4)
+    assert at["kd"][A[0]] == (1, 1) and at["kd"][B[1]] == (1, 0)
+    assert "a0 1杀1死" in state.describe(1, 30 * TICKRATE, players=[A[0]])
+    assert state.at(2, 0) is None
@@ -0,0 +1,71 @@
+import json
+import pandas as pd
+import pytest
+from round_select import (ALL_ROUNDS, parse_rounds, resolve_rounds, filter_rounds, coverage_path,
+                          load_cache, save_coverage, plan_cache, merge_cache)
+
+def _cache(rounds):
+    return pd.DataFrame({"event_id": [f"{r}_1" for r in rounds], "round_num": rounds, "text": ["old"] * len(rounds)})
+
+def test_parse_and_resolve():
+    assert parse_rounds("3,7,9") == [3, 7, 9]
+    assert parse_rounds("1-3, 13") == [1, 2, 3, 13]
+    assert parse_rounds("") is None
+    with pytest.raises(ValueError): parse_rounds("a-b")
+    assert resolve_rounds(None, test_mode=True) == [1]
+    assert resolve_rounds([5, 2, 5]) == [2, 5]
+
+def test_filter_rounds():
+    assert filter_rounds(_cache([1, 2, 3]), [2])["round_num"].tolist() == [2]
+    assert len(filter_rounds(_cache([1, 2]), None)) == 2
+
+def test_plan_only_missing_rounds():
+    todo, keep = plan_cache(_cache([1, 2]), [2, 3], covered={1, 2})
+    assert todo == [3]
+    assert keep["round_num"].tolist() == [1, 2]
+
+def test_plan_redo_regenerates_selected():
+    todo, keep = plan_cache(_cache([1, 2]), [2, 3], redo=True, covered={1, 2})
+    assert todo == [2, 3]
+    assert keep["round_num"].tolist() == [1]
+
+def test_plan_full_run():
+    assert plan_cache(_cache([1]), None, covered=ALL_ROUNDS)[0] == []
+    assert plan_cache(_cache([1]), None, covered={1}) == (None, None)   # 只跑过部分回合
+    assert plan_cache(_cache([1]), None, redo=True, covered=ALL_ROUNDS) == (None, None)
+    assert plan_cache(None, None) == (None, None)
+
+def test_plan_legacy_cache_covers_its_rounds():
+    cached = _cache([1, 2])
+    todo, keep = plan_cache(cached, None, covered=None)
+    assert todo == [] and keep is cached
+    assert plan_cache(cached, [2, 3], covered=None)[0] == [3]
+
+def test_merge_prefers_new_rows():
+    new = pd.DataFrame({"event_id": ["2_1", "3_1"], "round_num": [2, 3], "text": ["new", "new"]})
+    merged = merge_cache(_cache([1, 2]), new)
+    assert merged.set_index("event_id")["text"].to_dict() == {"1_1": "old", "2_1": "new", "3_1": "new"}
+    assert merge_cache(None, pd.DataFrame()).empty
+
+def test_coverage_records_only_produced_rounds(tmp_path):
+    path = str(tmp_path / "kill_gen_cache.csv")
+    save_coverage(path, None, [3, 4], _cache([1, 3]))
+    with open(coverage_path(path), encoding="utf-8") as f: assert json.load(f) == {"all": False, "rounds": [3]}
+    save_coverage(path, {3}, [4, 5], _cache([1, 3, 5]))
+    assert load_cache(path)[1] == {3, 5}
+    save_coverage(path, None, None, _cache([1]))
+    assert load_cache(path)[1] == ALL_ROUNDS
+
+def test_coverage_skipped_without_rows(tmp_path):
+    path = str(tmp_path / "kill_gen_cache.csv")
+    save_coverage(path, None, [1], pd.DataFrame())
+    save_coverage(path, None, [2], _cache([1]))
+    save_coverage(path, None, None, None)
+    assert not (tmp_path / "kill_gen_cache.rounds.json").exists()
+
+def test_load_cache_roundtrip(tmp_path):
+    path = str(tmp_path / "eco_gen_cache.csv")
+    assert load_cache(path) == (None, None)
+    _cache([1, 2]).to_csv(path, index=False, encoding="utf-8-sig")
+    cached, covered = load_cache(path)
+    assert cached["round_num"].tolist() == [1, 2] and covered is None
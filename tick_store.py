@@ -0,0 +1,68 @@
+# tick_store.py：紧凑的 tick 表
+# 字符串列 (选手名/阵营/区域/点位) 用 category 存，坐标 float32，回合/血量 int16；
+# 构建时按内存预算分块处理原始 tick 表，峰值只取决于块大小而不是整场比赛
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+MEMORY_BUDGET_MB = 256  # 单块处理的内存预算
+
+TICK_SCHEMA = {
+    "round_num": "int16",
+    "second": "float32",
+    "tick": "int32",
+    "side": "category",
+    "name": "category",
+    "health": "int16",
+    "X": "float32",
+    "Y": "float32",
+    "Z": "float32",
+    "location": "category",
+    "area": "category",
+}
+TICK_COLUMNS = list(TICK_SCHEMA.keys())
+
+def compact(df):
+    """按 TICK_SCHEMA 收窄已有列的类型"""
+    cols = {}
+    for c, t in TICK_SCHEMA.items():
+        if c not in df.columns or df[c].dtype == t: continue
+        s = df[c] if t == "category" else df[c].fillna(0)
+        cols[c] = s.astype(t)
+    return df.assign(**cols) if cols else df
+
+def concat_compact(chunks):
+    """合并分块；各块的类别集合不同，用 union_categoricals 合并而不是退化成 object"""
+    chunks = [c for c in chunks if c is not None and len(c)]
+    if not chunks: return pd.DataFrame({c: pd.Series(dtype=t) for c, t in TICK_SCHEMA.items()})
+    if len(chunks) == 1: return chunks[0].reset_index(drop=True)
+    out = {}
+    for col in chunks[0].columns:
+        parts = [c[col] for c in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            out[col] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            out[col] = pd.Series(np.concatenate([p.to_numpy() for p in parts]))
+    return pd.DataFrame(out)
+
+def row_bytes(df):
+    """原始表每行大约占多少字节"""
+    n = len(df)
+    if n == 0: return 1
+    if hasattr(df, "estimated_size"): return max(1, df.estimated_size() // n)
+    return max(1, int(df.memory_usage(deep=True).sum()) // n)
+
+def iter_chunks(df, budget_mb=MEMORY_BUDGET_MB, extra_row_bytes=0):
+    """按预算切行块；polars 用 slice (零拷贝)，pandas 用 iloc"""
+    n = len(df)
+    rows = max(1, int(budget_mb * 1024 * 1024 // (row_bytes(df) + extra_row_bytes)))
+    for off in range(0, n, rows):
+        yield df.slice(off, rows) if hasattr(df, "slice") else df.iloc[off:off + rows]
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+def load_tick_store(arrow_path):
+    """读预处理子进程写出的 Arrow 文件；polars 的 Categorical 直接变成 pandas category"""
+    import polars as pl
+    return compact(pl.read_ipc(arrow_path).to_pandas())
@@ -0,0 +1,124 @@
+# tracing.py：结构化的阶段/模块/LLM 调用跟踪
+# 进程内一个全局 Tracer，各模块用 span() 包住要统计的代码段；LLM 网关额外记录排队等待、请求耗时、tokens、重试和缓存命中。
+# 时间戳用墙钟 (微秒)，子进程里记录的 span 带回主进程后可以直接合并；可导出为 Chrome trace (chrome://tracing / Perfetto)
+# 批量模式下几个 demo 同时在跑：每个调度器在 run_scope() 里运行，span 带上 args["run"]，导出时按它过滤；
+# 常驻服务里 tracer 不会随进程退出清空，导出完一次运行就 drop() 掉它的 span，子进程用 pop() 取走自己记录的
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+_RUN = contextvars.ContextVar("trace_run", default=None)
+
+def now_us():
+    return time.time_ns() // 1000
+
+class Tracer:
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def mark(self):
+        """当前事件数，配合 since()/pop() 取这之后记录的 span"""
+        with self._lock: return len(self.events)
+
+    def since(self, mark=0, run=None):
+        """mark 之后的 span；给了 run 时只要这次运行的"""
+        with self._lock: events = list(self.events[mark:])
+        if run is None: return events
+        return [ev for ev in events if ev["args"].get("run") == run]
+
+    def pop(self, mark=0):
+        """取走 mark 之后的 span (进程池子进程一次只跑一个任务，取走后不再积累)"""
+        with self._lock:
+            events = self.events[mark:]
+            del self.events[mark:]
+        return events
+
+    def drop(self, run):
+        """丢掉某次运行的全部 span，返回丢掉的条数"""
+        with self._lock:
+            before = len(self.events)
+            self.events = [ev for ev in self.events if ev["args"].get("run") != run]
+            return before - len(self.events)
+
+    def record(self, name, cat, start_us, end_us, **args):
+        run = _RUN.get()
+        if run is not None: args["run"] = run
+        ev = {"name": name, "cat": cat, "ph": "X", "ts": start_us, "dur": max(0, end_us - start_us),
+              "pid": os.getpid(), "tid": threading.get_ident(), "args": args}
+        with self._lock: self.events.append(ev)
+        return ev
+
+    def extend(self, events):
+        """合并子进程带回来的 span (子进程里没有运行 id，这里补上当前的)"""
+        run = _RUN.get()
+        events = list(events or [])
+        if run is not None:
+            for ev in events: ev["args"].setdefault("run", run)
+        with self._lock: self.events.extend(events)
+
+    @contextmanager
+    def span(self, name, cat="stage", **args):
+        start = now_us()
+        extra = {}
+        try:
+            yield extra  # 调用方可以往里补充参数 (如行数、tokens)
+        finally:
+            self.record(name, cat, start, now_us(), **args, **extra)
+
+_TRACER = Tracer()
+
+def get_tracer():
+    return _TRACER
+
+def span(name, cat="stage", **args):
+    return _TRACER.span(name, cat, **args)
+
+@contextmanager
+def run_scope(run_id):
+    """这段代码 (及经 submit_traced 提交的线程任务) 记录的 span 都归到 run_id"""
+    token = _RUN.set(run_id)
+    try: yield run_id
+    finally: _RUN.reset(token)
+
+def submit_traced(executor, fn, *args, **kwargs):
+    """ThreadPoolExecutor 不会把 contextvars 带进工作线程，提交时复制一份当前上下文"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def export_chrome_trace(path, events):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+    return path
+
+def summary_table(events):
+    """按 (类别, 名称) 汇总：次数、总耗时、平均、P95、最大；LLM 调用额外汇总排队/tokens/重试/缓存"""
+    groups = {}
+    for ev in events:
+        groups.setdefault((ev["cat"], ev["name"]), []).append(ev["dur"] / 1e6)
+    lines = [f"{'类别':<8}{'名称':<24}{'次数':>6}{'总计s':>9}{'平均s':>8}{'P95s':>8}{'最大s':>8}"]
+    for (cat, name), durs in sorted(groups.items(), key=lambda kv: -sum(kv[1])):
+        durs.sort()
+        p95 = durs[min(len(durs) - 1, int(len(durs) * 0.95))]
+        lines.append(f"{cat:<8}{name[:23]:<24}{len(durs):>6}{sum(durs):>9.2f}{sum(durs) / len(durs):>8.2f}{p95:>8.2f}{durs[-1]:>8.2f}")
+
+    llm = [ev["args"] for ev in events if ev["cat"] == "llm"]
+    if llm:
+        hits = sum(1 for a in llm if a.get("cache_hit"))
+        sent = [a for a in llm if not a.get("cache_hit")]
+        wait = sum(a.get("queue_wait_s", 0.0) for a in sent)
+        lines.append(
+            f"LLM: 调用 {len(llm)} 次 (缓存命中 {hits}), 重试 {sum(a.get('retries', 0) for a in sent)} 次, "
+            f"失败 {sum(1 for a in sent if a.get('error'))} 次, 排队合计 {wait:.1f}s, "
+            f"tokens {sum(a.get('prompt_tokens', 0) for a in sent)} + {sum(a.get('completion_tokens', 0) for a in sent)}")
+        # 前缀复用与否的平均延迟对比，确认前缀缓存是否降低了首 token 时间
+        timed = [a for a in sent if "latency_s" in a]
+        reuse = [a["latency_s"] for a in timed if a.get("prefix_hit")]
+        fresh = [a["latency_s"] for a in timed if not a.get("prefix_hit")]
+        if reuse and fresh:
+            lines.append(f"前缀复用 {len(reuse)}/{len(timed)} 次, 平均延迟 {sum(reuse) / len(reuse):.2f}s vs 新前缀 {sum(fresh) / len(fresh):.2f}s, "
+                         f"服务端缓存 {sum(a.get('cached_tokens', 0) for a in timed)} tokens")
+    return "\n".join(lines)
@@ -0,0 +1,103 @@
+# utility_index.py：按回合的“场上生效道具”区间索引
+# 由 dem.smokes / dem.infernos 一次性构建，支持批量的时刻查询与时间段查询
+import numpy as np
+import pandas as pd
+import config
+from mapping_table import nearest_locations
+
+UTILITY_COLUMNS = ['round_num', 'type', 'thrower', 'side', 'start_tick', 'end_tick', 'X', 'Y', 'Z', 'location']
+TYPE_CN = {"smoke": "烟雾弹", "inferno": "燃烧弹"}
+
+def _to_pandas(data):
+    if data is None: return pd.DataFrame()
+    if hasattr(data, "to_pandas"): return data.to_pandas()
+    return pd.DataFrame(data)
+
+def _normalize(raw, g_type, tickrate):
+    df = _to_pandas(raw)
+    if df.empty: return pd.DataFrame(columns=UTILITY_COLUMNS)
+
+    start = df['start_tick'] if 'start_tick' in df.columns else df.get('tick', pd.Series(0, index=df.index))
+    start = start.fillna(0).astype(np.int64)
+    # 优先用 demo 里真实的结束 tick，缺失时按 GRENADE_DURATIONS 估算
+    fallback = config.GRENADE_DURATIONS.get("smoke" if g_type == "smoke" else "molotov", 7)
+    est_end = start + int(fallback * tickrate)
+    end = df['end_tick'].fillna(est_end).astype(np.int64) if 'end_tick' in df.columns else est_end
+    end = end.where(end > start, est_end)
+
+    x = df.get('X', pd.Series(0.0, index=df.index)).fillna(0).to_numpy(dtype=np.float64)
+    y = df.get('Y', pd.Series(0.0, index=df.index)).fillna(0).to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        'round_num': df.get('round_num', pd.Series(0, index=df.index)).fillna(0).astype(int).to_numpy(),
+        'type': g_type,
+        'thrower': df.get('thrower_name', pd.Series("Unknown", index=df.index)).to_numpy(),
+        'side': df.get('thrower_side', pd.Series("", index=df.index)).astype(str).str.upper().to_numpy(),
+        'start_tick': start.to_numpy(),
+        'end_tick': end.to_numpy(),
+        'X': x, 'Y': y,
+        'Z': df.get('Z', pd.Series(0.0, index=df.index)).fillna(0).to_numpy(dtype=np.float64),
+        'location': nearest_locations(x, y),
+    })
+
+class UtilityIndex:
+    """
+    每回合一组按 start_tick 排序的数组；单回合道具数量很少 (几十个)，
+    批量查询直接用 (查询数 x 道具数) 的广播掩码完成
+    """
+    def __init__(self, table, tickrate=None):
+        self.tickrate = float(tickrate or config.TICKRATE)
+        self.table = table.sort_values(['round_num', 'start_tick']).reset_index(drop=True)
+        self._rounds = {}
+        for r_num, df_round in self.table.groupby('round_num'):
+            self._rounds[r_num] = (
+                df_round['start_tick'].to_numpy(),
+                df_round['end_tick'].to_numpy(),
+                df_round.index.to_numpy(),
+            )
+
+    def __len__(self):
+        return len(self.table)
+
+    def active_mask(self, r_num, ticks):
+        """返回 (len(ticks), 本回合道具数) 的布尔矩阵，以及道具行号"""
+        if r_num not in self._rounds:
+            return np.zeros((len(ticks), 0), dtype=bool), np.array([], dtype=np.int64)
+        starts, ends, rows = self._rounds[r_num]
+        t = np.asarray(ticks)[:, None]
+        return (starts[None, :] <= t) & (ends[None, :] > t), rows
+
+    def active_at(self, r_num, tick):
+        """某一时刻仍在生效的道具"""
+        mask, rows = self.active_mask(r_num, [tick])
+        return self.table.loc[rows[mask[0]]]
+
+    def active_at_many(self, r_num, ticks):
+        """批量时刻查询：返回带 query_tick 列的长表"""
+        ticks = np.asarray(ticks)
+        mask, rows = self.active_mask(r_num, ticks)
+        q_idx, u_idx = np.nonzero(mask)
+        out = self.table.loc[rows[u_idx]].reset_index(drop=True)
+        out.insert(0, 'query_tick', ticks[q_idx])
+        return out
+
+    def active_between(self, r_num, start_tick, end_tick):
+        """时间段查询：与 [start_tick, end_tick) 有重叠的道具"""
+        if r_num not in self._rounds: return self.table.iloc[0:0]
+        starts, ends, rows = self._rounds[r_num]
+        mask = (starts < end_tick) & (ends > start_tick)
+        return self.table.loc[rows[mask]]
+
+    def describe(self, r_num, tick):
+        """Prompt 用的一行文本：烟雾弹@A包(剩12s, by xxx)"""
+        active = self.active_at(r_num, tick)
+        if active.empty: return ""
+        parts = []
+        for g_type, loc, end, thrower in active[['type', 'location', 'end_tick', 'thrower']].itertuples(index=False):
+            remain = max(0.0, (end - tick) / self.tickrate)
+            parts.append(f"{TYPE_CN.get(g_type, g_type)}@{loc}(剩{remain:.0f}s, by {thrower})")
+        return "，".join(parts)
+
+def build_utility_index(smokes, infernos, tickrate=None):
+    tickrate = float(tickrate or config.TICKRATE)
+    table = pd.concat([_normalize(smokes, "smoke", tickrate), _normalize(infernos, "inferno", tickrate)], ignore_index=True)
+    return UtilityIndex(table, tickrate)